@@ -1,11 +1,17 @@
 from datetime import datetime
+from pathlib import Path
 from typing import Optional
+import asyncio
 import discord
 from discord import app_commands
 from discord.ext import commands
 from logging import getLogger
 
 from core.heat_system import get_heat_system
+from core.instrumentation import get_instrumentation
+from core.rate_limiter import get_history_budget
+from core.setting import get_settings
+from core.settings_watcher import get_settings_watcher
 
 
 class AdminCommands(commands.Cog):
@@ -45,7 +51,7 @@ class AdminCommands(commands.Cog):
         embed.add_field(name="蜜罐觸發", value=str(stats["honeypot_triggers"]), inline=True)
 
         if stats["violations"]:
-            violations_text = "\n".join(stats["violations"][-5:])
+            violations_text = "\n".join(violation.format() for violation in stats["violations"][-5:])
             embed.add_field(name="最近違規記錄", value=f"```{violations_text}```", inline=False)
 
         embed.set_footer(text=f"最後更新: {stats['last_updated'].strftime('%Y-%m-%d %H:%M:%S')}")
@@ -72,7 +78,11 @@ class AdminCommands(commands.Cog):
             await interaction.response.send_message("此指令只能在伺服器中使用", ephemeral=True)
             return
             
-        high_risk = self.heat_system.get_high_risk_users(str(interaction.guild.id), threshold=25.0)
+        # 從「低度危險」開始列出, 門檻依此伺服器的設定
+        config = self.heat_system.configs.get(interaction.guild.id)
+        high_risk = self.heat_system.get_high_risk_users(
+            str(interaction.guild.id), threshold=config.timeout_threshold / 2
+        )
 
         if not high_risk:
             await interaction.response.send_message("✅ 目前沒有高風險用戶", ephemeral=True)
@@ -90,7 +100,7 @@ class AdminCommands(commands.Cog):
         for i, (user_id, heat_data) in enumerate(high_risk[:10], 1):
             member = interaction.guild.get_member(int(user_id))
             member_name = member.mention if member else f"用戶 {user_id}"
-            danger_level = self.heat_system.get_danger_level(str(interaction.guild.id), user_id)
+            danger_level = self.heat_system.danger_level(heat_data.heat_value, config)
 
             embed.add_field(
                 name=f"#{i} {member_name}",
@@ -100,6 +110,105 @@ class AdminCommands(commands.Cog):
 
         await interaction.response.send_message(embed=embed)
 
+    @app_commands.command(name="historystats", description="查看訊息/指令歷史的記憶體用量")
+    @app_commands.default_permissions(administrator=True)
+    async def history_stats(self, interaction: discord.Interaction):
+        """查看訊息/指令歷史的記憶體用量"""
+        budget = get_history_budget()
+
+        embed = discord.Embed(
+            title="🧠 歷史紀錄記憶體用量",
+            description=(
+                f"總用量: {budget.used_bytes / 1024:.1f} KiB"
+                + (f" / {budget.max_bytes / 1024:.1f} KiB" if budget.max_bytes else "")
+                + f"\n因預算淘汰的 key: {budget.evicted_keys}"
+            ),
+            color=discord.Color.blue(),
+            timestamp=datetime.now(),
+        )
+
+        for name, stats in budget.stats().items():
+            embed.add_field(
+                name=name,
+                value=f"key: {stats['keys']}\n事件: {stats['events']}\n估計: {stats['bytes'] / 1024:.1f} KiB",
+                inline=True,
+            )
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="perfstats", description="查看事件處理與 API 延遲統計")
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.describe(prefix="只顯示名稱以此開頭的項目 (例如 listener、detector、rest)")
+    async def perf_stats(self, interaction: discord.Interaction, prefix: Optional[str] = None):
+        """查看事件處理與 API 延遲統計"""
+        instrumentation = get_instrumentation()
+        snapshot = instrumentation.snapshot()
+
+        histograms = [
+            (name, summary)
+            for name, summary in snapshot["histograms"].items()
+            if prefix is None or name.startswith(prefix)
+        ]
+        histograms.sort(key=lambda item: item[1]["p99"], reverse=True)
+
+        gauges = " | ".join(f"{name}: {value:g}" for name, value in snapshot["gauges"].items())
+        embed = discord.Embed(
+            title="⏱️ 效能統計",
+            description=(
+                f"事件迴圈延遲: {snapshot['loop_lag'] * 1000:.1f} ms | 統計時間: {snapshot['uptime'] / 60:.0f} 分鐘\n"
+                f"{gauges}"
+            ),
+            color=discord.Color.blue(),
+            timestamp=datetime.now(),
+        )
+
+        for name, summary in histograms[:24]:
+            embed.add_field(
+                name=name[:256],
+                value=(
+                    f"次數: {summary['count']}\n"
+                    f"p50/p95/p99: {summary['p50'] * 1000:.2f}/{summary['p95'] * 1000:.2f}/"
+                    f"{summary['p99'] * 1000:.2f} ms\n"
+                    f"最大: {summary['max'] * 1000:.1f} ms"
+                ),
+                inline=True,
+            )
+        if len(histograms) > 24:
+            embed.set_footer(text=f"只顯示 p99 最高的 24 項 (共 {len(histograms)} 項), 完整內容請使用 /perfdump")
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="perfdump", description="將效能統計輸出到檔案")
+    @app_commands.default_permissions(administrator=True)
+    async def perf_dump(self, interaction: discord.Interaction):
+        """將效能統計輸出到檔案"""
+        dump_dir = Path(get_settings().instrumentation.dump_dir)
+        path = dump_dir / f"perf-{datetime.now():%Y%m%d-%H%M%S}.json"
+        snapshot = get_instrumentation().snapshot()
+
+        def write():
+            dump_dir.mkdir(parents=True, exist_ok=True)
+            get_instrumentation().dump(str(path), snapshot)
+
+        await asyncio.to_thread(write)
+        self.logger.info(f"已輸出效能統計到 {path}")
+        await interaction.response.send_message(f"✅ 已輸出效能統計到 `{path}`", ephemeral=True)
+
+    @app_commands.command(name="reloadsettings", description="立即重新載入設定檔")
+    @app_commands.default_permissions(administrator=True)
+    async def reload_settings(self, interaction: discord.Interaction):
+        """立即重新載入設定檔"""
+        watcher = get_settings_watcher()
+        changed = await watcher.check(force=True)
+        if watcher.last_error:
+            await interaction.response.send_message(
+                f"❌ 設定檔驗證失敗, 保留目前的設定:\n```{watcher.last_error[:1800]}```", ephemeral=True
+            )
+        elif changed:
+            await interaction.response.send_message(f"✅ 已重新載入設定 (第 {watcher.reloads} 次)", ephemeral=True)
+        else:
+            await interaction.response.send_message("設定檔沒有變更", ephemeral=True)
+
 
 async def setup(bot):
     await bot.add_cog(AdminCommands(bot))
@@ -1,32 +1,38 @@
 import discord
 from discord.ext import commands
-import re
 from logging import getLogger
+from typing import Optional
+from core.message_pipeline import MessageFeatures, Verdict, get_message_pipeline
+from core.url_scanner import ParsedURL
+
+INVITE_HOSTS = frozenset({"discord.gg", "discord.io", "discord.me", "discord.li"})
+INVITE_PATH_HOSTS = frozenset({"discord.com", "discordapp.com"})
 
 
 class InviteLink(commands.Cog):
     def __init__(self, bot):
         self.bot: discord.Client = bot
         self.logger = getLogger("xaoc")
+        self.pipeline = get_message_pipeline()
+
+    async def cog_load(self):
+        self.pipeline.register("discord_invite", self.inspect_message, priority=30)
+
+    async def cog_unload(self):
+        self.pipeline.unregister("discord_invite")
+
+    def detect_server_invitelink(self, urls: list[ParsedURL]) -> bool:
+        for url in urls:
+            if url.host in INVITE_HOSTS and len(url.path) > 1:
+                return True
+            if url.host in INVITE_PATH_HOSTS and url.path.startswith("/invite/") and len(url.path) > 8:
+                return True
+        return False
 
-    def detect_server_invitelink(self, content):
-        cdn_pattern = r"(https?:\/\/)?(www.)?(discord.(gg|io|me|li)|discordapp.com\/invite|discord.com\/invite)\/[^\s\/]+?(?=\b)"
-        return re.match(cdn_pattern, content) is not None
-
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
-        if message.author == self.bot.user:
-            return
-        if self.detect_server_invitelink(message.content):
-            self.logger.warning(
-                f"檢測到邀請鏈接! 來自用戶: {message.author} ({message.author.id}) "
-                f"頻道: {message.channel} ({message.channel.id})"
-            )
-            try:
-                await message.delete()
-                self.logger.info(f"成功刪除邀請鏈接消息，用戶: {message.author}")
-            except Exception as e:
-                self.logger.error(f"無法處理邀請鏈接消息: {e}, 用戶: {message.author}")
+    def inspect_message(self, message: discord.Message, features: MessageFeatures) -> Optional[Verdict]:
+        if self.detect_server_invitelink(features.urls):
+            return Verdict(reason="邀請鏈接")
+        return None
 
 
 async def setup(bot):
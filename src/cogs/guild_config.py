@@ -0,0 +1,90 @@
+from typing import Optional
+import discord
+from discord import app_commands
+from discord.ext import commands
+from logging import getLogger
+from core.guild_config import get_guild_configs
+from core.setting import GuildSettings
+
+
+class GuildConfigCommands(commands.Cog):
+    """查看與覆寫此伺服器的門檻與熱力權重"""
+
+    def __init__(self, bot):
+        self.bot: commands.Bot = bot
+        self.logger = getLogger("xaoc")
+        self.configs = get_guild_configs()
+
+    async def key_autocomplete(self, interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+        keys = [key for key in GuildSettings.model_fields if current.lower() in key]
+        return [app_commands.Choice(name=key, value=key) for key in keys[:25]]
+
+    @app_commands.command(name="guildconfig", description="查看此伺服器的設定")
+    @app_commands.default_permissions(administrator=True)
+    async def show_config(self, interaction: discord.Interaction):
+        """查看此伺服器的設定"""
+        if not interaction.guild:
+            await interaction.response.send_message("此指令只能在伺服器中使用", ephemeral=True)
+            return
+
+        config = self.configs.get(interaction.guild.id)
+        overrides = self.configs.overrides(interaction.guild.id)
+        embed = discord.Embed(
+            title="⚙️ 伺服器設定",
+            description=f"已覆寫 {len(overrides)} 項, 其餘沿用全域預設 (✏️ 為覆寫)",
+            color=discord.Color.blue(),
+        )
+        for key, field in GuildSettings.model_fields.items():
+            marker = "✏️ " if key in overrides else ""
+            embed.add_field(name=f"{marker}{key}", value=f"`{getattr(config, key)}`\n{field.description}", inline=True)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="setguildconfig", description="覆寫此伺服器的一項設定")
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.describe(key="設定名稱", value="新的值")
+    @app_commands.autocomplete(key=key_autocomplete)
+    async def set_config(self, interaction: discord.Interaction, key: str, value: str):
+        """覆寫此伺服器的一項設定"""
+        if not interaction.guild:
+            await interaction.response.send_message("此指令只能在伺服器中使用", ephemeral=True)
+            return
+
+        try:
+            config = self.configs.set(interaction.guild.id, key, value)
+        except ValueError as e:
+            await interaction.response.send_message(f"❌ 無效的設定: {str(e)[:1800]}", ephemeral=True)
+            return
+
+        self.logger.info(f"伺服器 {interaction.guild.name} 的設定 {key} 已由 {interaction.user} 改為 {getattr(config, key)}")
+        await interaction.response.send_message(f"✅ `{key}` 已設為 `{getattr(config, key)}`", ephemeral=True)
+
+    @app_commands.command(name="resetguildconfig", description="移除此伺服器的設定覆寫")
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.describe(key="要恢復預設的設定名稱 (不指定則全部恢復)")
+    @app_commands.autocomplete(key=key_autocomplete)
+    async def reset_config(self, interaction: discord.Interaction, key: Optional[str] = None):
+        """移除此伺服器的設定覆寫"""
+        if not interaction.guild:
+            await interaction.response.send_message("此指令只能在伺服器中使用", ephemeral=True)
+            return
+
+        if key is not None and key not in self.configs.overrides(interaction.guild.id):
+            await interaction.response.send_message(f"`{key}` 沒有被覆寫", ephemeral=True)
+            return
+
+        try:
+            config = self.configs.reset(interaction.guild.id, key)
+        except ValueError as e:
+            await interaction.response.send_message(f"❌ 無法恢復預設: {str(e)[:1800]}", ephemeral=True)
+            return
+
+        target = f"`{key}`" if key else "所有設定"
+        self.logger.info(f"伺服器 {interaction.guild.name} 的{target}已由 {interaction.user} 恢復預設")
+        if key:
+            await interaction.response.send_message(f"✅ `{key}` 已恢復為 `{getattr(config, key)}`", ephemeral=True)
+        else:
+            await interaction.response.send_message("✅ 已恢復所有設定為預設值", ephemeral=True)
+
+
+async def setup(bot):
+    await bot.add_cog(GuildConfigCommands(bot))
@@ -1,8 +1,10 @@
 import discord
 from discord.ext import commands
 from logging import getLogger
-from core.setting import get_settings
+from typing import Optional
+from core.guild_config import get_guild_configs
 from core.heat_system import get_heat_system
+from core.message_pipeline import MessageFeatures, Verdict, get_message_pipeline
 
 
 class Honeypot(commands.Cog):
@@ -10,37 +12,38 @@ class Honeypot(commands.Cog):
         self.bot: discord.Client = bot
         self.logger = getLogger("xaoc")
         self.heat_system = get_heat_system()
+        self.pipeline = get_message_pipeline()
+        # 蜜罐頻道可依伺服器設定, 未設定時沿用 honeypot.channel_id
+        self.configs = get_guild_configs()
 
-        self.honeypot_channel_id = get_settings().honeypot.channel_id
+    async def cog_load(self):
+        self.pipeline.register("honeypot", self.inspect_message, priority=0)
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
-        if message.author == self.bot.user:
-            return
-
-        if str(message.channel.id) == self.honeypot_channel_id:
-            if not message.guild:  # stupid pylance
-                return
-            self.heat_system.add_honeypot_violation(str(message.guild.id), str(message.author.id))
+    async def cog_unload(self):
+        self.pipeline.unregister("honeypot")
 
-            heat_value = self.heat_system.get_user_heat_data(str(message.guild.id), str(message.author.id)).heat_value
-            danger_level = self.heat_system.get_danger_level(str(message.guild.id), str(message.author.id))
+    def inspect_message(self, message: discord.Message, features: MessageFeatures) -> Optional[Verdict]:
+        if features.guild_id is None:
+            return None
+        if str(message.channel.id) != self.configs.get(features.guild_id).honeypot_channel_id:
+            return None
+        return Verdict(reason="觸發蜜罐", action=self.handle_honeypot)
 
-            self.logger.warning(
-                f"檢測到蜜罐觸發! 來自用戶: {message.author} ({message.author.id}) "
-                f"頻道: {message.channel} ({message.channel.id}) | "
-                f"熱力值: {heat_value:.1f} | 危險等級: {danger_level}"
-            )
+    async def handle_honeypot(self, message: discord.Message, features: MessageFeatures):
+        if not message.guild:  # stupid pylance
+            return
+        self.heat_system.add_honeypot_violation(str(message.guild.id), str(message.author.id))
 
-            try:
-                await message.delete()
+        heat_value = self.heat_system.get_user_heat_data(str(message.guild.id), str(message.author.id)).heat_value
+        danger_level = self.heat_system.get_danger_level(str(message.guild.id), str(message.author.id))
 
-                if message.guild:
-                    self.bot.dispatch("user_high_risk", message.guild, message.author)
-                    self.logger.warning(f"用戶 {message.author} 觸發蜜罐")
+        self.logger.warning(
+            f"檢測到蜜罐觸發! 來自用戶: {message.author} ({message.author.id}) "
+            f"頻道: {message.channel} ({message.channel.id}) | "
+            f"熱力值: {heat_value:.1f} | 危險等級: {danger_level}"
+        )
 
-            except Exception as e:
-                self.logger.error(f"無法處理蜜罐頻道消息: {e}, 用戶: {message.author}")
+        self.bot.dispatch("user_high_risk", message.guild, message.author)
 
 
 async def setup(bot):
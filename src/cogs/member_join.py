@@ -1,8 +1,20 @@
 import discord
+from discord import app_commands
 from discord.ext import commands
 from logging import getLogger
+from collections import deque
+from core.action_queue import get_action_queue
+from core.batcher import MicroBatcher
+from core.guild_config import get_guild_configs
 from core.heat_system import get_heat_system
+from core.instrumentation import get_instrumentation
+from core.join_wave import JoinWave, JoinWaveDetector
+from core.setting import Settings, get_settings
 import datetime
+import time
+
+NEW_ACCOUNT_WARNING_DAYS = 7
+BATCH_LOG_DETAIL_LIMIT = 20  # 批次超過此數量時只記錄摘要
 
 
 class MemberFilter(commands.Cog):
@@ -10,36 +22,211 @@ class MemberFilter(commands.Cog):
         self.bot: discord.Client = bot
         self.logger = getLogger("xaoc")
         self.heat_system = get_heat_system()
+        self.actions = get_action_queue()
+        self.settings = get_settings().member_filter
+        self.configs = get_guild_configs()
+
+        self.join_waves = JoinWaveDetector(
+            window_seconds=self.settings.join_wave_window,
+            join_threshold=self.settings.join_wave_threshold,
+            cluster_threshold=self.settings.join_wave_cluster_size,
+            lockdown_seconds=self.settings.lockdown_seconds,
+        )
+        self.joins: MicroBatcher[tuple[discord.Member, float]] = MicroBatcher(
+            self.process_joins,
+            window=self.settings.join_batch_window,
+            max_batch=self.settings.join_batch_size,
+            name="member_join",
+        )
+
+        # 踢出動作的待處理佇列, 同時進行中的數量有上限, 避免加入潮時塞滿動作佇列
+        self._kick_backlog: deque[tuple[discord.Member, str]] = deque()
+        self._kicks_inflight = 0
+        self.kick_high_water = 0
+        self.kicks_dispatched = 0
+
+    async def cog_load(self):
+        instrumentation = get_instrumentation()
+        instrumentation.register_gauge("join_batch_pending", lambda: len(self.joins))
+        instrumentation.register_gauge("kick_backlog", lambda: len(self._kick_backlog))
+
+    async def cog_unload(self):
+        instrumentation = get_instrumentation()
+        instrumentation.unregister_gauge("join_batch_pending")
+        instrumentation.unregister_gauge("kick_backlog")
+        await self.joins.close()
+
+    @commands.Cog.listener()
+    async def on_settings_update(self, old: Settings, new: Settings, changed: frozenset[str]):
+        if "member_filter" not in changed:
+            return
+        self.settings = settings = new.member_filter
+        self.join_waves.window_seconds = settings.join_wave_window
+        self.join_waves.join_threshold = settings.join_wave_threshold
+        self.join_waves.cluster_threshold = settings.join_wave_cluster_size
+        self.join_waves.lockdown_seconds = settings.lockdown_seconds
+        self.joins.window = settings.join_batch_window
+        self.joins.max_batch = settings.join_batch_size
+        # 並發上限可能提高了
+        self._dispatch_kicks()
 
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
-        if member.bot:
+        if member.bot or not self.settings.enabled:
             return
+        self.joins.put((member, time.time()))
+
+    async def process_joins(self, batch: list[tuple[discord.Member, float]]):
+        """處理一批新成員, 熱力值直接更新, 踢出交給有並發上限的佇列"""
+        detailed = len(batch) <= BATCH_LOG_DETAIL_LIMIT
+        now = datetime.datetime.now(datetime.timezone.utc)
+        kicked = flagged = waved = 0
 
-        account_age = datetime.datetime.now(datetime.timezone.utc) - member.created_at
-        days_old = account_age.days
+        for member, joined_at in batch:
+            config = self.configs.get(member.guild.id)
+            if self.settings.join_wave_enabled:
+                wave = self.join_waves.observe(
+                    member.guild.id,
+                    member.id,
+                    member.name,
+                    member.created_at.timestamp(),
+                    joined_at,
+                    join_threshold=config.join_wave_threshold,
+                    cluster_threshold=config.join_wave_cluster_size,
+                )
+                if wave is not None:
+                    self.handle_join_wave(member.guild, wave)
+                    waved += len(wave.records)
+                    continue
 
-        if days_old < 1:
-            try:
-                await member.kick(reason=f"帳號年齡過新 ({days_old} 天)")
-                self.logger.warning(f"已踢出新成員 {member} ({member.id}) - 帳號年齡: {days_old} 天 (小於1天)")
+            days_old = (now - member.created_at).days
 
-            except discord.Forbidden:
-                self.logger.error(f"無權限踢出新成員 {member}")
-            except Exception as e:
-                self.logger.error(f"踢出新成員時發生錯誤 {member}: {e}")
+            if days_old < config.min_account_age_days and config.kick_new_accounts:  # type: ignore
+                self.queue_kick(member, reason=f"帳號年齡過新 ({days_old} 天)")
+                kicked += 1
+                if detailed:
+                    self.logger.warning(
+                        f"已排入踢出新成員 {member} ({member.id}) - 帳號年齡: {days_old} 天 "
+                        f"(小於{config.min_account_age_days}天)"
+                    )
 
-        elif days_old < 7:
-            self.heat_system.add_new_account_violation(str(member.guild.id), str(member.id))
+            elif days_old < NEW_ACCOUNT_WARNING_DAYS:
+                self.heat_system.add_new_account_violation(str(member.guild.id), str(member.id))
+                flagged += 1
+                if detailed:
+                    heat_value = self.heat_system.get_user_heat_data(str(member.guild.id), str(member.id)).heat_value
+                    self.logger.warning(
+                        f"高風險新成員加入 {member} ({member.id}) | 帳號年齡: {days_old} 天 | 熱力值: {heat_value:.1f}"
+                    )
 
-            heat_value = self.heat_system.get_user_heat_data(str(member.guild.id), str(member.id)).heat_value
+            elif detailed:
+                self.logger.info(f"新成員加入 {member} ({member.id}) - 帳號年齡: {days_old} 天")
 
+        if not detailed:
             self.logger.warning(
-                f"高風險新成員加入 {member} ({member.id}) | 帳號年齡: {days_old} 天 | 熱力值: {heat_value:.1f}"
+                f"批次處理 {len(batch)} 位新成員 | 加入潮: {waved} | 帳號過新踢出: {kicked} | 新帳號: {flagged} | "
+                f"待踢出: {len(self._kick_backlog)}"
             )
 
+    def queue_kick(self, member: discord.Member, reason: str):
+        self._kick_backlog.append((member, reason))
+        self.kick_high_water = max(self.kick_high_water, len(self._kick_backlog))
+        self._dispatch_kicks()
+
+    def _dispatch_kicks(self):
+        while self._kick_backlog and self._kicks_inflight < self.settings.max_inflight_kicks:
+            member, reason = self._kick_backlog.popleft()
+            self._kicks_inflight += 1
+            self.kicks_dispatched += 1
+            self.actions.kick_member(member, reason=reason).add_done_callback(self._on_kick_done)
+
+    def _on_kick_done(self, _):
+        self._kicks_inflight -= 1
+        self._dispatch_kicks()
+
+    def handle_join_wave(self, guild: discord.Guild, wave: JoinWave):
+        """一次處理整波加入潮成員, 處置動作交給動作佇列"""
+        lockdown_action = self.configs.get(guild.id).lockdown_action
+        if wave.started:
+            self.logger.warning(
+                f"檢測到加入潮, 伺服器 {guild.name} ({guild.id}) 進入封鎖模式 | {wave.reason} | 處置: {lockdown_action}"
+            )
+
+        guild_id = str(guild.id)
+        for record in wave.records:
+            member = guild.get_member(record.user_id)
+            if member is None:
+                continue
+
+            self.heat_system.add_join_wave_violation(guild_id, str(member.id))
+            if lockdown_action == "kick":
+                self.queue_kick(member, reason=f"加入潮: {wave.reason}")
+            else:
+                self.bot.dispatch("user_high_risk", guild, member)
+
+    @app_commands.command(name="lockdown", description="查看加入潮封鎖模式狀態")
+    @app_commands.default_permissions(moderate_members=True)
+    async def lockdown_status(self, interaction: discord.Interaction):
+        """查看加入潮封鎖模式狀態"""
+        if not interaction.guild:
+            await interaction.response.send_message("此指令只能在伺服器中使用", ephemeral=True)
+            return
+
+        status = self.join_waves.status(interaction.guild.id, time.time())
+        if status["locked"]:
+            content = (
+                f"🔒 封鎖模式中, 剩餘 {status['remaining'] / 60:.1f} 分鐘\n"
+                f"已處理 {status['handled']} 位成員 | 最近 {self.settings.join_wave_window:.0f} 秒加入 {status['joins']} 人"
+            )
+        else:
+            content = f"✅ 未處於封鎖模式 | 最近 {self.settings.join_wave_window:.0f} 秒加入 {status['joins']} 人"
+        await interaction.response.send_message(content, ephemeral=True)
+
+    @app_commands.command(name="joinstats", description="查看新成員批次處理的統計")
+    @app_commands.default_permissions(administrator=True)
+    async def join_stats(self, interaction: discord.Interaction):
+        """查看新成員批次處理的統計"""
+        stats = self.joins.stats()
+        embed = discord.Embed(title="📥 新成員處理統計", color=discord.Color.blue())
+        embed.add_field(
+            name="批次",
+            value=(
+                f"已處理: {stats['items']} 位 / {stats['batches']} 批\n"
+                f"平均每批: {stats['avg_batch']:.1f} | 最後一批: {stats['last_batch']}"
+            ),
+            inline=False,
+        )
+        embed.add_field(
+            name="積壓",
+            value=(
+                f"等待處理: {stats['pending']} (最高 {stats['high_water']})\n"
+                f"等待時間: 最近 {stats['last_lag']:.2f} 秒 / 最長 {stats['max_lag']:.2f} 秒"
+            ),
+            inline=False,
+        )
+        embed.add_field(
+            name="踢出",
+            value=(
+                f"進行中: {self._kicks_inflight}/{self.settings.max_inflight_kicks} | "
+                f"等待中: {len(self._kick_backlog)} (最高 {self.kick_high_water}) | 已送出: {self.kicks_dispatched}"
+            ),
+            inline=False,
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="endlockdown", description="手動結束加入潮封鎖模式")
+    @app_commands.default_permissions(administrator=True)
+    async def end_lockdown(self, interaction: discord.Interaction):
+        """手動結束加入潮封鎖模式"""
+        if not interaction.guild:
+            await interaction.response.send_message("此指令只能在伺服器中使用", ephemeral=True)
+            return
+
+        if self.join_waves.end_lockdown(interaction.guild.id):
+            self.logger.warning(f"伺服器 {interaction.guild.name} 的封鎖模式已由 {interaction.user} 手動結束")
+            await interaction.response.send_message("✅ 已結束封鎖模式")
         else:
-            self.logger.info(f"新成員加入 {member} ({member.id}) - 帳號年齡: {days_old} 天")
+            await interaction.response.send_message("目前未處於封鎖模式", ephemeral=True)
 
 
 async def setup(bot):
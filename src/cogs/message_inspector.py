@@ -0,0 +1,30 @@
+import discord
+from discord.ext import commands
+from logging import getLogger
+from core.message_index import get_recent_messages
+from core.message_pipeline import get_message_pipeline
+
+
+class MessageInspector(commands.Cog):
+    """唯一的 on_message 入口, 將訊息交給統一檢測管線"""
+
+    def __init__(self, bot):
+        self.bot: commands.Bot = bot
+        self.logger = getLogger("xaoc")
+        self.pipeline = get_message_pipeline()
+        self.recent_messages = get_recent_messages()
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        if message.author == self.bot.user:
+            return
+
+        blocked = await self.pipeline.inspect(message)
+
+        # 記錄留下來的訊息, 用戶被隔離時可一次清除
+        if blocked is None and message.guild is not None and not message.author.bot:
+            self.recent_messages.record(message.guild.id, message.author.id, message.channel.id, message.id)
+
+
+async def setup(bot):
+    await bot.add_cog(MessageInspector(bot))
@@ -1,6 +1,19 @@
+import asyncio
+from datetime import timedelta
+from functools import partial
+from typing import Optional
 import discord
-from discord.ext import commands
+from discord import app_commands
+from discord.ext import commands, tasks
 from logging import getLogger
+from core.action_queue import get_action_queue
+from core.guild_config import get_guild_configs
+from core.heat_system import get_heat_system
+from core.lookalike import LookalikeScore, LookalikeScorer
+from core.message_pipeline import MessageFeatures, Verdict, get_message_pipeline
+from core.phishing_index import DomainIndex, PhishingMatch
+from core.setting import Settings, get_settings
+from core.url_scanner import ParsedURL
 
 
 logger = getLogger("xaoc")
@@ -10,8 +23,153 @@ class PhishingDetector(commands.Cog):
     def __init__(self, bot):
         self.bot: commands.Bot = bot
         self.logger = getLogger("xaoc")
+        self.heat_system = get_heat_system()
+        self.pipeline = get_message_pipeline()
+        self.settings = get_settings().phishing
+        self.configs = get_guild_configs()
 
-    async def handle_phishing(self, message: discord.Message, url: str, reasons: list[str]): ...
+        self.index = DomainIndex()
+        self._reload_lock = asyncio.Lock()
+        self.lookalike = LookalikeScorer(self.settings.protected_brands, self.settings.lookalike_max_distance)
+
+    async def cog_load(self):
+        await self.reload_index(force=True)
+        self.pipeline.register("phishing_detector", self.inspect_message, priority=10)
+        self.watch_lists.change_interval(seconds=self.settings.reload_interval)
+        self.watch_lists.start()
+
+    async def cog_unload(self):
+        self.pipeline.unregister("phishing_detector")
+        self.watch_lists.cancel()
+
+    @commands.Cog.listener()
+    async def on_settings_update(self, old: Settings, new: Settings, changed: frozenset[str]):
+        if "phishing" not in changed:
+            return
+        before, self.settings = self.settings, new.phishing
+        if (before.protected_brands, before.lookalike_max_distance) != (
+            self.settings.protected_brands,
+            self.settings.lookalike_max_distance,
+        ):
+            self.lookalike = LookalikeScorer(self.settings.protected_brands, self.settings.lookalike_max_distance)
+        if before.reload_interval != self.settings.reload_interval:
+            self.watch_lists.change_interval(seconds=self.settings.reload_interval)
+        if before.list_dir != self.settings.list_dir:
+            await self.reload_index(force=True)
+
+    async def reload_index(self, force: bool = False) -> bool:
+        """
+        在背景執行緒重建網域索引並整個替換, 檢測不需要停止
+        返回是否有重新載入
+        """
+        async with self._reload_lock:
+            list_dir = self.settings.list_dir
+            if not force and not await asyncio.to_thread(self.index.is_stale, list_dir):
+                return False
+
+            index = await asyncio.to_thread(DomainIndex.from_directory, list_dir)
+            self.index = index
+            self.logger.info(f"已載入釣魚網域清單: {len(index)} 個網域, {len(index.sources)} 個檔案 ({list_dir})")
+            return True
+
+    @tasks.loop(seconds=60)
+    async def watch_lists(self):
+        """定期檢查清單檔案是否有更新"""
+        try:
+            await self.reload_index()
+        except Exception as e:
+            self.logger.error(f"重新載入釣魚網域清單時發生錯誤: {e}", exc_info=True)
+
+    def check_urls(self, urls: list[ParsedURL]) -> Optional[tuple[ParsedURL, PhishingMatch]]:
+        index = self.index
+        for url in urls:
+            match = index.match(url.host)
+            if match:
+                return url, match
+        return None
+
+    def check_lookalikes(self, urls: list[ParsedURL], threshold: float) -> Optional[tuple[ParsedURL, LookalikeScore]]:
+        best: Optional[tuple[ParsedURL, LookalikeScore]] = None
+        for url in urls:
+            score = self.lookalike.score(url.host)
+            if score and score.score >= threshold:
+                if best is None or score.score > best[1].score:
+                    best = (url, score)
+        return best
+
+    def inspect_message(self, message: discord.Message, features: MessageFeatures) -> Optional[Verdict]:
+        if not self.settings.enabled or features.guild_id is None or not features.urls:
+            return None
+
+        result = self.check_urls(features.urls)
+        if result is not None:
+            url, match = result
+            return Verdict(
+                reason=match.reason, action=partial(self.handle_phishing, url=url.raw, reasons=[match.reason])
+            )
+
+        threshold: float = self.configs.get(features.guild_id).lookalike_threshold  # type: ignore
+        lookalike = self.check_lookalikes(features.urls, threshold)
+        if lookalike is not None:
+            url, score = lookalike
+            return Verdict(
+                reason=score.reason,
+                action=partial(self.handle_phishing, url=url.raw, reasons=[score.reason], lookalike_score=score.score),
+            )
+        return None
+
+    async def handle_phishing(
+        self,
+        message: discord.Message,
+        features: MessageFeatures,
+        url: str,
+        reasons: list[str],
+        lookalike_score: Optional[float] = None,
+    ):
+        """處理檢測到的釣魚連結 (訊息已由管線刪除), 仿冒網域依相似度加熱力值"""
+        try:
+            if not message.guild:
+                return
+
+            guild_id = str(message.guild.id)
+            user_id = str(message.author.id)
+
+            if lookalike_score is None:
+                self.heat_system.add_phishing_violation(guild_id, user_id)
+            else:
+                self.heat_system.add_lookalike_violation(guild_id, user_id, lookalike_score)
+
+            heat_value = self.heat_system.get_user_heat_data(guild_id, user_id).heat_value
+            danger_level = self.heat_system.get_danger_level(guild_id, user_id)
+
+            self.logger.warning(
+                f"檢測到釣魚連結 | 用戶: {message.author} ({message.author.id}) | "
+                f"網址: {url} | 原因: {', '.join(reasons)} | 熱力值: {heat_value:.1f} | "
+                f"危險等級: {danger_level}"
+            )
+
+            if self.heat_system.should_quarantine(guild_id, user_id):
+                self.bot.dispatch("user_high_risk", message.guild, message.author)
+                self.logger.warning(f"用戶 {message.author} 因釣魚連結達到隔離門檻")
+
+            elif self.heat_system.should_timeout(guild_id, user_id) and isinstance(message.author, discord.Member):
+                get_action_queue().timeout_member(
+                    message.author, timedelta(minutes=10), reason=f"釣魚連結: {', '.join(reasons)}"
+                )
+                self.logger.info(f"已排入禁言用戶 {message.author} 10分鐘")
+
+        except discord.Forbidden:
+            self.logger.error(f"無權限處理釣魚連結訊息，用戶: {message.author}")
+        except Exception as e:
+            self.logger.error(f"處理釣魚連結時發生錯誤: {e}", exc_info=True)
+
+    @app_commands.command(name="reloadphishing", description="重新載入釣魚網域清單")
+    @app_commands.default_permissions(administrator=True)
+    async def reload_phishing(self, interaction: discord.Interaction):
+        """重新載入釣魚網域清單"""
+        await interaction.response.defer(ephemeral=True)
+        await self.reload_index(force=True)
+        await interaction.followup.send(f"✅ 已重新載入釣魚網域清單 ({len(self.index)} 個網域)", ephemeral=True)
 
 
 async def setup(bot):
@@ -1,14 +1,98 @@
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+import asyncio
+import time
 import discord
 from discord import app_commands
 from discord.ext import commands
 from logging import getLogger
 from datetime import datetime
+from core.action_queue import ActionPriority, get_action_queue
 from core.heat_system import get_heat_system
-from core.setting import get_settings
+from core.message_index import get_recent_messages
+from core.metrics import get_metrics
+from core.setting import Settings, get_settings
+from core.storage import get_store
 
 logger = getLogger("xaoc")
 
+PERMISSION_SETUP_CONCURRENCY = 8
+LIST_PAGE_SIZE = 10
+PROGRESS_INTERVAL = 2.0  # 回報進度的最短間隔(秒)
+
+_TEXT_DENY = {
+    "send_messages": False,
+    "add_reactions": False,
+    "send_messages_in_threads": False,
+    "create_public_threads": False,
+    "create_private_threads": False,
+}
+_VOICE_DENY = {"connect": False, "send_messages": False, "add_reactions": False}
+
+
+def quarantine_overwrite(channel: discord.abc.GuildChannel) -> dict[str, bool]:
+    """隔離區角色在各類頻道應有的權限覆寫, 分類頻道同時涵蓋文字與語音"""
+    if isinstance(channel, discord.CategoryChannel):
+        return {**_TEXT_DENY, **_VOICE_DENY}
+    if isinstance(channel, (discord.VoiceChannel, discord.StageChannel)):
+        return _VOICE_DENY
+    return _TEXT_DENY
+
+
+def has_overwrite(channel: discord.abc.GuildChannel, role: discord.Role, desired: dict[str, bool]) -> bool:
+    current = channel.overwrites_for(role)
+    return all(getattr(current, name) == value for name, value in desired.items())
+
+
+@dataclass(slots=True)
+class PermissionSetupResult:
+    total: int = 0
+    updated: int = 0
+    skipped: int = 0
+    failed: list[int] = field(default_factory=list)
+
+    @property
+    def done(self) -> int:
+        return self.updated + self.skipped + len(self.failed)
+
+    def format(self) -> str:
+        text = f"{self.done}/{self.total} 個頻道 (更新 {self.updated}, 已正確 {self.skipped}"
+        if self.failed:
+            text += f", 失敗 {len(self.failed)}"
+        return text + ")"
+
+
+class QuarantineListView(discord.ui.View):
+    """/quarantinelist 的分頁按鈕"""
+
+    def __init__(self, render: Callable[[int], discord.Embed], page_count: int, author_id: int):
+        super().__init__(timeout=180)
+        self.render = render
+        self.page_count = page_count
+        self.author_id = author_id
+        self.page = 0
+        self._sync_buttons()
+
+    def _sync_buttons(self):
+        self.previous_page.disabled = self.page <= 0
+        self.next_page.disabled = self.page >= self.page_count - 1
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.author_id
+
+    async def _show(self, interaction: discord.Interaction, page: int):
+        self.page = max(0, min(page, self.page_count - 1))
+        self._sync_buttons()
+        await interaction.response.edit_message(embed=self.render(self.page), view=self)
+
+    @discord.ui.button(label="上一頁", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page - 1)
+
+    @discord.ui.button(label="下一頁", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.page + 1)
+
 
 class QuarantineSystem(commands.Cog):
     def __init__(self, bot):
@@ -17,14 +101,92 @@ class QuarantineSystem(commands.Cog):
         self.heat_system = get_heat_system()
         self.settings = get_settings()
 
+        self.store = get_store()
+        self.actions = get_action_queue()
+        self.recent_messages = get_recent_messages()
+        metrics = get_metrics()
+        self._quarantines = metrics.counter("quarantines_total", "隔離次數", ("result",))
+        self._releases = metrics.counter("releases_total", "釋放隔離次數")
+
         self.quarantine_role_name = "隔離區"
 
-        self.quarantined_users: dict[str, dict[str, list[int]]] = {}
+        self.quarantined_users: dict[str, dict[str, list[int]]] = self.store.quarantine_snapshots
+        self._setup_locks: dict[int, asyncio.Lock] = {}
+
+        # 每個伺服器的隔離區角色 id 與目前擁有該角色的成員 id
+        self._role_ids: dict[int, int] = {}
+        self._members: dict[int, set[int]] = {}
+
+    def get_quarantine_role(self, guild: discord.Guild) -> Optional[discord.Role]:
+        """以快取的角色 id 查詢隔離區角色, 快取失效時才掃描角色列表"""
+        role_id = self._role_ids.get(guild.id)
+        if role_id is not None:
+            role = guild.get_role(role_id)
+            if role is not None:
+                return role
+            self._forget_guild(guild.id)
+
+        role = discord.utils.get(guild.roles, name=self.quarantine_role_name)
+        if role is not None:
+            self._role_ids[guild.id] = role.id
+        return role
+
+    def _forget_guild(self, guild_id: int):
+        self._role_ids.pop(guild_id, None)
+        self._members.pop(guild_id, None)
+
+    def quarantined_member_ids(self, guild: discord.Guild, role: discord.Role) -> set[int]:
+        """擁有隔離區角色的成員 id, 第一次查詢時建立, 之後由成員更新事件維護"""
+        members = self._members.get(guild.id)
+        if members is None:
+            members = self._members[guild.id] = {member.id for member in role.members}
+            if not guild.chunked:
+                # 成員列表未完整下載時 role.members 只包含快取中的成員, 以隔離快照補上
+                members.update(int(user_id) for user_id in self.quarantined_users.get(str(guild.id), {}))
+        return members
 
-    async def get_or_create_quarantine_role(self, guild: discord.Guild) -> discord.Role | None:
+    @commands.Cog.listener()
+    async def on_settings_update(self, old: Settings, new: Settings, changed: frozenset[str]):
+        self.settings = new
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        if self._role_ids.get(role.guild.id) == role.id:
+            self._forget_guild(role.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        if before.name == after.name:
+            return
+        cached = self._role_ids.get(after.guild.id)
+        if cached == after.id or (cached is None and after.name == self.quarantine_role_name):
+            self._forget_guild(after.guild.id)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        members = self._members.get(after.guild.id)
+        role_id = self._role_ids.get(after.guild.id)
+        if members is None or role_id is None:
+            return
+
+        if after.get_role(role_id) is not None:
+            members.add(after.id)
+        else:
+            members.discard(after.id)
+
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent):
+        # raw 事件不論成員是否在快取中都會觸發
+        members = self._members.get(payload.guild_id)
+        if members is not None:
+            members.discard(payload.user.id)
+
+    async def get_or_create_quarantine_role(
+        self, guild: discord.Guild, setup_permissions: bool = True
+    ) -> discord.Role | None:
         """獲取或創建隔離區角色"""
 
-        quarantine_role = discord.utils.get(guild.roles, name=self.quarantine_role_name)
+        quarantine_role = self.get_quarantine_role(guild)
 
         if quarantine_role:
             return quarantine_role
@@ -39,6 +201,7 @@ class QuarantineSystem(commands.Cog):
             )
 
             self.logger.info(f"已創建隔離區角色: {quarantine_role.name}")
+            self._role_ids[guild.id] = quarantine_role.id
 
             permissions = discord.Permissions.none()
             permissions.read_messages = True
@@ -46,7 +209,8 @@ class QuarantineSystem(commands.Cog):
 
             await quarantine_role.edit(permissions=permissions)
 
-            await self.setup_channel_permissions(guild, quarantine_role)
+            if setup_permissions:
+                await self.setup_channel_permissions(guild, quarantine_role)
 
             return quarantine_role
 
@@ -57,69 +221,123 @@ class QuarantineSystem(commands.Cog):
             self.logger.error(f"創建隔離區角色時發生錯誤: {e}", exc_info=True)
             return None
 
-    async def setup_channel_permissions(self, guild: discord.Guild, quarantine_role: discord.Role):
-        """為所有頻道設置隔離區角色的權限"""
-        try:
-            for channel in guild.text_channels:
-                await channel.set_permissions(
-                    quarantine_role,
-                    send_messages=False,
-                    add_reactions=False,
-                    reason="隔離區權限設置",
-                )
-
-            for channel in guild.voice_channels:
-                await channel.set_permissions(quarantine_role, connect=False, reason="隔離區權限設置")
-
-            self.logger.info(f"已為 {len(guild.channels)} 個頻道設置隔離區權限")
-
-        except discord.Forbidden:
-            self.logger.error("無權限設置頻道權限")
-        except Exception as e:
-            self.logger.error(f"設置頻道權限時發生錯誤: {e}", exc_info=True)
-
-    async def quarantine_user(self, guild: discord.Guild, member: discord.Member, reason: str = "自動隔離") -> bool:
-        """將用戶移動到隔離區"""
+    async def setup_channel_permissions(
+        self,
+        guild: discord.Guild,
+        quarantine_role: discord.Role,
+        progress: Optional[Callable[[PermissionSetupResult], Awaitable[None]]] = None,
+    ) -> PermissionSetupResult:
+        """
+        為所有頻道設置隔離區角色的權限
+
+        分類頻道先處理; Discord 不會把分類的權限變更推送給子頻道, 因此與分類同步的子頻道
+        改為重新同步 (一樣是一次請求, 但子頻道會保持同步, 之後分類的變更與新建的頻道都沿用分類設定).
+        已正確的頻道會跳過, 因此中途失敗後重新執行只會處理剩下的頻道
+        """
+        lock = self._setup_locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            categories = [c for c in guild.channels if isinstance(c, discord.CategoryChannel)]
+            others = [c for c in guild.channels if not isinstance(c, discord.CategoryChannel)]
+            # 分類更新後子頻道就不再與快取中的分類一致, 需要先記下原本同步的子頻道
+            synced = {c.id for c in others if c.category is not None and c.permissions_synced}
+            result = PermissionSetupResult(total=len(categories) + len(others))
+            semaphore = asyncio.Semaphore(PERMISSION_SETUP_CONCURRENCY)
+            last_report = time.monotonic()
+
+            def update(channel: discord.abc.GuildChannel, desired: dict[str, bool]):
+                # 分類已設置成功的同步子頻道直接沿用分類的權限覆寫
+                category = channel.category
+                if channel.id in synced and category is not None and category.id not in result.failed:
+                    return lambda: channel.edit(sync_permissions=True, reason="隔離區權限設置")  # type: ignore
+                overwrite = channel.overwrites_for(quarantine_role)
+                overwrite.update(**desired)
+                return lambda: channel.set_permissions(quarantine_role, overwrite=overwrite, reason="隔離區權限設置")
+
+            async def apply(channel: discord.abc.GuildChannel):
+                nonlocal last_report
+                desired = quarantine_overwrite(channel)
+                if has_overwrite(channel, quarantine_role, desired):
+                    result.skipped += 1
+                else:
+                    async with semaphore:
+                        try:
+                            await self.actions.submit(
+                                f"channel:{channel.id}",
+                                update(channel, desired),
+                                ActionPriority.SETUP,
+                                description=f"設置頻道 {channel.name} 的隔離區權限",
+                            )
+                            result.updated += 1
+                        except Exception:
+                            result.failed.append(channel.id)
+
+                if progress is not None and time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                    last_report = time.monotonic()
+                    await progress(result)
+
+            await asyncio.gather(*(apply(channel) for channel in categories))
+            await asyncio.gather(*(apply(channel) for channel in others))
+
+            if result.failed:
+                self.logger.error(f"伺服器 {guild.name} 有 {len(result.failed)} 個頻道設置隔離區權限失敗, 可重新執行設置")
+            self.logger.info(f"已設置伺服器 {guild.name} 的隔離區權限: {result.format()}")
+            return result
+
+    def purge_recent_messages(self, guild: discord.Guild, member: discord.Member) -> int:
+        """清除用戶近期的訊息, 每個頻道一次批次刪除, 返回排入刪除的訊息數"""
+        total = 0
+        for channel_id, message_ids in self.recent_messages.pop_user(guild.id, member.id).items():
+            channel = guild.get_channel_or_thread(channel_id)
+            if channel is None or not hasattr(channel, "delete_messages"):
+                continue
+            self.actions.delete_message_ids(channel, message_ids)  # type: ignore
+            total += len(message_ids)
+        return total
+
+    async def quarantine_user(
+        self, guild: discord.Guild, member: discord.Member, reason: str = "自動隔離", purge: bool = False
+    ) -> bool:
+        """將用戶移動到隔離區, purge 時一併清除其近期訊息"""
         try:
             quarantine_role = await self.get_or_create_quarantine_role(guild)
             if not quarantine_role:
                 return False
 
-            if quarantine_role in member.roles:
+            if purge:
+                purged = self.purge_recent_messages(guild, member)
+                if purged:
+                    self.logger.warning(f"清除用戶 {member} ({member.id}) 的 {purged} 則近期訊息")
+
+            if member.get_role(quarantine_role.id) is not None:
                 self.logger.info(f"用戶 {member} 已在隔離區")
                 return True
 
             guild_id = str(guild.id)
             user_id = str(member.id)
 
-            if guild_id not in self.quarantined_users:
-                self.quarantined_users[guild_id] = {}
-
             original_roles = [role.id for role in member.roles if role != guild.default_role]
-            self.quarantined_users[guild_id][user_id] = original_roles
+            self.store.set_quarantine(guild_id, user_id, original_roles)
 
             roles_to_remove = [role for role in member.roles if role != guild.default_role]
-            if roles_to_remove:
-                await member.remove_roles(*roles_to_remove, reason=f"隔離: {reason}")
-
-            await member.add_roles(quarantine_role, reason=reason)
+            await self.actions.edit_roles(
+                member, roles_to_remove, [quarantine_role], reason=f"隔離: {reason}", priority=ActionPriority.QUARANTINE
+            )
 
-            try:
-                embed = discord.Embed(
-                    title="您已被移至隔離區",
-                    description=f"由於可疑活動,您在 **{guild.name}** 已被暫時限制。",
-                    color=discord.Color.dark_red(),
-                    timestamp=datetime.now(),
-                )
-                embed.add_field(name="原因", value=reason, inline=False)
-                embed.add_field(
-                    name="如何解除",
-                    value="請聯繫伺服器管理員以了解詳情和解除限制。",
-                    inline=False,
-                )
-                await member.send(embed=embed)
-            except discord.Forbidden:
-                self.logger.warning(f"無法向用戶 {member} 發送私訊")
+            embed = discord.Embed(
+                title="您已被移至隔離區",
+                description=f"由於可疑活動,您在 **{guild.name}** 已被暫時限制。",
+                color=discord.Color.dark_red(),
+                timestamp=datetime.now(),
+            )
+            embed.add_field(name="原因", value=reason, inline=False)
+            embed.add_field(
+                name="如何解除",
+                value="請聯繫伺服器管理員以了解詳情和解除限制。",
+                inline=False,
+            )
+            self.actions.send(member, embed=embed)
+            # 精簡快取下不在快取中的成員不會觸發 on_member_update, 直接更新
+            self._members.get(guild.id, set()).add(member.id)
 
             self.logger.warning(f"已將用戶 {member} ({member.id}) 移至隔離區 | 原因: {reason}")
 
@@ -139,57 +357,58 @@ class QuarantineSystem(commands.Cog):
             #     value=f"{heat_value:.1f} ({danger_level})",
             #     inline=False,
             # )
+            self._quarantines.inc("ok")
             return True
 
         except discord.Forbidden:
             self.logger.error(f"無權限隔離用戶 {member}")
+            self._quarantines.inc("forbidden")
             return False
         except Exception as e:
             self.logger.error(f"隔離用戶時發生錯誤: {e}", exc_info=True)
+            self._quarantines.inc("error")
             return False
 
     async def release_user(self, guild: discord.Guild, member: discord.Member) -> bool:
         """從隔離區釋放用戶"""
         try:
-            quarantine_role = discord.utils.get(guild.roles, name=self.quarantine_role_name)
+            quarantine_role = self.get_quarantine_role(guild)
             if not quarantine_role:
                 self.logger.warning("找不到隔離區角色")
                 return False
 
-            if quarantine_role not in member.roles:
+            if member.get_role(quarantine_role.id) is None:
                 self.logger.info(f"用戶 {member} 不在隔離區")
                 return False
 
-            await member.remove_roles(quarantine_role, reason="釋放隔離")
-
             guild_id = str(guild.id)
             user_id = str(member.id)
 
-            if guild_id in self.quarantined_users and user_id in self.quarantined_users[guild_id]:
-                original_role_ids = self.quarantined_users[guild_id][user_id]
-                roles_to_restore = [guild.get_role(role_id) for role_id in original_role_ids]
-                roles_to_restore = [role for role in roles_to_restore if role]
+            roles_to_restore: list[discord.Role] = []
+            original_role_ids = self.quarantined_users.get(guild_id, {}).get(user_id)
+            if original_role_ids is not None:
+                restored = [guild.get_role(role_id) for role_id in original_role_ids]
+                roles_to_restore = [role for role in restored if role and not role.managed]
 
-                if roles_to_restore:
-                    await member.add_roles(*roles_to_restore, reason="恢復原有角色")
+            await self.actions.edit_roles(member, [quarantine_role], roles_to_restore, reason="釋放隔離並恢復原有角色")
 
-                del self.quarantined_users[guild_id][user_id]
+            if original_role_ids is not None:
+                self.store.pop_quarantine(guild_id, user_id)
 
             self.heat_system.reset_user_heat(str(guild.id), str(member.id))
+            self._members.get(guild.id, set()).discard(member.id)
 
             self.logger.info(f"已將用戶 {member} ({member.id}) 從隔離區釋放")
 
-            try:
-                embed = discord.Embed(
-                    title="您已從隔離區釋放",
-                    description=f"您在 **{guild.name}** 的限制已被解除。",
-                    color=discord.Color.green(),
-                    timestamp=datetime.now(),
-                )
-                await member.send(embed=embed)
-            except discord.Forbidden:
-                self.logger.warning(f"無法向用戶 {member} 發送私訊")
+            embed = discord.Embed(
+                title="您已從隔離區釋放",
+                description=f"您在 **{guild.name}** 的限制已被解除。",
+                color=discord.Color.green(),
+                timestamp=datetime.now(),
+            )
+            self.actions.send(member, embed=embed)
 
+            self._releases.inc()
             return True
 
         except discord.Forbidden:
@@ -206,12 +425,14 @@ class QuarantineSystem(commands.Cog):
         danger_level = self.heat_system.get_danger_level(str(guild.id), str(member.id))
 
         reason = f"熱力值過高 ({heat_value:.1f}) - {danger_level}"
-        await self.quarantine_user(guild, member, reason)
+        await self.quarantine_user(guild, member, reason, purge=True)
 
     @app_commands.command(name="quarantine", description="手動將用戶移至隔離區")
     @app_commands.default_permissions(moderate_members=True)
-    @app_commands.describe(member="要隔離的用戶", reason="隔離原因")
-    async def quarantine_cmd(self, interaction: discord.Interaction, member: discord.Member, reason: str = "手動隔離"):
+    @app_commands.describe(member="要隔離的用戶", reason="隔離原因", purge="是否清除用戶近期的訊息")
+    async def quarantine_cmd(
+        self, interaction: discord.Interaction, member: discord.Member, reason: str = "手動隔離", purge: bool = False
+    ):
         """手動將用戶移至隔離區"""
         if not interaction.guild:
             await interaction.response.send_message("此指令只能在伺服器中使用", ephemeral=True)
@@ -230,7 +451,7 @@ class QuarantineSystem(commands.Cog):
             return
 
         await interaction.response.defer()
-        success = await self.quarantine_user(interaction.guild, member, reason)
+        success = await self.quarantine_user(interaction.guild, member, reason, purge=purge)
         if success:
             await interaction.followup.send(f"✅ 已將 {member.mention} 移至隔離區")
         else:
@@ -261,34 +482,45 @@ class QuarantineSystem(commands.Cog):
             await interaction.response.send_message("此指令只能在伺服器中使用", ephemeral=True)
             return
 
-        quarantine_role = discord.utils.get(interaction.guild.roles, name=self.quarantine_role_name)
+        guild = interaction.guild
+        quarantine_role = self.get_quarantine_role(guild)
 
         if not quarantine_role:
             await interaction.response.send_message("⚠️ 隔離區角色不存在", ephemeral=True)
             return
 
-        quarantined_members = [member for member in interaction.guild.members if quarantine_role in member.roles]
+        quarantined_members = sorted(self.quarantined_member_ids(guild, quarantine_role))
 
         if not quarantined_members:
             await interaction.response.send_message("✅ 目前沒有用戶在隔離區", ephemeral=True)
             return
 
-        embed = discord.Embed(
-            title="🔒 隔離區用戶列表",
-            description=f"共 {len(quarantined_members)} 位用戶",
-            color=discord.Color.dark_red(),
-            timestamp=datetime.now(),
-        )
+        page_count = (len(quarantined_members) + LIST_PAGE_SIZE - 1) // LIST_PAGE_SIZE
 
-        for member in quarantined_members[:25]:
-            heat_value = self.heat_system.get_user_heat_data(str(interaction.guild.id), str(member.id)).heat_value
-            embed.add_field(
-                name=f"{member.display_name}",
-                value=f"{member.mention}\n熱力值: {heat_value:.1f}",
-                inline=True,
+        def render(page: int) -> discord.Embed:
+            embed = discord.Embed(
+                title="🔒 隔離區用戶列表",
+                description=f"共 {len(quarantined_members)} 位用戶",
+                color=discord.Color.dark_red(),
+                timestamp=datetime.now(),
             )
+            for user_id in quarantined_members[page * LIST_PAGE_SIZE : (page + 1) * LIST_PAGE_SIZE]:
+                member = guild.get_member(user_id)
+                heat_value = self.heat_system.get_user_heat_data(str(guild.id), str(user_id)).heat_value
+                embed.add_field(
+                    name=member.display_name if member else f"用戶 {user_id}",
+                    value=f"<@{user_id}>\n熱力值: {heat_value:.1f}",
+                    inline=True,
+                )
+            embed.set_footer(text=f"第 {page + 1}/{page_count} 頁")
+            return embed
 
-        await interaction.response.send_message(embed=embed)
+        if page_count == 1:
+            await interaction.response.send_message(embed=render(0))
+            return
+
+        view = QuarantineListView(render, page_count, interaction.user.id)
+        await interaction.response.send_message(embed=render(0), view=view)
 
     @app_commands.command(name="setupquarantine", description="設置隔離區系統 (創建角色和權限)")
     @app_commands.default_permissions(administrator=True)
@@ -298,16 +530,35 @@ class QuarantineSystem(commands.Cog):
             await interaction.response.send_message("此指令只能在伺服器中使用", ephemeral=True)
             return
 
+        lock = self._setup_locks.get(interaction.guild.id)
+        if lock is not None and lock.locked():
+            await interaction.response.send_message("⏳ 隔離區權限設置已在進行中", ephemeral=True)
+            return
+
         await interaction.response.send_message("⏳ 正在設置隔離區系統...")
 
-        quarantine_role = await self.get_or_create_quarantine_role(interaction.guild)
+        quarantine_role = await self.get_or_create_quarantine_role(interaction.guild, setup_permissions=False)
+        if not quarantine_role:
+            await interaction.edit_original_response(content="❌ 隔離區系統設置失敗")
+            return
+
+        async def report(result: PermissionSetupResult):
+            try:
+                await interaction.edit_original_response(content=f"⏳ 正在設置頻道權限... {result.format()}")
+            except discord.HTTPException:
+                pass
 
-        if quarantine_role:
+        result = await self.setup_channel_permissions(interaction.guild, quarantine_role, progress=report)
+
+        if result.failed:
             await interaction.edit_original_response(
-                content=f"✅ 隔離區系統設置完成！\n角色: {quarantine_role.mention}\n已為 {len(interaction.guild.channels)} 個頻道設置權限"
+                content=f"⚠️ 隔離區權限部分設置失敗\n角色: {quarantine_role.mention}\n{result.format()}\n"
+                "請檢查機器人權限後重新執行, 已完成的頻道會自動跳過"
             )
         else:
-            await interaction.edit_original_response(content="❌ 隔離區系統設置失敗")
+            await interaction.edit_original_response(
+                content=f"✅ 隔離區系統設置完成！\n角色: {quarantine_role.mention}\n{result.format()}"
+            )
 
 
 async def setup(bot):
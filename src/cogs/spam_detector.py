@@ -1,11 +1,15 @@
 from typing import Optional
+from functools import partial
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from logging import getLogger
-from collections import defaultdict, deque
-from datetime import datetime, timedelta
+from datetime import timedelta
+from core.action_queue import get_action_queue
+from core.guild_config import get_guild_configs
 from core.heat_system import get_heat_system
-from core.server_cache import ServerCache
+from core.message_pipeline import MessageFeatures, Verdict, get_message_pipeline
+from core.rate_limiter import WindowedCounter, get_history_budget
+from core.setting import SPAM_HISTORY_EVENTS
 
 logger = getLogger("xaoc")
 
@@ -15,71 +19,53 @@ class SpamDetector(commands.Cog):
         self.bot: commands.Bot = bot
         self.logger = getLogger("xaoc")
         self.heat_system = get_heat_system()
-        self.server_cache = ServerCache()
+        self.actions = get_action_queue()
+        self.pipeline = get_message_pipeline()
+        self.configs = get_guild_configs()
 
-        self.message_history: defaultdict[int, deque] = defaultdict(lambda: deque(maxlen=10))
-
-        self.MAX_MESSAGES_PER_INTERVAL = 5  # 時間區間內最大訊息數
+        # 時間窗決定共用的歷史紀錄結構, 所有伺服器相同; 各項門檻依伺服器設定
         self.TIME_INTERVAL = 5  # 秒數
-        self.MAX_IDENTICAL_MESSAGES = 3  # 最大重複訊息數
-        self.MENTION_SPAM_THRESHOLD = 5  # 最大 mention 數量
-
-        self.cleanup_history.start()
-
-    def cog_unload(self):
-        self.cleanup_history.cancel()
 
-    @tasks.loop(minutes=5)
-    async def cleanup_history(self):
-        """定期清理舊的訊息歷史"""
-        cutoff_time = datetime.now() - timedelta(minutes=10)
-        for user_id in list(self.message_history.keys()):
-            history = self.message_history[user_id]
+        self.message_history: WindowedCounter[tuple[int, int], str] = WindowedCounter(
+            self.TIME_INTERVAL, max_events=SPAM_HISTORY_EVENTS, budget=get_history_budget(), name="message_history"
+        )
 
-            while history and history[0][0] < cutoff_time:
-                history.popleft()
+    async def cog_load(self):
+        self.pipeline.register("spam_detector", self.inspect_message, priority=40)
 
-            if not history:
-                del self.message_history[user_id]
+    async def cog_unload(self):
+        self.pipeline.unregister("spam_detector")
+        get_history_budget().unregister("message_history")
 
-    @cleanup_history.before_loop
-    async def before_cleanup_history(self):
-        await self.bot.wait_until_ready()
-
-    def check_message_spam(self, user_id: int, message: discord.Message) -> tuple[bool, str]:
+    def check_message_spam(self, guild_id: int, user_id: int, features: MessageFeatures) -> tuple[bool, str]:
         """
-        檢查訊息是否為 spam
+        檢查訊息是否為 spam (每個伺服器分開計算)
         返回: (是否為spam, 原因)
         """
-        now = datetime.now()
-        history = self.message_history[user_id]
-        history.append((now, message.content.lower()))
-
-        recent_messages = [msg for msg in history if now - msg[0] <= timedelta(seconds=self.TIME_INTERVAL)]
-        if len(recent_messages) > self.MAX_MESSAGES_PER_INTERVAL:
+        config = self.configs.get(guild_id)
+        recent_messages = self.message_history.add((guild_id, user_id), features.lowered)
+        if len(recent_messages) > config.spam_max_messages:
             return True, f"短時間內發送過多訊息 ({len(recent_messages)}條/{self.TIME_INTERVAL}秒)"
 
-        if len(recent_messages) >= self.MAX_IDENTICAL_MESSAGES:
-            contents = [msg[1] for msg in recent_messages]
-            if len(set(contents)) == 1 and contents[0]:
-                return True, f"重複發送相同訊息 ({self.MAX_IDENTICAL_MESSAGES}次)"
+        if features.lowered and recent_messages.count(features.lowered) >= config.spam_max_identical:
+            return True, f"重複發送相同訊息 ({config.spam_max_identical}次)"
 
-        if len(message.mentions) > self.MENTION_SPAM_THRESHOLD:
-            return True, f"過多 mention ({len(message.mentions)}個)"
+        if features.mention_count > config.spam_max_mentions:
+            return True, f"過多 mention ({features.mention_count}個)"
 
-        if message.content.count("\n") > 30:
+        if features.newline_count > config.spam_max_newlines:
             return True, "訊息包含過多換行"
 
         return False, ""
 
-    async def handle_spam(self, message: discord.Message, reason: str, is_burst: bool = False):
-        """處理檢測到的 spam"""
+    async def handle_spam(
+        self, message: discord.Message, features: MessageFeatures, reason: str, is_burst: bool = False
+    ):
+        """處理檢測到的 spam (訊息已由管線刪除)"""
         try:
             if not message.guild:
                 return
 
-            await message.delete()
-
             self.heat_system.add_spam_violation(str(message.guild.id), str(message.author.id), is_burst=is_burst)
 
             heat_value = self.heat_system.get_user_heat_data(str(message.guild.id), str(message.author.id)).heat_value
@@ -95,40 +81,35 @@ class SpamDetector(commands.Cog):
                 self.bot.dispatch("user_high_risk", message.guild, message.author)
                 self.logger.warning(f"用戶 {message.author} 達到隔離門檻")
 
-            elif self.heat_system.should_timeout(str(message.guild.id), str(message.author.id)):
+            elif self.heat_system.should_timeout(str(message.guild.id), str(message.author.id)) and isinstance(
+                message.author, discord.Member
+            ):
                 timeout_duration = timedelta(minutes=10)
-                await message.author.timeout(timeout_duration, reason=f"Spam 檢測: {reason}")
-                self.logger.info(f"已禁言用戶 {message.author} 10分鐘")
+                self.actions.timeout_member(message.author, timeout_duration, reason=f"Spam 檢測: {reason}")
+                self.logger.info(f"已排入禁言用戶 {message.author} 10分鐘")
 
             heat_value = self.heat_system.get_user_heat_data(str(message.guild.id), str(message.author.id)).heat_value
-            if heat_value < 50:
-                try:
-                    danger_level = self.heat_system.get_danger_level(str(message.guild.id), str(message.author.id))
-                    await message.channel.send(
-                        f"{message.author.mention} 請勿發送垃圾訊息",
-                        delete_after=5,
-                    )
-                except Exception:
-                    pass
+            if heat_value < self.configs.get(message.guild.id).timeout_threshold:
+                self.actions.send(message.channel, f"{message.author.mention} 請勿發送垃圾訊息", delete_after=5)
 
         except discord.Forbidden:
             self.logger.error(f"無權限處理 spam 訊息，用戶: {message.author}")
         except Exception as e:
             self.logger.error(f"處理 spam 時發生錯誤: {e}", exc_info=True)
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
-        if message.author.bot or not message.guild:
-            return
+    def inspect_message(self, message: discord.Message, features: MessageFeatures) -> Optional[Verdict]:
+        if features.author_is_bot or not message.guild:
+            return None
 
-        if message.author.guild_permissions.administrator or message.author.guild_permissions.manage_messages:  # type: ignore
-            return
+        if features.author_is_moderator:
+            return None
 
-        is_spam, reason = self.check_message_spam(message.author.id, message)
+        is_spam, reason = self.check_message_spam(message.guild.id, message.author.id, features)
 
         if is_spam:
             is_burst = "短時間內發送過多訊息" in reason
-            await self.handle_spam(message, reason, is_burst=is_burst)
+            return Verdict(reason=reason, action=partial(self.handle_spam, reason=reason, is_burst=is_burst))
+        return None
 
 
 async def setup(bot):
@@ -0,0 +1,133 @@
+from collections import defaultdict
+from functools import partial
+from typing import Optional
+import time
+import discord
+from discord.ext import commands
+from logging import getLogger
+from core.action_queue import get_action_queue
+from core.cache_profile import resolve_member
+from core.fingerprint import FingerprintEntry, FingerprintHit, FingerprintIndex
+from core.heat_system import get_heat_system
+from core.message_pipeline import MessageFeatures, Verdict, get_message_pipeline
+from core.setting import Settings, get_settings
+
+logger = getLogger("xaoc")
+
+
+class SpamWaveDetector(commands.Cog):
+    """跨頻道、跨伺服器的協同垃圾訊息 (同一內容由多個帳號發送) 檢測"""
+
+    def __init__(self, bot):
+        self.bot: commands.Bot = bot
+        self.logger = getLogger("xaoc")
+        self.heat_system = get_heat_system()
+        self.pipeline = get_message_pipeline()
+        self.settings = get_settings().spam_wave
+
+        self.index = FingerprintIndex(
+            author_threshold=self.settings.author_threshold,
+            window_seconds=self.settings.window_seconds,
+            max_fingerprints=self.settings.max_fingerprints,
+            similarity_threshold=self.settings.similarity_threshold,
+            min_length=self.settings.min_length,
+            plain_author_threshold=self.settings.plain_author_threshold,
+            min_guilds=self.settings.min_guilds,
+            min_channels=self.settings.min_channels,
+            max_flag_seconds=self.settings.max_flag_seconds,
+        )
+
+    async def cog_load(self):
+        # 排在所有會阻擋訊息的檢測器之前, 邀請或釣魚連結被逐則刪除時也能記錄指紋;
+        # 只回傳非阻擋結果, 其他檢測器照常執行, 加熱力值與清除由 handle_wave 負責
+        self.pipeline.register("spam_wave", self.inspect_message, priority=-10)
+
+    async def cog_unload(self):
+        self.pipeline.unregister("spam_wave")
+
+    @commands.Cog.listener()
+    async def on_settings_update(self, old: Settings, new: Settings, changed: frozenset[str]):
+        if "spam_wave" not in changed:
+            return
+        self.settings = settings = new.spam_wave
+        self.index.author_threshold = settings.author_threshold
+        self.index.window_seconds = settings.window_seconds
+        self.index.max_fingerprints = settings.max_fingerprints
+        self.index.similarity_threshold = settings.similarity_threshold
+        self.index.min_length = settings.min_length
+        self.index.plain_author_threshold = settings.plain_author_threshold
+        self.index.min_guilds = settings.min_guilds
+        self.index.min_channels = settings.min_channels
+        self.index.max_flag_seconds = settings.max_flag_seconds
+
+    def inspect_message(self, message: discord.Message, features: MessageFeatures) -> Optional[Verdict]:
+        if not self.settings.enabled or features.guild_id is None:
+            return None
+
+        if features.author_is_bot or features.author_is_moderator:
+            return None
+
+        has_signal = bool(
+            features.urls
+            or features.mention_count
+            or message.role_mentions
+            or "@everyone" in features.content
+            or "@here" in features.content
+        )
+        hit = self.index.observe(
+            features.content,
+            time.time(),
+            features.guild_id,
+            features.author_id,
+            message.channel.id,
+            message.id,
+            has_signal,
+        )
+        if hit is None or not hit.flagged:
+            return None
+
+        return Verdict(
+            reason=f"跨伺服器協同垃圾訊息 ({hit.author_count} 位用戶)",
+            block=False,
+            action=partial(self.handle_wave, hit=hit),
+        )
+
+    async def handle_wave(self, message: discord.Message, features: MessageFeatures, hit: FingerprintHit):
+        """
+        對時間窗內的所有發送者加熱力值並清除訊息 (新標記時包含先前已送出的訊息)
+
+        其他檢測器已阻擋的訊息會在動作佇列中以訊息ID去重, 不會重複刪除
+        """
+        if hit.newly_flagged:
+            self.logger.warning(
+                f"檢測到協同垃圾訊息 | {hit.author_count} 位用戶 | {len(hit.entries)} 則訊息 | "
+                f"觸發用戶: {message.author} ({message.author.id})"
+            )
+        self.purge_entries(hit.entries)
+
+        senders = {(entry.guild_id, entry.user_id) for entry in hit.entries}
+        for guild_id, user_id in senders:
+            self.heat_system.add_spam_wave_violation(guild_id, user_id)
+
+            if self.heat_system.should_quarantine(guild_id, user_id):
+                guild = self.bot.get_guild(int(guild_id))
+                member = await resolve_member(guild, int(user_id)) if guild else None
+                if guild and member:
+                    self.bot.dispatch("user_high_risk", guild, member)
+
+    def purge_entries(self, entries: list[FingerprintEntry]):
+        """依頻道分組交給動作佇列, 每個頻道以批次刪除清除訊息"""
+        by_channel: defaultdict[int, list[int]] = defaultdict(list)
+        for entry in entries:
+            by_channel[entry.channel_id].append(entry.message_id)
+
+        actions = get_action_queue()
+        for channel_id, message_ids in by_channel.items():
+            channel = self.bot.get_channel(channel_id)
+            if channel is None or not hasattr(channel, "delete_messages"):
+                continue
+            actions.delete_message_ids(channel, message_ids)  # type: ignore
+
+
+async def setup(bot):
+    await bot.add_cog(SpamWaveDetector(bot))
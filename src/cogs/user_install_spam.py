@@ -3,9 +3,12 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 from logging import getLogger
-from collections import defaultdict, deque
 from datetime import datetime, timedelta
+from core.action_queue import get_action_queue
+from core.guild_config import get_guild_configs
 from core.heat_system import get_heat_system
+from core.rate_limiter import WindowedCounter, get_history_budget
+from core.setting import COMMAND_HISTORY_EVENTS
 
 logger = getLogger("xaoc")
 
@@ -15,32 +18,42 @@ class UserInstallSpamDetector(commands.Cog):
         self.bot: commands.Bot = bot
         self.logger = getLogger("xaoc")
         self.heat_system = get_heat_system()
+        self.configs = get_guild_configs()
 
-        self.command_history: defaultdict[int, deque] = defaultdict(lambda: deque(maxlen=20))
-
-        self.MAX_COMMANDS_PER_MINUTE = 10
-        self.MAX_IDENTICAL_COMMANDS = 5
+        # 時間窗所有伺服器相同, 指令數門檻依伺服器設定 (不在伺服器中時使用預設值)
         self.COMMAND_SPAM_WINDOW = 60
+        self.COMMAND_STATS_WINDOW = 300
+
+        # key 為 (伺服器ID, 用戶ID), 不在伺服器中執行時伺服器ID為 0
+        self.command_history: WindowedCounter[tuple[int, int], str] = WindowedCounter(
+            self.COMMAND_SPAM_WINDOW,
+            max_events=COMMAND_HISTORY_EVENTS,
+            budget=get_history_budget(),
+            name="command_history",
+        )
+        # /commandstats 顯示較長的時間範圍, 與檢測用的時間窗分開記錄
+        self.command_stats_history: WindowedCounter[tuple[int, int], str] = WindowedCounter(
+            self.COMMAND_STATS_WINDOW,
+            max_events=COMMAND_HISTORY_EVENTS,
+            budget=get_history_budget(),
+            name="command_stats",
+        )
 
-    def check_command_spam(self, user_id: int, command_name: str) -> tuple[bool, str]:
-        now = datetime.now()
-        history = self.command_history[user_id]
-
-        history.append((now, command_name))
+    async def cog_unload(self):
+        get_history_budget().unregister("command_history")
+        get_history_budget().unregister("command_stats")
 
-        window_start = now - timedelta(seconds=self.COMMAND_SPAM_WINDOW)
-        recent_commands = [cmd for cmd in history if cmd[0] >= window_start]
+    def check_command_spam(self, guild_id: int, user_id: int, command_name: str) -> tuple[bool, str]:
+        config = self.configs.get(guild_id)
+        recent_commands = self.command_history.add((guild_id, user_id), command_name)
+        self.command_stats_history.add((guild_id, user_id), command_name)
 
-        if len(recent_commands) > self.MAX_COMMANDS_PER_MINUTE:
+        if len(recent_commands) > config.command_max_per_window:
             return True, f"短時間內執行過多指令 ({len(recent_commands)}次/{self.COMMAND_SPAM_WINDOW}秒)"
 
-        command_counts = defaultdict(int)
-        for _, cmd_name in recent_commands:
-            command_counts[cmd_name] += 1
-
-        for cmd_name, count in command_counts.items():
-            if count >= self.MAX_IDENTICAL_COMMANDS:
-                return True, f"重複執行相同指令 ({cmd_name} x{count})"
+        count = recent_commands.count(command_name)
+        if count >= config.command_max_identical:
+            return True, f"重複執行相同指令 ({command_name} x{count})"
 
         return False, ""
 
@@ -66,18 +79,19 @@ class UserInstallSpamDetector(commands.Cog):
                 f"熱力值: {heat_value:.1f} | 危險等級: {danger_level}"
             )
 
+            # 伺服器中的互動 payload 已帶有成員資料, 不依賴成員快取
+            member = interaction.user if isinstance(interaction.user, discord.Member) else None
+
             if self.heat_system.should_quarantine(str(interaction.guild.id), str(interaction.user.id)):
-                member = interaction.guild.get_member(interaction.user.id)
                 if member:
                     self.bot.dispatch("user_high_risk", interaction.guild, member)
                     self.logger.warning(f"用戶 {interaction.user} 因 user install spam 達到隔離門檻")
 
             elif self.heat_system.should_timeout(str(interaction.guild.id), str(interaction.user.id)):
-                member = interaction.guild.get_member(interaction.user.id)
                 if member:
                     timeout_duration = timedelta(minutes=15)
-                    await member.timeout(timeout_duration, reason=f"User Install Spam: {reason}")
-                    self.logger.info(f"已禁言用戶 {interaction.user} 15分鐘")
+                    get_action_queue().timeout_member(member, timeout_duration, reason=f"User Install Spam: {reason}")
+                    self.logger.info(f"已排入禁言用戶 {interaction.user} 15分鐘")
 
         except Exception as e:
             self.logger.error(f"處理 user install spam 時發生錯誤: {e}", exc_info=True)
@@ -92,7 +106,7 @@ class UserInstallSpamDetector(commands.Cog):
 
         command_name = interaction.data.get("name", "unknown") if interaction.data else "unknown"
 
-        is_spam, reason = self.check_command_spam(interaction.user.id, command_name)
+        is_spam, reason = self.check_command_spam(interaction.guild_id or 0, interaction.user.id, command_name)
 
         if is_spam:
             await self.handle_command_spam(interaction, command_name, reason)
@@ -113,33 +127,25 @@ class UserInstallSpamDetector(commands.Cog):
                 await interaction.response.send_message("無法取得用戶資訊", ephemeral=True)
                 return
 
-        history = self.command_history.get(member.id, deque())
+        recent_commands = self.command_stats_history.get((interaction.guild_id or 0, member.id))
 
-        if not history:
+        if not recent_commands:
             await interaction.response.send_message(f"{member.mention} 尚未使用任何指令", ephemeral=True)
             return
 
-        now = datetime.now()
-        window_start = now - timedelta(minutes=5)
-        recent_commands = [cmd for cmd in history if cmd[0] >= window_start]
-
-        command_counts = defaultdict(int)
-        for _, cmd_name in recent_commands:
-            command_counts[cmd_name] += 1
-
         display_name = getattr(member, "display_name", getattr(member, "name", str(member.id)))
         embed = discord.Embed(
             title=f"📊 {display_name} 的指令統計",
-            description="最近 5 分鐘的指令使用情況",
+            description=f"最近 {self.COMMAND_STATS_WINDOW // 60} 分鐘的指令使用情況",
             color=discord.Color.blue(),
             timestamp=datetime.now(),
         )
 
         embed.add_field(name="總指令數", value=str(len(recent_commands)), inline=True)
-        embed.add_field(name="不同指令數", value=str(len(command_counts)), inline=True)
+        embed.add_field(name="不同指令數", value=str(len(recent_commands.counts)), inline=True)
 
-        if command_counts:
-            top_commands = sorted(command_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+        if recent_commands.counts:
+            top_commands = recent_commands.most_common(5)
             commands_text = "\n".join(f"• `{cmd}`: {count} 次" for cmd, count in top_commands)
             embed.add_field(name="最常用指令", value=commands_text, inline=False)
 
@@ -159,8 +165,9 @@ class UserInstallSpamDetector(commands.Cog):
     @app_commands.describe(member="要清除歷史的用戶")
     async def clear_command_history(self, interaction: discord.Interaction, member: discord.Member):
         """清除用戶的指令歷史記錄"""
-        if member.id in self.command_history:
-            del self.command_history[member.id]
+        key = (interaction.guild_id or 0, member.id)
+        removed_stats = self.command_stats_history.remove(key)
+        if self.command_history.remove(key) or removed_stats:
             await interaction.response.send_message(f"✅ 已清除 {member.mention} 的指令歷史記錄")
         else:
             await interaction.response.send_message(f"{member.mention} 沒有指令歷史記錄", ephemeral=True)
@@ -0,0 +1,329 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Hashable, Optional
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+import discord
+
+from .metrics import get_metrics
+
+logger = logging.getLogger("xaoc")
+
+BULK_DELETE_LIMIT = 100  # Discord 單次批次刪除上限
+DELETE_DEDUP_TTL = 60.0  # 已刪除的訊息在這段時間內不會再次排入刪除 (例如協同垃圾訊息的事後清除)
+
+
+class ActionPriority(IntEnum):
+    """數字越小越優先"""
+
+    QUARANTINE = 0
+    KICK = 1
+    TIMEOUT = 2
+    DELETE = 3
+    ROLE = 4
+    NOTICE = 5  # 警告訊息、私訊等非必要動作
+    SETUP = 6  # 批次設定 (頻道權限等), 不應擋住即時的處置
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    route: str = field(compare=False)
+    factory: Callable[[], Awaitable[Any]] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    dedup_key: Optional[Hashable] = field(default=None, compare=False)
+    dedup_ttl: float = field(default=0.0, compare=False)
+    description: str = field(default="", compare=False)
+
+
+@dataclass
+class _Route:
+    pending: list[_Job] = field(default_factory=list)
+    active: int = 0
+
+
+class _PriorityGate:
+    """依優先序放行的 semaphore, 全局同時執行數有限時讓隔離/踢出先跑"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority: int) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class ActionQueue:
+    """
+    集中式的管理動作佇列
+
+    - 依 route (大致對應 Discord 的速率限制分桶) 限制同時執行數
+    - 相同 dedup_key 的動作在執行中或 TTL 內只會執行一次
+    - 全局並發有限時依優先序放行
+    - 同一頻道的待刪除訊息會合併成批次刪除
+    """
+
+    def __init__(self, max_concurrency: int = 16, route_concurrency: int = 2):
+        self.route_concurrency = route_concurrency
+        self._gate = _PriorityGate(max_concurrency)
+        self._routes: dict[str, _Route] = {}
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self._recent: OrderedDict[Hashable, tuple[float, asyncio.Future]] = OrderedDict()
+        self._pending_deletes: dict[int, tuple[discord.abc.Messageable, list[int]]] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._seq = itertools.count()
+
+        metrics = get_metrics()
+        self._completed = metrics.counter("moderation_actions_total", "管理動作執行次數", ("action", "result"))
+        self._deleted = metrics.counter("messages_deleted_total", "自動刪除的訊息數")
+
+    def submit(
+        self,
+        route: str,
+        factory: Callable[[], Awaitable[Any]],
+        priority: ActionPriority = ActionPriority.NOTICE,
+        dedup_key: Optional[Hashable] = None,
+        dedup_ttl: float = 0.0,
+        description: str = "",
+    ) -> asyncio.Future:
+        """排入一個動作, 返回可 await 的結果 (重複的動作會拿到同一個結果)"""
+        if dedup_key is not None:
+            existing = self._find_duplicate(dedup_key)
+            if existing is not None:
+                return existing
+
+        future = asyncio.get_running_loop().create_future()
+        job = _Job(int(priority), next(self._seq), route, factory, future, dedup_key, dedup_ttl, description)
+        if dedup_key is not None:
+            self._inflight[dedup_key] = future
+
+        state = self._routes.get(route)
+        if state is None:
+            state = self._routes[route] = _Route()
+        heapq.heappush(state.pending, job)
+        self._pump(route, state)
+        return future
+
+    def _find_duplicate(self, dedup_key: Hashable) -> Optional[asyncio.Future]:
+        future = self._inflight.get(dedup_key)
+        if future is not None:
+            return future
+
+        now = time.monotonic()
+        while self._recent:
+            oldest_key, (expire_at, _) = next(iter(self._recent.items()))
+            if expire_at > now:
+                break
+            del self._recent[oldest_key]
+
+        recent = self._recent.get(dedup_key)
+        return recent[1] if recent is not None else None
+
+    def _pump(self, route: str, state: _Route) -> None:
+        while state.active < self.route_concurrency and state.pending:
+            job = heapq.heappop(state.pending)
+            state.active += 1
+            task = asyncio.create_task(self._run(state, job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if state.active == 0 and not state.pending:
+            self._routes.pop(route, None)
+
+    async def _run(self, state: _Route, job: _Job) -> None:
+        await self._gate.acquire(job.priority)
+        try:
+            result = await job.factory()
+        except Exception as e:
+            self._completed.inc(ActionPriority(job.priority).name.lower(), type(e).__name__)
+            if isinstance(e, discord.Forbidden):
+                logger.warning(f"無權限執行管理動作 [{job.route}] {job.description}")
+            elif not isinstance(e, discord.NotFound):
+                logger.error(f"執行管理動作失敗 [{job.route}] {job.description}: {e}")
+            if not job.future.done():
+                job.future.set_exception(e)
+                job.future.exception()  # 沒有人 await 時避免 "exception never retrieved"
+        else:
+            self._completed.inc(ActionPriority(job.priority).name.lower(), "ok")
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._gate.release()
+            if job.dedup_key is not None:
+                self._inflight.pop(job.dedup_key, None)
+                if job.dedup_ttl > 0:
+                    self._recent[job.dedup_key] = (time.monotonic() + job.dedup_ttl, job.future)
+                    self._recent.move_to_end(job.dedup_key)
+            state.active -= 1
+            self._pump(job.route, state)
+
+    def delete_message(self, message: discord.Message) -> asyncio.Future:
+        """刪除訊息, 同一頻道中累積的刪除會合併為一次批次刪除"""
+        return self.delete_message_ids(message.channel, [message.id])[0]
+
+    def delete_message_ids(self, channel: discord.abc.Messageable, message_ids: list[int]) -> list[asyncio.Future]:
+        channel_id: int = channel.id  # type: ignore
+        futures = []
+        new_ids = []
+        for message_id in message_ids:
+            dedup_key = ("delete", message_id)
+            existing = self._find_duplicate(dedup_key)
+            if existing is not None:
+                futures.append(existing)
+                continue
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[dedup_key] = future
+            futures.append(future)
+            new_ids.append(message_id)
+
+        if new_ids:
+            pending = self._pending_deletes.get(channel_id)
+            if pending is None:
+                self._pending_deletes[channel_id] = (channel, new_ids)
+                self.submit(
+                    f"delete:{channel_id}",
+                    lambda: self._flush_deletes(channel_id),
+                    ActionPriority.DELETE,
+                    description=f"刪除頻道 {channel_id} 的訊息",
+                )
+            else:
+                pending[1].extend(new_ids)
+        return futures
+
+    async def _flush_deletes(self, channel_id: int) -> None:
+        channel, message_ids = self._pending_deletes.pop(channel_id, (None, []))
+        if channel is None:
+            return
+
+        for start in range(0, len(message_ids), BULK_DELETE_LIMIT):
+            chunk = message_ids[start : start + BULK_DELETE_LIMIT]
+            error: Optional[Exception] = None
+            try:
+                if len(chunk) == 1:
+                    await channel.get_partial_message(chunk[0]).delete()  # type: ignore
+                else:
+                    await channel.delete_messages([discord.Object(id=i) for i in chunk], reason="自動清除")  # type: ignore
+            except discord.NotFound:
+                pass
+            except Exception as e:
+                error = e
+                logger.error(f"刪除頻道 {channel_id} 的 {len(chunk)} 則訊息失敗: {e}")
+            else:
+                self._deleted.inc(amount=len(chunk))
+
+            expire_at = time.monotonic() + DELETE_DEDUP_TTL
+            for message_id in chunk:
+                future = self._inflight.pop(("delete", message_id), None)
+                if future is not None and not future.done():
+                    if error is None:
+                        future.set_result(None)
+                        self._recent[("delete", message_id)] = (expire_at, future)
+                        self._recent.move_to_end(("delete", message_id))
+                    else:
+                        future.set_exception(error)
+                        future.exception()
+
+    def timeout_member(self, member: discord.Member, duration: timedelta, reason: str) -> asyncio.Future:
+        """禁言成員, 同一成員一分鐘內只會執行一次"""
+        return self.submit(
+            f"member:{member.guild.id}",
+            lambda: member.timeout(duration, reason=reason),
+            ActionPriority.TIMEOUT,
+            dedup_key=("timeout", member.guild.id, member.id),
+            dedup_ttl=60.0,
+            description=f"禁言 {member}",
+        )
+
+    def kick_member(self, member: discord.Member, reason: str) -> asyncio.Future:
+        return self.submit(
+            f"member:{member.guild.id}",
+            lambda: member.kick(reason=reason),
+            ActionPriority.KICK,
+            dedup_key=("kick", member.guild.id, member.id),
+            dedup_ttl=60.0,
+            description=f"踢出 {member}",
+        )
+
+    def edit_roles(
+        self,
+        member: discord.Member,
+        remove: list[discord.Role],
+        add: list[discord.Role],
+        reason: str,
+        priority: ActionPriority = ActionPriority.ROLE,
+    ) -> asyncio.Future:
+        """移除並加入角色 (一次 API 呼叫), 無法移除的整合角色會保留"""
+        keep = [role for role in member.roles if not role.is_default() and (role.managed or role not in remove)]
+        roles = keep + [role for role in add if role not in keep]
+        return self.submit(
+            f"member:{member.guild.id}",
+            lambda: member.edit(roles=roles, reason=reason),
+            priority,
+            dedup_key=("roles", member.guild.id, member.id, tuple(role.id for role in roles)),
+            description=f"變更 {member} 的角色",
+        )
+
+    def send(self, destination: discord.abc.Messageable, *args, **kwargs) -> asyncio.Future:
+        """送出非必要的訊息 (警告、私訊), 優先序最低"""
+        return self.submit(
+            "send",
+            lambda: destination.send(*args, **kwargs),
+            ActionPriority.NOTICE,
+            description="送出訊息",
+        )
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "routes": len(self._routes),
+            "pending": sum(len(state.pending) for state in self._routes.values()),
+            "active": sum(state.active for state in self._routes.values()),
+            "pending_deletes": sum(len(ids) for _, ids in self._pending_deletes.values()),
+        }
+
+    async def drain(self, timeout: float = 5.0) -> None:
+        """等待目前的動作執行完畢 (關機時使用)"""
+        deadline = time.monotonic() + timeout
+        while self._tasks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"關機時仍有 {len(self._tasks)} 個管理動作未完成")
+                return
+            # 完成的動作會從同一個 route 接續排入下一個, 因此需要重複等待
+            await asyncio.wait(list(self._tasks), timeout=remaining)
+
+
+_action_queue: Optional[ActionQueue] = None
+
+
+def get_action_queue() -> ActionQueue:
+    """獲取全局管理動作佇列"""
+    global _action_queue
+    if _action_queue is None:
+        _action_queue = ActionQueue()
+    return _action_queue
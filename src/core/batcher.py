@@ -0,0 +1,102 @@
+from collections import deque
+from typing import Awaitable, Callable, Generic, Optional, TypeVar
+import asyncio
+import logging
+import time
+
+T = TypeVar("T")
+
+logger = logging.getLogger("xaoc")
+
+
+class MicroBatcher(Generic[T]):
+    """
+    將短時間內的事件累積成批次處理
+
+    第一筆事件進來後等待 window 秒再處理, 累積到 max_batch 筆時立即處理;
+    同一時間只有一個批次在執行, 執行期間進來的事件留給下一批, 因此事件量越大
+    每批越大, 處理量會隨負載自然提高而不會堆積大量任務
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[list[T]], Awaitable[None]],
+        window: float = 1.0,
+        max_batch: int = 100,
+        name: str = "batcher",
+    ):
+        self.handler = handler
+        self.window = window
+        self.max_batch = max_batch
+        self.name = name
+
+        self._pending: deque[tuple[float, T]] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.batches = 0
+        self.items = 0
+        self.high_water = 0
+        self.last_batch_size = 0
+        self.last_lag = 0.0  # 最後一批中最早的事件等待了多久才被處理
+        self.max_lag = 0.0
+
+    def put(self, item: T) -> None:
+        self._pending.append((time.monotonic(), item))
+        self.high_water = max(self.high_water, len(self._pending))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while self._pending:
+            # 以最早一筆事件進來的時間計算等待, 已經等夠久或累積夠多時直接處理
+            remaining = self.window - (time.monotonic() - self._pending[0][0])
+            if not self._closing and remaining > 0 and len(self._pending) < self.max_batch:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+
+            size = min(len(self._pending), self.max_batch)
+            batch = [self._pending.popleft() for _ in range(size)]
+            if not batch:
+                continue
+
+            self.last_lag = time.monotonic() - batch[0][0]
+            self.max_lag = max(self.max_lag, self.last_lag)
+            self.batches += 1
+            self.items += size
+            self.last_batch_size = size
+            try:
+                await self.handler([item for _, item in batch])
+            except Exception as e:
+                logger.error(f"[{self.name}] 批次處理時發生錯誤: {e}", exc_info=True)
+
+            if len(self._pending) >= self.max_batch:
+                self._wakeup.set()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "pending": len(self._pending),
+            "high_water": self.high_water,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": self.items / self.batches if self.batches else 0.0,
+            "last_batch": self.last_batch_size,
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag,
+        }
+
+    async def close(self) -> None:
+        """處理剩餘的事件後停止"""
+        self._closing = True
+        if self._task is not None and not self._task.done():
+            self._wakeup.set()
+            await self._task
@@ -0,0 +1,127 @@
+from typing import Any, Iterable, Optional
+import importlib
+import logging
+import os
+import sys
+
+import discord
+from discord.ext import commands
+
+from .setting import CacheSettings
+
+logger = logging.getLogger("xaoc")
+
+BASE_INTENTS = ("guilds",)  # 角色、頻道與權限計算都需要
+
+# 監聽的事件需要的 intents, 未列出的事件 (自訂事件、on_interaction 等) 不需要額外 intent
+EVENT_INTENTS: dict[str, tuple[str, ...]] = {
+    "on_message": ("guild_messages", "message_content"),
+    "on_message_edit": ("guild_messages", "message_content"),
+    "on_message_delete": ("guild_messages",),
+    "on_raw_message_delete": ("guild_messages",),
+    "on_member_join": ("members",),
+    "on_member_remove": ("members",),
+    "on_member_update": ("members",),
+    "on_raw_member_remove": ("members",),
+    "on_member_ban": ("moderation",),
+    "on_member_unban": ("moderation",),
+    "on_reaction_add": ("guild_reactions",),
+    "on_raw_reaction_add": ("guild_reactions",),
+    "on_voice_state_update": ("voice_states",),
+    "on_presence_update": ("presences",),
+    "on_invite_create": ("invites",),
+    "on_invite_delete": ("invites",),
+}
+
+
+def listened_events(extensions: Iterable[str]) -> set[str]:
+    """匯入 cog 模組 (不建立實例), 從 Cog 類別收集監聽的事件名稱"""
+    events: set[str] = set()
+    for name in extensions:
+        try:
+            module = importlib.import_module(name)
+        except Exception as e:
+            logger.error(f"計算 intents 時無法匯入 {name}: {e}")
+            continue
+        for obj in vars(module).values():
+            if isinstance(obj, type) and issubclass(obj, commands.Cog) and obj.__module__ == module.__name__:
+                events.update(event for event, _ in obj.__cog_listeners__)
+    return events
+
+
+def required_intents(extensions: Iterable[str]) -> discord.Intents:
+    intents = discord.Intents.none()
+    for event in listened_events(extensions):
+        for flag in EVENT_INTENTS.get(event, ()):
+            setattr(intents, flag, True)
+    for flag in BASE_INTENTS:
+        setattr(intents, flag, True)
+    return intents
+
+
+def build_client_options(settings: CacheSettings, extensions: Iterable[str]) -> dict[str, Any]:
+    """
+    依快取設定產生 Client 的 intents 與快取參數
+
+    lean: 只訂閱已載入 cog 需要的事件, 成員快取只保留啟動後加入 (或被下載) 的成員;
+          檢測器需要的成員都來自事件 payload, 不依賴完整的成員快取
+    full: Intents.all() 與 discord.py 的預設成員快取
+    """
+    if settings.profile == "full":
+        intents = discord.Intents.all()
+        member_cache_flags = discord.MemberCacheFlags.from_intents(intents)
+    else:
+        intents = required_intents(extensions)
+        member_cache_flags = discord.MemberCacheFlags.none()
+        member_cache_flags.joined = intents.members
+
+    enabled = [name for name, value in intents if value]
+    logger.info(f"快取設定: {settings.profile} | intents: {', '.join(enabled)}")
+    return {
+        "intents": intents,
+        "member_cache_flags": member_cache_flags,
+        # discord.py 會把 0 當成預設值 1000, 停用需要傳 None
+        "max_messages": settings.max_messages or None,
+        "chunk_guilds_at_startup": settings.chunk_guilds_at_startup,
+    }
+
+
+def process_rss() -> Optional[int]:
+    """目前行程的常駐記憶體 (位元組), 無法取得時返回 None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+
+        # 非 Linux 平台只能取得峰值 (macOS 的單位是位元組, 其他為 KiB)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None
+
+
+def cached_member_count(client: discord.Client) -> int:
+    return sum(len(guild.members) for guild in client.guilds)
+
+
+def memory_report(client: discord.Client) -> str:
+    rss = process_rss()
+    rss_text = f"{rss / 1024 / 1024:.1f} MiB" if rss is not None else "未知"
+    return (
+        f"記憶體: {rss_text} | 伺服器: {len(client.guilds)} | 快取成員: {cached_member_count(client)} | "
+        f"快取用戶: {len(client.users)} | 快取訊息: {len(client.cached_messages)}"
+    )
+
+
+async def resolve_member(guild: discord.Guild, user_id: int) -> Optional[discord.Member]:
+    """先查成員快取, 沒有時以 API 取得 (精簡快取下舊成員不在快取中)"""
+    member = guild.get_member(user_id)
+    if member is not None:
+        return member
+    try:
+        return await guild.fetch_member(user_id)
+    except discord.HTTPException:
+        return None
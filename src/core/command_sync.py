@@ -0,0 +1,69 @@
+from pathlib import Path
+from typing import Optional
+import asyncio
+import hashlib
+import json
+import logging
+
+import discord
+from discord import app_commands
+
+logger = logging.getLogger("xaoc")
+
+
+def tree_hash(tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None) -> str:
+    """以送往 Discord 的指令定義計算雜湊, 指令內容不變時雜湊就不變"""
+    payload = sorted(
+        (command.to_dict(tree) for command in tree.get_commands(guild=guild)),
+        key=lambda data: (data.get("type", 1), data["name"]),
+    )
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class CommandSyncState:
+    """記錄每個範圍 (全域或伺服器) 上次同步的指令雜湊"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    def _read(self) -> dict[str, str]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, hashes: dict[str, str]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(hashes, f, indent=2)
+        tmp_path.replace(self.path)
+
+    async def get(self, key: str) -> Optional[str]:
+        return (await asyncio.to_thread(self._read)).get(key)
+
+    async def set(self, key: str, value: str) -> None:
+        hashes = await asyncio.to_thread(self._read)
+        hashes[key] = value
+        await asyncio.to_thread(self._write, hashes)
+
+
+async def sync_if_changed(
+    tree: app_commands.CommandTree,
+    state: CommandSyncState,
+    application_id: Optional[int],
+    guild: Optional[discord.abc.Snowflake] = None,
+    force: bool = False,
+) -> bool:
+    """只有指令定義與上次同步時不同才呼叫 tree.sync, 返回是否實際同步"""
+    key = f"{application_id}:{guild.id if guild else 'global'}"
+    current = tree_hash(tree, guild)
+    if not force and await state.get(key) == current:
+        logger.info(f"斜線指令未變更, 略過同步 ({key})")
+        return False
+
+    synced = await tree.sync(guild=guild)
+    await state.set(key, current)
+    logger.info(f"已同步 {len(synced)} 個斜線指令 ({key})")
+    return True
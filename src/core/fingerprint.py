@@ -0,0 +1,302 @@
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from hashlib import blake2b
+from typing import NamedTuple, Optional
+import itertools
+import random
+import re
+import unicodedata
+
+# MinHash 簽章分成 16 段、每段 4 個值做 LSH: Jaccard 0.6 的內容約 89% 會成為候選,
+# 0.8 以上幾乎必定成為候選, 0.3 以下只有約 12%; 候選再以估計的 Jaccard 相似度確認
+MINHASH_SIZE = 64
+MINHASH_BANDS = 16
+_BAND_ROWS = MINHASH_SIZE // MINHASH_BANDS
+# 空桶依各自固定的順序向其他桶借值 (optimal densification), 種子固定讓重新啟動後簽章不變
+_random = random.Random(0x58414F43)
+_PROBE_ORDERS = [_random.sample(range(MINHASH_SIZE), MINHASH_SIZE) for _ in range(MINHASH_SIZE)]
+MIN_SIGNATURE_TOKENS = 4
+MAX_SHINGLE_TOKENS = 128
+MAX_ENTRIES_PER_CLUSTER = 200
+
+_MENTION_PATTERN = re.compile(r"<(?:@[!&]?|#)\d+>")
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_content(content: str) -> str:
+    """去除 mention、標點與多餘空白, 讓只換了對象或排版的訊息得到相同結果"""
+    content = _MENTION_PATTERN.sub(" ", content)
+    content = unicodedata.normalize("NFKC", content).casefold()
+    return " ".join(_TOKEN_PATTERN.findall(content))
+
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def minhash(tokens: list[str]) -> tuple[int, ...]:
+    """
+    以詞集合計算 MinHash 簽章, 兩份簽章相同位置相等的比例即為 Jaccard 相似度的估計值
+
+    以單詞為 shingle: 改一個詞或加上隨機後綴只影響一兩個元素, 短訊息也能維持高相似度.
+    使用 one permutation hashing: 每個詞只計算一次 hash, 依低位元分桶並保留桶內最小值,
+    成本與詞數成正比, 不需要對每個排列各算一次
+    """
+    bins: list[Optional[int]] = [None] * MINHASH_SIZE
+    for token in set(tokens):
+        h = _hash64(token)
+        index, value = h % MINHASH_SIZE, h // MINHASH_SIZE
+        current = bins[index]
+        if current is None or value < current:
+            bins[index] = value
+
+    signature = list(bins)
+    for index in range(MINHASH_SIZE):
+        if bins[index] is None:
+            for probe in _PROBE_ORDERS[index]:
+                value = bins[probe]
+                if value is not None:
+                    signature[index] = value
+                    break
+    return tuple(signature)  # type: ignore
+
+
+def estimate_similarity(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / MINHASH_SIZE
+
+
+def _band_keys(signature: tuple[int, ...]) -> list[tuple[int, ...]]:
+    return [signature[band * _BAND_ROWS : (band + 1) * _BAND_ROWS] for band in range(MINHASH_BANDS)]
+
+
+class FingerprintEntry(NamedTuple):
+    timestamp: float
+    user_id: str
+    guild_id: str
+    channel_id: int
+    message_id: int
+    has_signal: bool  # 內容含有網址、邀請或 mention
+
+
+def _increment(counts: dict, key) -> None:
+    counts[key] = counts.get(key, 0) + 1
+
+
+def _decrement(counts: dict, key) -> None:
+    remaining = counts[key] - 1
+    if remaining:
+        counts[key] = remaining
+    else:
+        del counts[key]
+
+
+class _Cluster:
+    """同一份 (或近似) 內容在時間窗內的出現紀錄"""
+
+    __slots__ = (
+        "id",
+        "exact",
+        "signature",
+        "entries",
+        "authors",
+        "guilds",
+        "channels",
+        "signals",
+        "flagged_at",
+        "flagged_until",
+    )
+
+    def __init__(self, cluster_id: int, exact: int, signature: Optional[tuple[int, ...]]):
+        self.id = cluster_id
+        self.exact = exact
+        self.signature = signature
+        self.entries: deque[FingerprintEntry] = deque(maxlen=MAX_ENTRIES_PER_CLUSTER)
+        self.authors: dict[str, int] = {}
+        self.guilds: dict[str, int] = {}
+        self.channels: dict[int, int] = {}
+        self.signals = 0
+        self.flagged_at = 0.0
+        self.flagged_until = 0.0
+
+    def _pop_oldest(self) -> None:
+        entry = self.entries.popleft()
+        _decrement(self.authors, entry.user_id)
+        _decrement(self.guilds, entry.guild_id)
+        _decrement(self.channels, entry.channel_id)
+        self.signals -= entry.has_signal
+
+    def expire(self, cutoff: float) -> None:
+        while self.entries and self.entries[0].timestamp < cutoff:
+            self._pop_oldest()
+
+    def add(self, entry: FingerprintEntry) -> None:
+        if len(self.entries) == self.entries.maxlen:
+            self._pop_oldest()
+        self.entries.append(entry)
+        _increment(self.authors, entry.user_id)
+        _increment(self.guilds, entry.guild_id)
+        _increment(self.channels, entry.channel_id)
+        self.signals += entry.has_signal
+
+
+@dataclass(slots=True)
+class FingerprintHit:
+    flagged: bool
+    newly_flagged: bool
+    author_count: int
+    entries: list[FingerprintEntry]  # 新標記時為時間窗內所有紀錄, 否則只有本次訊息
+
+
+class FingerprintIndex:
+    """
+    跨伺服器的訊息指紋索引
+
+    以正規化內容的 hash 做完全比對, 沒有相同內容時才計算 MinHash 並以 LSH 分段找出近似內容
+    (例如只改了連結路徑或加上隨機後綴), 每則訊息的查詢與寫入都只需要少量 dict 操作;
+    指紋數量以 LRU 限制上限
+
+    多數訊息含有網址、邀請或 mention 的內容達到 author_threshold 位用戶即標記; 純文字
+    (問候、梗) 需要 plain_author_threshold 位用戶且分散在多個伺服器與頻道才標記.
+    標記期間再次出現會延長標記, 但最長不超過 max_flag_seconds
+
+    >>> index = FingerprintIndex()
+    >>> base = "Free nitro for everyone click here https://disc0rd.gift/abc now"
+    >>> variants = [
+    ...     base,
+    ...     base + " please",
+    ...     base.replace("/abc", "/x9k2"),
+    ...     base.replace("everyone", "all"),
+    ...     base + " 8f3kq",
+    ... ]
+    >>> hits = [index.observe(text, 1e9 + i, "1", f"u{i}", 1, i, True) for i, text in enumerate(variants)]
+    >>> len(index), hits[-1].author_count, hits[-1].newly_flagged
+    (1, 5, True)
+    >>> index.observe("good morning everyone, have a nice day", 1e9, "1", "u9", 1, 9).author_count
+    1
+    """
+
+    def __init__(
+        self,
+        author_threshold: int = 5,
+        window_seconds: float = 60.0,
+        max_fingerprints: int = 50000,
+        similarity_threshold: float = 0.6,
+        min_length: int = 20,
+        plain_author_threshold: int = 10,
+        min_guilds: int = 2,
+        min_channels: int = 4,
+        max_flag_seconds: float = 600.0,
+    ):
+        self.author_threshold = author_threshold
+        self.plain_author_threshold = plain_author_threshold
+        self.min_guilds = min_guilds
+        self.min_channels = min_channels
+        self.max_flag_seconds = max_flag_seconds
+        self.window_seconds = window_seconds
+        self.max_fingerprints = max_fingerprints
+        self.similarity_threshold = similarity_threshold
+        self.min_length = min_length
+
+        self._clusters: OrderedDict[int, _Cluster] = OrderedDict()
+        self._by_exact: dict[int, _Cluster] = {}
+        self._bands: list[dict[tuple[int, ...], set[_Cluster]]] = [{} for _ in range(MINHASH_BANDS)]
+        self._ids = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._clusters)
+
+    def _find_near(self, signature: tuple[int, ...]) -> Optional[_Cluster]:
+        """在 LSH 候選中找出相似度最高且達到門檻的群組"""
+        best: Optional[_Cluster] = None
+        best_similarity = self.similarity_threshold
+        checked: set[int] = set()
+        for band, key in enumerate(_band_keys(signature)):
+            for cluster in self._bands[band].get(key, ()):
+                if cluster.id in checked or cluster.signature is None:
+                    continue
+                checked.add(cluster.id)
+                similarity = estimate_similarity(cluster.signature, signature)
+                if similarity >= best_similarity:
+                    best, best_similarity = cluster, similarity
+        return best
+
+    def _insert(self, exact: int, signature: Optional[tuple[int, ...]]) -> _Cluster:
+        cluster = _Cluster(next(self._ids), exact, signature)
+        self._clusters[cluster.id] = cluster
+        self._by_exact[exact] = cluster
+        if signature is not None:
+            for band, key in enumerate(_band_keys(signature)):
+                self._bands[band].setdefault(key, set()).add(cluster)
+
+        while len(self._clusters) > self.max_fingerprints:
+            _, evicted = self._clusters.popitem(last=False)
+            self._remove(evicted)
+        return cluster
+
+    def _remove(self, cluster: _Cluster) -> None:
+        if self._by_exact.get(cluster.exact) is cluster:
+            del self._by_exact[cluster.exact]
+        if cluster.signature is not None:
+            for band, key in enumerate(_band_keys(cluster.signature)):
+                bucket = self._bands[band].get(key)
+                if bucket:
+                    bucket.discard(cluster)
+                    if not bucket:
+                        del self._bands[band][key]
+
+    def _should_flag(self, cluster: _Cluster) -> bool:
+        author_count = len(cluster.authors)
+        # 至少一半的訊息帶有網址或 mention 才算, 避免一則順手 @ 人的問候讓整群被當成垃圾訊息
+        if cluster.signals * 2 >= len(cluster.entries):
+            return author_count >= self.author_threshold
+        return (
+            author_count >= self.plain_author_threshold
+            and len(cluster.guilds) >= self.min_guilds
+            and len(cluster.channels) >= self.min_channels
+        )
+
+    def observe(
+        self,
+        content: str,
+        now: float,
+        guild_id: str,
+        user_id: str,
+        channel_id: int,
+        message_id: int,
+        has_signal: bool = False,
+    ) -> Optional[FingerprintHit]:
+        """記錄一則訊息, 內容太短時返回 None; has_signal 表示內容含有網址、邀請或 mention"""
+        normalized = normalize_content(content)
+        if len(normalized) < self.min_length:
+            return None
+
+        exact = _hash64(normalized)
+        cluster = self._by_exact.get(exact)
+        signature = None
+        if cluster is None:
+            # 完全相同的內容 (最常見的情況) 不需要計算簽章
+            tokens = normalized.split(" ")[:MAX_SHINGLE_TOKENS]
+            if len(tokens) >= MIN_SIGNATURE_TOKENS:
+                signature = minhash(tokens)
+                cluster = self._find_near(signature)
+        if cluster is None:
+            cluster = self._insert(exact, signature)
+        else:
+            self._clusters.move_to_end(cluster.id)
+
+        cluster.expire(now - self.window_seconds)
+        entry = FingerprintEntry(now, user_id, guild_id, channel_id, message_id, has_signal)
+        cluster.add(entry)
+
+        author_count = len(cluster.authors)
+        if cluster.flagged_until >= now:
+            # 延長標記但不超過上限, 之後必須重新達到門檻才會再次標記
+            cluster.flagged_until = min(now + self.window_seconds, cluster.flagged_at + self.max_flag_seconds)
+            return FingerprintHit(True, False, author_count, [entry])
+
+        if self._should_flag(cluster):
+            cluster.flagged_at = now
+            cluster.flagged_until = now + self.window_seconds
+            return FingerprintHit(True, True, author_count, list(cluster.entries))
+
+        return FingerprintHit(False, False, author_count, [entry])
@@ -0,0 +1,114 @@
+from typing import Any, Optional
+import logging
+
+from .setting import GuildSettings, Settings, get_settings
+from .settings_watcher import get_settings_watcher
+from .storage import HeatStore, get_store
+
+logger = logging.getLogger("xaoc")
+
+# 這些區段變更時需要重新解析 (guild_defaults 本身與被沿用的全域欄位)
+_DEFAULT_SECTIONS = frozenset({"guild_defaults", "honeypot", "member_filter", "phishing"})
+# 沿用全域區段的欄位: GuildSettings 欄位 -> (區段, 欄位)
+_INHERITED_FIELDS = {
+    "honeypot_channel_id": ("honeypot", "channel_id"),
+    "min_account_age_days": ("member_filter", "min_account_age_days"),
+    "kick_new_accounts": ("member_filter", "kick_new_accounts"),
+    "join_wave_threshold": ("member_filter", "join_wave_threshold"),
+    "join_wave_cluster_size": ("member_filter", "join_wave_cluster_size"),
+    "lockdown_action": ("member_filter", "lockdown_action"),
+    "lookalike_threshold": ("phishing", "lookalike_threshold"),
+}
+
+
+class GuildConfigs:
+    """
+    伺服器設定: 全域預設上疊加各伺服器的覆寫
+
+    有覆寫的伺服器預先解析成完整的 GuildSettings, 並同時以 int 與 str 的 guild id 快取;
+    沒有覆寫的伺服器共用預設物件, 熱路徑上的查詢只是一次 dict.get.
+    只有在覆寫或全域預設變更時才重新解析
+    """
+
+    def __init__(self, store: HeatStore, settings: Settings):
+        self.store = store
+        self.defaults = self._base(settings)
+        self._resolved: dict[int | str, GuildSettings] = {}
+
+    @staticmethod
+    def _base(settings: Settings) -> GuildSettings:
+        """guild_defaults 中為 None 的欄位以對應的全域區段補上, 檢測器不需要再判斷"""
+        base = settings.guild_defaults
+        update: dict[str, Any] = {}
+        for key, (section, field) in _INHERITED_FIELDS.items():
+            if getattr(base, key) is None:
+                update[key] = getattr(getattr(settings, section), field)
+        return base.model_copy(update=update)
+
+    def get(self, guild_id: int | str) -> GuildSettings:
+        return self._resolved.get(guild_id, self.defaults)
+
+    def overrides(self, guild_id: int | str) -> dict[str, Any]:
+        return self.store.guild_overrides.get(str(guild_id), {})
+
+    def _resolve(self, overrides: dict[str, Any]) -> GuildSettings:
+        return GuildSettings.model_validate({**self.defaults.model_dump(), **overrides})
+
+    def _cache(self, guild_id: str, resolved: Optional[GuildSettings]) -> None:
+        for key in (guild_id, int(guild_id)):
+            if resolved is None:
+                self._resolved.pop(key, None)
+            else:
+                self._resolved[key] = resolved
+
+    def rebuild(self, settings: Optional[Settings] = None) -> None:
+        """重新解析所有伺服器的覆寫 (載入資料後或全域預設變更時)"""
+        if settings is not None:
+            self.defaults = self._base(settings)
+
+        resolved: dict[int | str, GuildSettings] = {}
+        for guild_id, overrides in self.store.guild_overrides.items():
+            try:
+                resolved[guild_id] = resolved[int(guild_id)] = self._resolve(overrides)
+            except ValueError as e:
+                logger.error(f"伺服器 {guild_id} 的設定覆寫與目前的預設值不相容, 暫時使用預設值: {e}")
+        self._resolved = resolved
+
+    def set(self, guild_id: int | str, key: str, value: Any) -> GuildSettings:
+        """覆寫一個欄位, 驗證失敗時拋出 ValueError 且不會變更"""
+        if key not in GuildSettings.model_fields:
+            raise ValueError(f"未知的設定: {key}")
+        guild_id = str(guild_id)
+        overrides = {**self.overrides(guild_id), key: value}
+        resolved = self._resolve(overrides)
+        overrides[key] = getattr(resolved, key)
+
+        self.store.set_guild_overrides(guild_id, overrides)
+        self._cache(guild_id, resolved)
+        return resolved
+
+    def reset(self, guild_id: int | str, key: Optional[str] = None) -> GuildSettings:
+        """移除一個欄位 (或全部) 的覆寫"""
+        guild_id = str(guild_id)
+        overrides = {} if key is None else {k: v for k, v in self.overrides(guild_id).items() if k != key}
+        resolved = self._resolve(overrides) if overrides else None
+
+        self.store.set_guild_overrides(guild_id, overrides)
+        self._cache(guild_id, resolved)
+        return resolved or self.defaults
+
+    def on_settings_changed(self, old: Settings, new: Settings, changed: frozenset[str]) -> None:
+        if changed & _DEFAULT_SECTIONS:
+            self.rebuild(new)
+
+
+_guild_configs: Optional[GuildConfigs] = None
+
+
+def get_guild_configs() -> GuildConfigs:
+    """獲取全局伺服器設定"""
+    global _guild_configs
+    if _guild_configs is None:
+        _guild_configs = GuildConfigs(get_store(), get_settings())
+        get_settings_watcher().subscribe(_guild_configs.on_settings_changed)
+    return _guild_configs
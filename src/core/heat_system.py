@@ -1,117 +1,180 @@
 from datetime import datetime, timedelta
 from typing import Optional
 import logging
-from .server_cache import ServerCache, UserHeatData
+import time
+from .guild_config import GuildConfigs, get_guild_configs
+from .metrics import get_metrics
+from .setting import GuildSettings
+from .server_cache import ServerCache, UserHeatData, Violation, ViolationReason
 
 logger = logging.getLogger("xaoc")
 
 
 class HeatSystem:
-    """熱力系統管理器"""
+    """熱力系統管理器, 熱力權重、衰減率與處置門檻依伺服器設定 (GuildSettings)"""
 
-    HEAT_SPAM_MESSAGE = 10.0  # 垃圾訊息
-    HEAT_SPAM_BURST = 25.0  # 短時間大量訊息
-    HEAT_PHISHING_LINK = 50.0  # 釣魚連結
-    HEAT_HONEYPOT_TRIGGER = 100
-    HEAT_NEW_ACCOUNT = 15.0  # 新帳號可疑行為
-    HEAT_USER_INSTALL_SPAM = 40.0  # User install spam
-    HEAT_DECAY_RATE = 2.0  # 每小時自然衰減率
+    EVICTION_BATCH = 16  # 每次讀取最多檢查的到期紀錄數
 
-    def __init__(self, server_cache: ServerCache):
+    def __init__(self, server_cache: ServerCache, configs: GuildConfigs):
         self.server_cache = server_cache
+        self.configs = configs
+        metrics = get_metrics()
+        self._violations = metrics.counter("violations_total", "各原因的違規次數", ("reason",))
+        self._heat_added = metrics.counter("heat_added_total", "各原因累計增加的熱力值", ("reason",))
+
+    def _apply_decay(self, heat_data: UserHeatData, now: float, decay_rate: float) -> None:
+        """依距離上次衰減的時間, 惰性計算目前的熱力值"""
+        if heat_data.heat_value > 0:
+            elapsed = now - heat_data.decayed_at
+            if elapsed > 0:
+                heat_data.heat_value = max(0.0, heat_data.heat_value - decay_rate * elapsed / 3600)
+        heat_data.decayed_at = now
+
+    def evict_expired(self, now: Optional[float] = None, limit: Optional[int] = None) -> int:
+        """淘汰熱力值已衰減至 0 的用戶, 返回淘汰數量"""
+        if now is None:
+            now = time.time()
+        evicted = 0
+        for server_id, user in self.server_cache.pop_expired(now, limit or self.EVICTION_BATCH):
+            heat_data = user.heat_data
+            decay_rate = self.configs.get(server_id).heat_decay_rate
+            self._apply_decay(heat_data, now, decay_rate)
+            if heat_data.heat_value <= 0:
+                self.server_cache.reset_user(server_id, user.id)
+                evicted += 1
+            else:
+                zero_at = now + heat_data.heat_value / decay_rate * 3600
+                self.server_cache.schedule_expiry(server_id, user, zero_at)
+        return evicted
 
     def get_user_heat_data(self, guild_id: str, user_id: str) -> UserHeatData:
-        """獲取用戶熱力值資料"""
-        return self.server_cache.get_user_heat_data(guild_id, user_id)
-
-    def add_heat(self, guild_id: str, user_id: str, amount: float, reason: str) -> None:
+        """獲取用戶熱力值資料 (已套用衰減)"""
+        now = time.time()
+        self.evict_expired(now)
+        heat_data = self.server_cache.get_user_heat_data(guild_id, user_id)
+        self._apply_decay(heat_data, now, self.configs.get(guild_id).heat_decay_rate)
+        return heat_data
+
+    def add_heat(self, guild_id: str, user_id: str, amount: float, reason: ViolationReason) -> None:
         """增加熱力值"""
         heat_data = self.get_user_heat_data(guild_id, user_id)
+        now = time.time()
         heat_data.heat_value += amount
-        heat_data.last_updated = datetime.now()
-        heat_data.violations.append(f"[{datetime.now()}] {reason} (+{amount})")
-        logger.info(f"用戶 {user_id} 熱力值增加 {amount} (原因: {reason}), 當前: {heat_data.heat_value}")
+        heat_data.last_updated = now
+        heat_data.violations.append(Violation(now, reason, amount))
+        self.server_cache.mark_dirty(guild_id, user_id)
+        self._violations.inc(reason.name.lower())
+        self._heat_added.inc(reason.name.lower(), amount=amount)
+        logger.info(f"用戶 {user_id} 熱力值增加 {amount} (原因: {reason.label}), 當前: {heat_data.heat_value}")
 
     def reduce_heat(self, guild_id: str, user_id: str, amount: float) -> None:
         """減少熱力值 (自然衰減)"""
         heat_data = self.get_user_heat_data(guild_id, user_id)
         heat_data.heat_value = max(0, heat_data.heat_value - amount)
-        heat_data.last_updated = datetime.now()
-
-    def get_danger_level(self, guild_id: str, user_id: str) -> str:
-        """獲取危險等級"""
-        heat_data = self.get_user_heat_data(guild_id, user_id)
-        heat_value = heat_data.heat_value
-
-        if heat_value >= 100:
+        heat_data.last_updated = time.time()
+        self.server_cache.mark_dirty(guild_id, user_id)
+
+    @staticmethod
+    def danger_level(heat_value: float, config: GuildSettings) -> str:
+        """
+        依伺服器的處置門檻換算危險等級: 達到禁言門檻為中度, 達到隔離門檻為高度,
+        低度與極度分別在禁言門檻之下與隔離門檻之上 (預設門檻時為 25/50/75/100)
+        """
+        timeout, quarantine = config.timeout_threshold, config.quarantine_threshold
+        if heat_value >= quarantine + max(quarantine - timeout, timeout / 2):
             return "極度危險"
-        elif heat_value >= 75:
+        elif heat_value >= quarantine:
             return "高度危險"
-        elif heat_value >= 50:
+        elif heat_value >= timeout:
             return "中度危險"
-        elif heat_value >= 25:
+        elif heat_value >= timeout / 2:
             return "低度危險"
         else:
             return "安全"
 
+    def get_danger_level(self, guild_id: str, user_id: str) -> str:
+        """獲取危險等級"""
+        heat_data = self.get_user_heat_data(guild_id, user_id)
+        return self.danger_level(heat_data.heat_value, self.configs.get(guild_id))
+
     def should_quarantine(self, guild_id: str, user_id: str) -> bool:
         """是否應該被隔離"""
         heat_data = self.get_user_heat_data(guild_id, user_id)
-        return heat_data.heat_value >= 75
+        return heat_data.heat_value >= self.configs.get(guild_id).quarantine_threshold
 
     def should_timeout(self, guild_id: str, user_id: str) -> bool:
         """是否應該被禁言"""
         heat_data = self.get_user_heat_data(guild_id, user_id)
-        return heat_data.heat_value >= 50
+        return heat_data.heat_value >= self.configs.get(guild_id).timeout_threshold
 
     def add_spam_violation(self, guild_id: str, user_id: str, is_burst: bool = False):
         """添加垃圾訊息違規"""
+        config = self.configs.get(guild_id)
         heat_data = self.get_user_heat_data(guild_id, user_id)
         heat_data.spam_count += 1
 
         if is_burst:
-            self.add_heat(guild_id, user_id, self.HEAT_SPAM_BURST, "短時間大量訊息")
+            self.add_heat(guild_id, user_id, config.heat_spam_burst, ViolationReason.SPAM_BURST)
         else:
-            self.add_heat(guild_id, user_id, self.HEAT_SPAM_MESSAGE, "垃圾訊息")
+            self.add_heat(guild_id, user_id, config.heat_spam_message, ViolationReason.SPAM_MESSAGE)
+
+    def add_spam_wave_violation(self, guild_id: str, user_id: str):
+        """添加協同垃圾訊息違規"""
+        config = self.configs.get(guild_id)
+        heat_data = self.get_user_heat_data(guild_id, user_id)
+        heat_data.spam_count += 1
+        self.add_heat(guild_id, user_id, config.heat_spam_wave, ViolationReason.SPAM_WAVE)
 
     def add_phishing_violation(self, guild_id: str, user_id: str):
         """添加釣魚連結違規"""
+        config = self.configs.get(guild_id)
         heat_data = self.get_user_heat_data(guild_id, user_id)
         heat_data.phishing_attempt_count += 1
-        self.add_heat(guild_id, user_id, self.HEAT_PHISHING_LINK, "釣魚連結")
+        self.add_heat(guild_id, user_id, config.heat_phishing_link, ViolationReason.PHISHING_LINK)
+
+    def add_lookalike_violation(self, guild_id: str, user_id: str, score: float):
+        """添加仿冒網域違規, 熱力值依相似度比例計算"""
+        config = self.configs.get(guild_id)
+        heat_data = self.get_user_heat_data(guild_id, user_id)
+        heat_data.phishing_attempt_count += 1
+        self.add_heat(guild_id, user_id, round(config.heat_phishing_link * score, 1), ViolationReason.LOOKALIKE_DOMAIN)
 
     def add_honeypot_violation(self, guild_id: str, user_id: str):
         """添加蜜罐觸發違規"""
+        config = self.configs.get(guild_id)
         heat_data = self.get_user_heat_data(guild_id, user_id)
         heat_data.honeypot_trigger_count += 1
-        self.add_heat(guild_id, user_id, self.HEAT_HONEYPOT_TRIGGER, "觸發蜜罐")
+        self.add_heat(guild_id, user_id, config.heat_honeypot_trigger, ViolationReason.HONEYPOT_TRIGGER)
 
     def add_new_account_violation(self, guild_id: str, user_id: str):
         """添加新帳號可疑行為"""
-        self.add_heat(guild_id, user_id, self.HEAT_NEW_ACCOUNT, "新帳號可疑行為")
+        config = self.configs.get(guild_id)
+        self.add_heat(guild_id, user_id, config.heat_new_account, ViolationReason.NEW_ACCOUNT)
+
+    def add_join_wave_violation(self, guild_id: str, user_id: str):
+        """添加加入潮違規"""
+        config = self.configs.get(guild_id)
+        self.add_heat(guild_id, user_id, config.heat_join_wave, ViolationReason.JOIN_WAVE)
 
     def add_user_install_spam(self, guild_id: str, user_id: str):
         """添加 user install spam 違規"""
-        self.add_heat(guild_id, user_id, self.HEAT_USER_INSTALL_SPAM, "User install spam")
-
-    def decay_heat(self):
-        """自然衰減所有用戶的熱力值"""
-        now = datetime.now()
-        for server in self.server_cache.servers:
-            for user in server.users:
-                if user.heat_data.heat_value > 0:
-                    user.heat_data.heat_value = max(0, user.heat_data.heat_value - self.HEAT_DECAY_RATE)
-                    user.heat_data.last_updated = now
-        logger.info(f"熱力值自然衰減完成，衰減量: {self.HEAT_DECAY_RATE}")
-
-    def get_high_risk_users(self, guild_id: str, threshold: float = 50.0) -> list[tuple[str, UserHeatData]]:
-        """獲取高風險用戶列表"""
+        config = self.configs.get(guild_id)
+        self.add_heat(guild_id, user_id, config.heat_user_install_spam, ViolationReason.USER_INSTALL_SPAM)
+
+    def get_high_risk_users(self, guild_id: str, threshold: Optional[float] = None) -> list[tuple[str, UserHeatData]]:
+        """獲取高風險用戶列表, 未指定門檻時使用該伺服器的禁言門檻"""
         server = self.server_cache.get_server(guild_id)
         if not server:
             return []
 
+        now = time.time()
+        config = self.configs.get(guild_id)
+        decay_rate = config.heat_decay_rate
+        if threshold is None:
+            threshold = config.timeout_threshold
         high_risk = []
-        for user in server.users:
+        for user in server.users.values():
+            self._apply_decay(user.heat_data, now, decay_rate)
             if user.heat_data.heat_value >= threshold:
                 high_risk.append((user.id, user.heat_data))
 
@@ -125,7 +188,8 @@ class HeatSystem:
         heat_data.spam_count = 0
         heat_data.phishing_attempt_count = 0
         heat_data.honeypot_trigger_count = 0
-        heat_data.last_updated = datetime.now()
+        heat_data.last_updated = time.time()
+        self.server_cache.mark_dirty(guild_id, user_id)
         logger.info(f"已重置用戶 {user_id} 的熱力值")
 
     def get_user_stats(self, guild_id: str, user_id: str) -> dict:
@@ -137,8 +201,8 @@ class HeatSystem:
             "spam_count": heat_data.spam_count,
             "phishing_attempts": heat_data.phishing_attempt_count,
             "honeypot_triggers": heat_data.honeypot_trigger_count,
-            "violations": heat_data.violations[-10:],  # 最近10次違規
-            "last_updated": heat_data.last_updated,
+            "violations": heat_data.violations.recent(10),  # 最近10次違規
+            "last_updated": datetime.fromtimestamp(heat_data.last_updated),
         }
 
 
@@ -158,5 +222,5 @@ def get_heat_system() -> HeatSystem:
     """獲取全局熱力系統"""
     global _heat_system
     if _heat_system is None:
-        _heat_system = HeatSystem(get_server_cache())
+        _heat_system = HeatSystem(get_server_cache(), get_guild_configs())
     return _heat_system
@@ -0,0 +1,181 @@
+from bisect import bisect_left
+from typing import Callable, Optional
+import asyncio
+import json
+import logging
+import time
+
+from .setting import get_settings
+
+logger = logging.getLogger("xaoc")
+
+# 10 微秒到約 60 秒, 每個桶相差 1.2 倍, 百分位數的誤差不超過 20%
+BUCKET_BOUNDS: list[float] = []
+_bound = 1e-5
+while _bound < 60:
+    BUCKET_BOUNDS.append(_bound)
+    _bound *= 1.2
+BUCKET_BOUNDS.append(float("inf"))
+
+
+class LatencyHistogram:
+    """固定對數分桶的延遲直方圖, 記錄只需要一次二分搜尋"""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKET_BOUNDS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """第 q 百分位數 (以所在桶的上界估計)"""
+        if not self.count:
+            return 0.0
+        target = q / 100 * self.count
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class Instrumentation:
+    """
+    執行期效能量測
+
+    - listener:<名稱>  每個事件監聽器的執行時間
+    - detector:<名稱>  訊息管線中每個檢測器的執行時間
+    - rest:<方法 路徑> 每個 Discord API 路由的延遲
+    - loop_lag          事件迴圈延遲 (排程的 sleep 比預期晚了多久)
+    佇列深度等數值以 gauge 註冊, 查詢時才計算
+    """
+
+    def __init__(self, enabled: bool = True, loop_lag_interval: float = 0.5):
+        self.enabled = enabled
+        self.loop_lag_interval = loop_lag_interval
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.gauges: dict[str, Callable[[], float]] = {}
+        self.started_at = time.time()
+        self.last_loop_lag = 0.0
+        self._lag_task: Optional[asyncio.Task] = None
+
+    def observe(self, name: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        histogram.observe(seconds)
+
+    def register_gauge(self, name: str, read: Callable[[], float]) -> None:
+        self.gauges[name] = read
+
+    def unregister_gauge(self, name: str) -> None:
+        self.gauges.pop(name, None)
+
+    def read_gauges(self) -> dict[str, float]:
+        values = {}
+        for name, read in self.gauges.items():
+            try:
+                values[name] = read()
+            except Exception as e:
+                logger.error(f"讀取量測值 {name} 失敗: {e}")
+        return values
+
+    def start(self) -> None:
+        if self.enabled and (self._lag_task is None or self._lag_task.done()):
+            self._lag_task = asyncio.create_task(self._measure_loop_lag())
+
+    async def stop(self) -> None:
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            try:
+                await self._lag_task
+            except asyncio.CancelledError:
+                pass
+            self._lag_task = None
+
+    async def _measure_loop_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.loop_lag_interval
+            await asyncio.sleep(self.loop_lag_interval)
+            self.last_loop_lag = max(0.0, loop.time() - expected)
+            self.observe("loop_lag", self.last_loop_lag)
+
+    def instrument_http(self, http) -> bool:
+        """
+        包裝 discord.py 的 HTTPClient.request, 依路由範本記錄 REST 延遲
+
+        HTTPClient 不是公開 API (pyproject 已限制 discord.py 版本), 找不到 request 時
+        記錄警告並停用 REST 量測, 返回是否成功掛上
+        """
+        request = getattr(http, "request", None)
+        if not callable(request):
+            logger.warning("discord.py 的 HTTPClient 沒有 request 方法, 停用 REST 延遲量測 (請確認 discord.py 版本)")
+            return False
+        if getattr(request, "_xaoc_instrumented", False):
+            return True
+
+        async def timed_request(route, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await request(route, *args, **kwargs)
+            finally:
+                label = f"{getattr(route, 'method', '?')} {getattr(route, 'path', '?')}"
+                self.observe(f"rest:{label}", time.perf_counter() - start)
+
+        timed_request._xaoc_instrumented = True  # type: ignore
+        http.request = timed_request
+        return True
+
+    def snapshot(self) -> dict:
+        return {
+            "timestamp": time.time(),
+            "uptime": time.time() - self.started_at,
+            "loop_lag": self.last_loop_lag,
+            "gauges": self.read_gauges(),
+            "histograms": {name: histogram.summary() for name, histogram in sorted(self.histograms.items())},
+        }
+
+    @staticmethod
+    def dump(path: str, snapshot: dict) -> None:
+        """將量測結果寫入 JSON 檔; 快照需在事件迴圈上取得, 寫檔可以在背景執行緒進行"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False, indent=2)
+
+    def reset(self) -> None:
+        self.histograms.clear()
+        self.started_at = time.time()
+
+
+_instrumentation: Optional[Instrumentation] = None
+
+
+def get_instrumentation() -> Instrumentation:
+    """獲取全局效能量測實例"""
+    global _instrumentation
+    if _instrumentation is None:
+        settings = get_settings().instrumentation
+        _instrumentation = Instrumentation(settings.enabled, settings.loop_lag_interval)
+    return _instrumentation
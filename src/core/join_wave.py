@@ -0,0 +1,200 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import NamedTuple, Optional
+import re
+import unicodedata
+
+MIN_NAME_BASE_LENGTH = 3
+MAX_RECORDS_PER_GUILD = 5000
+
+_NAME_NOISE_PATTERN = re.compile(r"[\d\W_]+", re.UNICODE)
+
+
+def name_base(name: str) -> Optional[str]:
+    """
+    去除數字、符號與大小寫差異後的名稱, 讓 raider_123 與 Raider.456 得到相同結果
+    太短的名稱不具辨識度, 返回 None
+    """
+    base = _NAME_NOISE_PATTERN.sub("", unicodedata.normalize("NFKC", name).casefold())
+    return base if len(base) >= MIN_NAME_BASE_LENGTH else None
+
+
+class JoinRecord(NamedTuple):
+    timestamp: float
+    user_id: int
+    created_at: float
+    creation_key: int
+    name_key: Optional[str]
+
+
+@dataclass(slots=True)
+class JoinWave:
+    guild_id: int
+    started: bool  # 本次加入觸發了封鎖模式
+    join_count: int  # 時間窗內的加入數
+    records: list[JoinRecord]  # 觸發時為整波符合特徵的成員, 否則只有本次加入
+    reason: str
+
+
+@dataclass(slots=True)
+class _GuildJoins:
+    buckets: deque[list] = field(default_factory=deque)  # [bucket_start, count]
+    total: int = 0
+    records: deque[JoinRecord] = field(default_factory=lambda: deque(maxlen=MAX_RECORDS_PER_GUILD))
+    creation_counts: dict[int, int] = field(default_factory=dict)
+    name_counts: dict[str, int] = field(default_factory=dict)
+    lockdown_until: float = 0.0
+    wave_creation_keys: set[int] = field(default_factory=set)
+    wave_name_keys: set[str] = field(default_factory=set)
+    handled: int = 0
+
+
+def _decrement(counts: dict, key) -> None:
+    remaining = counts[key] - 1
+    if remaining:
+        counts[key] = remaining
+    else:
+        del counts[key]
+
+
+class JoinWaveDetector:
+    """
+    每個伺服器的加入潮 (raid) 檢測
+
+    加入數以固定長度的時間桶累計, 時間窗內的加入同時依帳號建立時間與名稱
+    分群計數, 每次加入都只需要 O(1) 的更新; 加入數與同群數量都超過門檻時
+    進入封鎖模式, 之後符合同一波特徵的加入會直接視為同一波處理
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = 60.0,
+        bucket_seconds: float = 5.0,
+        join_threshold: int = 15,
+        cluster_threshold: int = 8,
+        creation_bucket_seconds: float = 3600.0,
+        lockdown_seconds: float = 600.0,
+    ):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.join_threshold = join_threshold
+        self.cluster_threshold = cluster_threshold
+        self.creation_bucket_seconds = creation_bucket_seconds
+        self.lockdown_seconds = lockdown_seconds
+        self._guilds: dict[int, _GuildJoins] = {}
+
+    def _expire(self, state: _GuildJoins, now: float) -> None:
+        cutoff = now - self.window_seconds
+        while state.buckets and state.buckets[0][0] + self.bucket_seconds <= cutoff:
+            state.total -= state.buckets.popleft()[1]
+
+        while state.records and state.records[0].timestamp < cutoff:
+            self._forget(state, state.records.popleft())
+
+    def _forget(self, state: _GuildJoins, record: JoinRecord) -> None:
+        _decrement(state.creation_counts, record.creation_key)
+        if record.name_key is not None:
+            _decrement(state.name_counts, record.name_key)
+
+    def _remember(self, state: _GuildJoins, record: JoinRecord) -> None:
+        if len(state.records) == state.records.maxlen:
+            self._forget(state, state.records.popleft())
+        state.records.append(record)
+        state.creation_counts[record.creation_key] = state.creation_counts.get(record.creation_key, 0) + 1
+        if record.name_key is not None:
+            state.name_counts[record.name_key] = state.name_counts.get(record.name_key, 0) + 1
+
+        bucket_start = record.timestamp - record.timestamp % self.bucket_seconds
+        if state.buckets and state.buckets[-1][0] == bucket_start:
+            state.buckets[-1][1] += 1
+        else:
+            state.buckets.append([bucket_start, 1])
+        state.total += 1
+
+    def _matches_wave(self, state: _GuildJoins, record: JoinRecord) -> bool:
+        return record.creation_key in state.wave_creation_keys or (
+            record.name_key is not None and record.name_key in state.wave_name_keys
+        )
+
+    def observe(
+        self,
+        guild_id: int,
+        user_id: int,
+        name: str,
+        created_at: float,
+        now: float,
+        join_threshold: Optional[int] = None,
+        cluster_threshold: Optional[int] = None,
+    ) -> Optional[JoinWave]:
+        """記錄一次加入, 屬於加入潮時返回 JoinWave; 門檻未指定時使用建立時的預設值 (供伺服器覆寫)"""
+        if join_threshold is None:
+            join_threshold = self.join_threshold
+        if cluster_threshold is None:
+            cluster_threshold = self.cluster_threshold
+        state = self._guilds.get(guild_id)
+        if state is None:
+            state = self._guilds[guild_id] = _GuildJoins()
+
+        self._expire(state, now)
+        record = JoinRecord(now, user_id, created_at, int(created_at // self.creation_bucket_seconds), name_base(name))
+        self._remember(state, record)
+
+        creation_size = state.creation_counts[record.creation_key]
+        name_size = state.name_counts.get(record.name_key, 0) if record.name_key is not None else 0
+        clustered = max(creation_size, name_size) >= cluster_threshold
+
+        if state.lockdown_until > now:
+            if clustered:
+                self._add_wave_keys(state, record, creation_size, name_size, cluster_threshold)
+            if clustered or self._matches_wave(state, record):
+                state.lockdown_until = now + self.lockdown_seconds
+                state.handled += 1
+                return JoinWave(guild_id, False, state.total, [record], "封鎖模式中符合加入潮特徵")
+            return None
+
+        if state.total < join_threshold or not clustered:
+            return None
+
+        state.lockdown_until = now + self.lockdown_seconds
+        state.wave_creation_keys.clear()
+        state.wave_name_keys.clear()
+        self._add_wave_keys(state, record, creation_size, name_size, cluster_threshold)
+
+        wave = [r for r in state.records if self._matches_wave(state, r)]
+        state.handled += len(wave)
+        reason = f"{self.window_seconds:.0f} 秒內 {state.total} 人加入, {len(wave)} 人帳號建立時間或名稱相近"
+        return JoinWave(guild_id, True, state.total, wave, reason)
+
+    def _add_wave_keys(
+        self, state: _GuildJoins, record: JoinRecord, creation_size: int, name_size: int, cluster_threshold: int
+    ) -> None:
+        if creation_size >= cluster_threshold:
+            state.wave_creation_keys.add(record.creation_key)
+        if record.name_key is not None and name_size >= cluster_threshold:
+            state.wave_name_keys.add(record.name_key)
+
+    def is_locked(self, guild_id: int, now: float) -> bool:
+        state = self._guilds.get(guild_id)
+        return state is not None and state.lockdown_until > now
+
+    def end_lockdown(self, guild_id: int) -> bool:
+        state = self._guilds.get(guild_id)
+        if state is None or state.lockdown_until == 0.0:
+            return False
+        state.lockdown_until = 0.0
+        state.wave_creation_keys.clear()
+        state.wave_name_keys.clear()
+        state.handled = 0
+        return True
+
+    def status(self, guild_id: int, now: float) -> dict:
+        state = self._guilds.get(guild_id)
+        if state is None:
+            return {"joins": 0, "locked": False, "remaining": 0.0, "handled": 0}
+        self._expire(state, now)
+        return {
+            "joins": state.total,
+            "locked": state.lockdown_until > now,
+            "remaining": max(0.0, state.lockdown_until - now),
+            "handled": state.handled,
+        }
@@ -0,0 +1,127 @@
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from pathlib import Path
+from typing import Optional
+import atexit
+import logging
+import queue
+import time
+
+from .setting import LogSettings
+
+LOW_PRIORITY_FILL = 0.8  # 佇列超過此比例時開始對低優先級紀錄抽樣
+RESERVED_FILL = 0.95  # 超過此比例後只接受 WARNING 以上的紀錄
+DROP_REPORT_INTERVAL = 10.0  # 回報丟棄數量的最短間隔(秒)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    只把紀錄放進佇列的 handler, 格式化與寫檔都在背景執行緒進行
+
+    佇列接近滿載時, 低於 WARNING 的紀錄只保留每 sample_every 筆中的一筆,
+    最後一段容量保留給 WARNING 以上; 佇列全滿時直接丟棄, 事件迴圈永遠不會因為寫日誌而阻塞
+    """
+
+    def __init__(self, log_queue: queue.Queue, sample_every: int = 10):
+        super().__init__(log_queue)
+        self.sample_every = sample_every
+        self.soft_limit = int(log_queue.maxsize * LOW_PRIORITY_FILL) if log_queue.maxsize > 0 else 0
+        self.reserved_limit = int(log_queue.maxsize * RESERVED_FILL) if log_queue.maxsize > 0 else 0
+        self.dropped = 0
+        self._sampled = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 不在呼叫端格式化, 交給背景執行緒的 handler; 本專案的訊息都是已組好的字串
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.soft_limit and record.levelno < logging.WARNING:
+            depth = self.queue.qsize()
+            if depth >= self.soft_limit:
+                self._sampled += 1
+                if depth >= self.reserved_limit or self._sampled % self.sample_every:
+                    self.dropped += 1
+                    return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _DropReporter(logging.Handler):
+    """在背景執行緒中回報被丟棄的紀錄數量"""
+
+    def __init__(self, source: DroppingQueueHandler, target: logging.Handler):
+        super().__init__()
+        self.source = source
+        self.target = target
+        self._reported = 0
+        self._reported_at = 0.0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        dropped = self.source.dropped
+        if dropped > self._reported and time.monotonic() - self._reported_at >= DROP_REPORT_INTERVAL:
+            self._reported_at = time.monotonic()
+            message = f"日誌佇列滿載, 已丟棄 {dropped - self._reported} 筆紀錄"
+            notice = logging.LogRecord(record.name, logging.WARNING, __file__, 0, message, None, None)
+            self._reported = dropped
+            self.target.handle(notice)
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # 佇列可能已滿, 停止時等待背景執行緒消化後再放入結束標記
+        self.queue.put(self._sentinel)  # type: ignore
+
+
+def _file_handler(settings: LogSettings) -> logging.Handler:
+    path = Path(settings.file_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if settings.rotation == "time":
+        return TimedRotatingFileHandler(
+            path, when=settings.rotate_when, backupCount=settings.backup_count, encoding="utf-8"
+        )
+    return RotatingFileHandler(path, maxBytes=settings.max_bytes, backupCount=settings.backup_count, encoding="utf-8")
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(settings: LogSettings, logger_name: str = "xaoc") -> DroppingQueueHandler:
+    """依 LogSettings 設定 logger, 返回佇列 handler (可讀取丟棄數與佇列深度)"""
+    global _listener
+    stop_logging()
+
+    formatter = logging.Formatter(settings.format)
+    file_handler = _file_handler(settings)
+    console_handler = logging.StreamHandler()
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+        handler.setLevel(settings.level)
+
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.queue_size)
+    queue_handler = DroppingQueueHandler(log_queue, settings.low_priority_sample)
+    reporter = _DropReporter(queue_handler, file_handler)
+
+    logger = logging.getLogger(logger_name)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.setLevel(settings.level)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+
+    _listener = _Listener(log_queue, reporter, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    return queue_handler
+
+
+def stop_logging() -> None:
+    """寫完佇列中剩餘的紀錄並停止背景執行緒"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,272 @@
+from functools import lru_cache
+from typing import Iterable, NamedTuple, Optional
+import re
+import unicodedata
+
+from .phishing_index import OFFICIAL_DOMAINS, is_official_domain
+
+# 視覺上容易混淆的字元 -> 統一的骨架字元 (i/l/1 等全部視為同一個字)
+_CONFUSABLE_CHARS = {
+    # 數字與符號
+    "0": "o",
+    "1": "l",
+    "3": "e",
+    "4": "a",
+    "5": "s",
+    "7": "t",
+    "8": "b",
+    "9": "g",
+    "@": "a",
+    "$": "s",
+    "|": "l",
+    "!": "l",
+    "i": "l",
+    "ı": "l",
+    "ǀ": "l",
+    # 西里爾字母
+    "а": "a",
+    "в": "b",
+    "с": "c",
+    "ԁ": "d",
+    "е": "e",
+    "ё": "e",
+    "һ": "h",
+    "і": "l",
+    "ї": "l",
+    "ј": "j",
+    "к": "k",
+    "м": "m",
+    "н": "h",
+    "о": "o",
+    "р": "p",
+    "ԛ": "q",
+    "ѕ": "s",
+    "т": "t",
+    "у": "y",
+    "х": "x",
+    "ԝ": "w",
+    "ӏ": "l",
+    # 希臘字母
+    "α": "a",
+    "β": "b",
+    "ε": "e",
+    "η": "n",
+    "ι": "l",
+    "κ": "k",
+    "ν": "v",
+    "ο": "o",
+    "ρ": "p",
+    "τ": "t",
+    "υ": "u",
+    "χ": "x",
+}
+_CONFUSABLE_TABLE = str.maketrans(_CONFUSABLE_CHARS)
+_CONFUSABLE_SEQUENCES = (("rn", "m"), ("vv", "w"), ("cl", "d"))
+_SEPARATORS = re.compile(r"[\W_]+")
+
+# 品牌名稱原樣出現在非官方網域時, 搭配這些誘餌字才視為可疑
+BAIT_TOKENS = frozenset({"gift", "gifts", "nitro", "free", "promo", "airdrop", "claim", "drop", "giveaway", "reward"})
+BAIT_SCORE = 0.9
+# 品牌名稱本身就是註冊的網域 (steamcommunity.co、discord.com.ru) 幾乎只會是仿冒
+BRAND_DOMAIN_SCORE = 0.95
+# 常見的二級網域後綴, 例如 discord.com.ru 中真正註冊的是 discord
+_SECOND_LEVEL_SUFFIXES = frozenset({"com", "co", "net", "org", "gov", "edu", "ac"})
+_OFFICIAL_TLDS = frozenset(domain.rsplit(".", 1)[1] for domain in OFFICIAL_DOMAINS)
+TYPO_WEIGHT = 0.95  # 拼字錯誤比同形字替換的可信度略低
+# 拼字錯誤搭配誘餌字 (dicsord.gift), 或長品牌只差一個字 (disord.com) 幾乎不會是巧合,
+# 直接給予高於預設門檻的分數; 其他情況按距離比例遞減
+TYPO_BAIT_SCORE = 0.9
+SINGLE_TYPO_SCORE = 0.9
+SINGLE_TYPO_MIN_LENGTH = 6
+SUFFIX_FORM_SCORE = 0.8  # 低於預設門檻, 需要誘餌字才會被攔截
+MIN_TOKEN_LENGTH = 4
+
+
+def skeleton(text: str) -> str:
+    """計算字串的混淆骨架, 外觀相似的字串會得到相同的骨架"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = "".join(ch for ch in unicodedata.normalize("NFD", text) if not unicodedata.combining(ch))
+    text = text.translate(_CONFUSABLE_TABLE)
+    for sequence, replacement in _CONFUSABLE_SEQUENCES:
+        text = text.replace(sequence, replacement)
+    return _SEPARATORS.sub("", text)
+
+
+def bounded_levenshtein(a: str, b: str, bound: int) -> int:
+    """編輯距離, 超過 bound 時提早結束並返回 bound + 1"""
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        row_min = i
+        for j, cb in enumerate(b, 1):
+            cost = previous[j - 1] + (ca != cb)
+            insert = current[j - 1] + 1
+            delete = previous[j] + 1
+            value = min(cost, insert, delete)
+            current.append(value)
+            if value < row_min:
+                row_min = value
+        if row_min > bound:
+            return bound + 1
+        previous = current
+    return previous[-1] if previous[-1] <= bound else bound + 1
+
+
+def _is_suffix_form(candidate: str, brand: str) -> bool:
+    """
+    品牌名稱後面多一個字 (discords、discordx) 通常是衍生名稱而不是拼錯 (discords.com 是正當的伺服器列表網站);
+    重複最後一個字 (discordd) 仍視為拼字錯誤
+    """
+    return len(candidate) == len(brand) + 1 and candidate.startswith(brand) and candidate[-1] != brand[-1]
+
+
+def impersonates_brand(host: str, brand: str) -> bool:
+    """
+    品牌名稱是否出現在註冊網域的位置 (steamcommunity.co、discord.com.ru),
+    或後面接著官方網域的頂級標籤 (discord.com.example.xyz); 出現在子網域 (discord.js.org) 則不算
+    """
+    labels = host.split(".")
+    if len(labels) >= 3 and labels[-2] in _SECOND_LEVEL_SUFFIXES:
+        registrable = len(labels) - 3
+    else:
+        registrable = len(labels) - 2
+    for index, label in enumerate(labels[:-1]):
+        if label == brand and (index == registrable or labels[index + 1] in _OFFICIAL_TLDS):
+            return True
+    return False
+
+
+class _BKNode:
+    __slots__ = ("word", "brands", "children")
+
+    def __init__(self, word: str, brand: str):
+        self.word = word
+        self.brands = [brand]
+        self.children: dict[int, "_BKNode"] = {}
+
+
+class BKTree:
+    """以編輯距離為度量的 BK-tree, 查詢時只走距離可能在範圍內的分支"""
+
+    def __init__(self, max_distance: int):
+        self.max_distance = max_distance
+        self.root: Optional[_BKNode] = None
+
+    def add(self, word: str, brand: str) -> None:
+        if self.root is None:
+            self.root = _BKNode(word, brand)
+            return
+        node = self.root
+        while True:
+            distance = bounded_levenshtein(word, node.word, len(word) + len(node.word))
+            if distance == 0:
+                node.brands.append(brand)
+                return
+            child = node.children.get(distance)
+            if child is None:
+                node.children[distance] = _BKNode(word, brand)
+                return
+            node = child
+
+    def search(self, word: str, max_distance: int) -> list[tuple[int, str, str]]:
+        """返回 (距離, 骨架, 品牌) 列表"""
+        results: list[tuple[int, str, str]] = []
+        if self.root is None:
+            return results
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            # 需要完整距離來決定要走哪些子節點, 上限取兩者長度和即可
+            distance = bounded_levenshtein(word, node.word, len(word) + len(node.word))
+            if distance <= max_distance:
+                results.extend((distance, node.word, brand) for brand in node.brands)
+            low, high = distance - max_distance, distance + max_distance
+            stack.extend(child for d, child in node.children.items() if low <= d <= high)
+        return results
+
+
+class LookalikeScore(NamedTuple):
+    host: str
+    brand: str
+    token: str
+    score: float
+
+    @property
+    def reason(self) -> str:
+        return f"仿冒網域 ({self.host} ≈ {self.brand}, 相似度 {self.score:.2f})"
+
+
+class LookalikeScorer:
+    """
+    保護品牌的仿冒網域評分
+
+    品牌骨架在建立時預先計算並放入 BK-tree, 每個主機名稱只需對
+    少量候選字串做有界編輯距離查詢, 不需逐一比對所有品牌
+
+    >>> scorer = LookalikeScorer(["discord", "steamcommunity"])
+    >>> hosts = ("dicsord.gift", "discrod-nitro.com", "disord.com", "discordd.com", "d1scord.com")
+    >>> [round(scorer.score(host).score, 2) for host in hosts]
+    [0.9, 0.9, 0.9, 0.9, 1.0]
+    >>> scorer.score("discord.com") is None, scorer.score("discord.js.org") is None
+    (True, True)
+    >>> scorer = LookalikeScorer(["discord", "steamcommunity", "steampowered"])
+    >>> hosts = ("steamcommunity.com.ru", "steamcommunity.co", "steampowered.ru", "discord.com.ru")
+    >>> [scorer.score(host).score for host in hosts]
+    [0.95, 0.95, 0.95, 0.95]
+    >>> scorer.score("disco.com") is None or scorer.score("disco.com").score < 0.85
+    True
+    >>> [scorer.score(host).score < 0.85 for host in ("discords.com", "discords.gg", "steamcommunitys.com")]
+    [True, True, True]
+    """
+
+    def __init__(self, brands: Iterable[str], max_distance: int = 2, cache_size: int = 4096):
+        self.brands = [brand.lower() for brand in brands]
+        self.max_distance = max_distance
+        self.tree = BKTree(max_distance)
+        for brand in self.brands:
+            self.tree.add(skeleton(brand), brand)
+        self.score = lru_cache(maxsize=cache_size)(self._score)
+
+    @staticmethod
+    def _candidates(host: str) -> Iterable[str]:
+        """從主機名稱取出要比對的字串: 每個標籤、標籤內以 - 分隔的片段、以及去掉分隔後的整體"""
+        labels = host.split(".")[:-1] or [host]
+        seen = set()
+        for label in labels:
+            for candidate in (label, *label.split("-"), label.replace("-", "")):
+                if len(candidate) >= MIN_TOKEN_LENGTH and candidate not in seen:
+                    seen.add(candidate)
+                    yield candidate
+
+    def _score(self, host: str) -> Optional[LookalikeScore]:
+        if not host or is_official_domain(host):
+            return None
+
+        tokens = set(_SEPARATORS.split(host))
+        has_bait = not tokens.isdisjoint(BAIT_TOKENS)
+        best: Optional[LookalikeScore] = None
+
+        for candidate in self._candidates(host):
+            for distance, brand_skeleton, brand in self.tree.search(skeleton(candidate), self.max_distance):
+                if candidate == brand:
+                    # 品牌名稱原樣出現在子網域 (例如 discord.js.org), 只有搭配誘餌字才算可疑
+                    if impersonates_brand(host, brand):
+                        score = BRAND_DOMAIN_SCORE
+                    else:
+                        score = BAIT_SCORE if has_bait else 0.0
+                elif distance == 0:
+                    score = 1.0
+                elif has_bait:
+                    score = TYPO_BAIT_SCORE
+                elif distance == 1 and _is_suffix_form(skeleton(candidate), brand_skeleton):
+                    score = SUFFIX_FORM_SCORE
+                elif distance == 1 and len(brand_skeleton) >= SINGLE_TYPO_MIN_LENGTH:
+                    score = SINGLE_TYPO_SCORE
+                else:
+                    score = TYPO_WEIGHT * (1 - distance / max(len(brand_skeleton), 1))
+                if score > 0 and (best is None or score > best.score):
+                    best = LookalikeScore(host, brand, candidate, score)
+
+        return best
@@ -0,0 +1,49 @@
+from collections import defaultdict
+from typing import Optional
+
+from .rate_limiter import WindowedCounter, get_history_budget
+from .setting import get_settings
+
+
+class RecentMessageIndex:
+    """
+    每位用戶 (依伺服器分開) 的近期訊息 id 索引
+
+    用於隔離時一次清除用戶先前送出的訊息; 建立在 WindowedCounter 上,
+    因此數量與時間窗都有上限, 並與訊息歷史共用記憶體預算
+    """
+
+    def __init__(self, window_seconds: float, max_messages: int):
+        self.messages: WindowedCounter[tuple[int, int], tuple[int, int]] = WindowedCounter(
+            window_seconds, max_events=max_messages, budget=get_history_budget(), name="recent_messages"
+        )
+
+    def record(self, guild_id: int, user_id: int, channel_id: int, message_id: int, now: Optional[float] = None):
+        self.messages.add((guild_id, user_id), (channel_id, message_id), now)
+
+    def pop_user(self, guild_id: int, user_id: int, now: Optional[float] = None) -> dict[int, list[int]]:
+        """取出並移除用戶時間窗內的訊息, 依頻道分組"""
+        window = self.messages.get((guild_id, user_id), now)
+        if window is None:
+            return {}
+
+        by_channel: defaultdict[int, list[int]] = defaultdict(list)
+        for _, (channel_id, message_id) in window.events:
+            by_channel[channel_id].append(message_id)
+        self.messages.remove((guild_id, user_id))
+        return dict(by_channel)
+
+    def stats(self) -> dict[str, int]:
+        return self.messages.stats()
+
+
+_recent_messages: Optional[RecentMessageIndex] = None
+
+
+def get_recent_messages() -> RecentMessageIndex:
+    """獲取全局近期訊息索引"""
+    global _recent_messages
+    if _recent_messages is None:
+        settings = get_settings().history
+        _recent_messages = RecentMessageIndex(settings.recent_message_window, settings.recent_message_limit)
+    return _recent_messages
@@ -0,0 +1,162 @@
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+import logging
+import time
+
+import discord
+
+from .action_queue import get_action_queue
+from .instrumentation import get_instrumentation
+from .metrics import get_metrics
+from .url_scanner import ParsedURL, extract_urls
+
+logger = logging.getLogger("xaoc")
+
+
+@dataclass(slots=True)
+class MessageFeatures:
+    """每則訊息只計算一次, 供所有檢測器共用的特徵"""
+
+    content: str
+    lowered: str
+    urls: list[ParsedURL]
+    mention_count: int
+    newline_count: int
+    guild_id: Optional[str]
+    author_id: str
+    author_is_bot: bool
+    author_is_moderator: bool
+
+    @classmethod
+    def from_message(cls, message: discord.Message) -> "MessageFeatures":
+        content = message.content
+        author = message.author
+        permissions = author.guild_permissions if isinstance(author, discord.Member) else None
+        return cls(
+            content=content,
+            lowered=content.lower(),
+            urls=extract_urls(content),
+            mention_count=len(message.mentions),
+            newline_count=content.count("\n"),
+            guild_id=str(message.guild.id) if message.guild else None,
+            author_id=str(author.id),
+            author_is_bot=author.bot,
+            author_is_moderator=bool(permissions and (permissions.administrator or permissions.manage_messages)),
+        )
+
+
+VerdictAction = Callable[[discord.Message, MessageFeatures], Awaitable[None]]
+
+
+@dataclass(slots=True)
+class Verdict:
+    """
+    檢測結果
+
+    block 為 True 時管線會刪除訊息並停止執行後續檢測器,
+    action 則是檢測器自己的後續處理 (加熱力值、禁言等);
+    先前檢測器的非阻擋結果, 其 action 在訊息被阻擋時仍會執行
+    """
+
+    reason: str
+    block: bool = True
+    action: Optional[VerdictAction] = None
+
+
+Detector = Callable[[discord.Message, MessageFeatures], Optional[Verdict]]
+
+
+@dataclass(slots=True, order=True)
+class _Registration:
+    priority: int
+    name: str = field(compare=False)
+    detector: Detector = field(compare=False)
+
+
+class MessagePipeline:
+    """
+    統一的訊息檢測管線
+
+    各 cog 透過 register 註冊檢測器, 每則訊息只建立一次 MessageFeatures,
+    依優先序執行檢測器, 遇到第一個阻擋結果就只執行一次刪除
+    """
+
+    def __init__(self):
+        self._detectors: list[_Registration] = []
+        metrics = get_metrics()
+        self._inspected = metrics.counter("messages_inspected_total", "經過檢測管線的訊息數")
+        self._detections = metrics.counter("detections_total", "各檢測器的檢出次數", ("detector", "outcome"))
+
+    def register(self, name: str, detector: Detector, priority: int = 100) -> None:
+        """註冊檢測器, priority 越小越先執行"""
+        self.unregister(name)
+        self._detectors.append(_Registration(priority, name, detector))
+        self._detectors.sort()
+        logger.info(f"已註冊訊息檢測器 {name} (優先序 {priority})")
+
+    def unregister(self, name: str) -> None:
+        self._detectors = [registration for registration in self._detectors if registration.name != name]
+
+    @property
+    def detector_names(self) -> list[str]:
+        return [registration.name for registration in self._detectors]
+
+    async def inspect(self, message: discord.Message) -> Optional[Verdict]:
+        """檢測訊息, 返回造成阻擋的結果 (沒有則返回 None)"""
+        self._inspected.inc()
+        features = MessageFeatures.from_message(message)
+        flagged: list[Verdict] = []
+        instrumentation = get_instrumentation()
+
+        for registration in self._detectors:
+            start = time.perf_counter()
+            try:
+                verdict = registration.detector(message, features)
+            except Exception as e:
+                logger.error(f"訊息檢測器 {registration.name} 發生錯誤: {e}", exc_info=True)
+                continue
+            finally:
+                instrumentation.observe(f"detector:{registration.name}", time.perf_counter() - start)
+
+            if verdict is None:
+                continue
+            self._detections.inc(registration.name, "block" if verdict.block else "flag")
+            if verdict.block:
+                await self._enforce(message, features, registration.name, verdict)
+                for earlier in flagged:
+                    await self._run_action(message, features, earlier)
+                return verdict
+            flagged.append(verdict)
+
+        for verdict in flagged:
+            await self._run_action(message, features, verdict)
+        return None
+
+    async def _enforce(self, message: discord.Message, features: MessageFeatures, name: str, verdict: Verdict):
+        logger.warning(
+            f"[{name}] 攔截訊息 | 用戶: {message.author} ({message.author.id}) | "
+            f"頻道: {message.channel} ({message.channel.id}) | 原因: {verdict.reason}"
+        )
+        # 刪除交給動作佇列, 同一頻道短時間內的多則訊息會合併為批次刪除
+        get_action_queue().delete_message(message)
+
+        await self._run_action(message, features, verdict)
+
+    async def _run_action(self, message: discord.Message, features: MessageFeatures, verdict: Verdict):
+        if verdict.action is None:
+            return
+        try:
+            await verdict.action(message, features)
+        except Exception as e:
+            logger.error(f"處理檢測結果時發生錯誤: {e}", exc_info=True)
+
+
+_message_pipeline: Optional[MessagePipeline] = None
+
+
+def get_message_pipeline() -> MessagePipeline:
+    """獲取全局訊息檢測管線"""
+    global _message_pipeline
+    if _message_pipeline is None:
+        _message_pipeline = MessagePipeline()
+    return _message_pipeline
@@ -0,0 +1,159 @@
+from typing import Optional
+import asyncio
+import logging
+
+from .instrumentation import BUCKET_BOUNDS, get_instrumentation
+from .setting import get_settings
+
+logger = logging.getLogger("xaoc")
+
+# 輸出時只取部分分桶邊界, 累計值仍然精確 (邊界與內部分桶對齊)
+_EXPORT_TARGETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+_EXPORT_INDEXES = sorted(
+    {min(range(len(BUCKET_BOUNDS) - 1), key=lambda i: abs(BUCKET_BOUNDS[i] - target)) for target in _EXPORT_TARGETS}
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    """只增不減的計數器, 以標籤值的 tuple 分開計數"""
+
+    __slots__ = ("name", "help", "labels", "values")
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1.0) -> None:
+        self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value:g}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Prometheus 文字格式的指標
+
+    計數器由各模組在熱路徑上直接累加 (一次 dict 操作); 延遲直方圖與 gauge
+    沿用 Instrumentation 的資料, 只有在被抓取時才轉換格式
+    """
+
+    def __init__(self, prefix: str = "xaoc"):
+        self.prefix = prefix
+        self.counters: dict[str, Counter] = {}
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        full_name = f"{self.prefix}_{name}"
+        counter = self.counters.get(full_name)
+        if counter is None:
+            counter = self.counters[full_name] = Counter(full_name, help, labels)
+        return counter
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for counter in self.counters.values():
+            lines.extend(counter.render())
+
+        instrumentation = get_instrumentation()
+        for name, value in instrumentation.read_gauges().items():
+            metric = f"{self.prefix}_{name}"
+            lines.extend((f"# TYPE {metric} gauge", f"{metric} {value:g}"))
+
+        metric = f"{self.prefix}_latency_seconds"
+        lines.extend((f"# HELP {metric} 事件監聽器/檢測器/API 的執行時間", f"# TYPE {metric} histogram"))
+        for name, histogram in list(instrumentation.histograms.items()):
+            label = f'name="{_escape(name)}"'
+            cumulative = 0
+            position = 0
+            for index in _EXPORT_INDEXES:
+                cumulative += sum(histogram.counts[position : index + 1])
+                position = index + 1
+                lines.append(f'{metric}_bucket{{{label},le="{BUCKET_BOUNDS[index]:.6g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {histogram.count}')
+            lines.append(f"{metric}_sum{{{label}}} {histogram.total:.6g}")
+            lines.append(f"{metric}_count{{{label}}} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """在機器人的事件迴圈上提供 /metrics 的極簡 HTTP 伺服器"""
+
+    def __init__(self, registry: MetricsRegistry, host: str, port: int):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"指標伺服器已啟動: http://{self.host}:{self.port}/metrics")
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # 讀掉其餘的 header
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", self.registry.render().encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                status, body, content_type = "404 Not Found", b"not found\n", "text/plain"
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+                + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+_metrics: Optional[MetricsRegistry] = None
+_metrics_server: Optional[MetricsServer] = None
+
+
+def get_metrics() -> MetricsRegistry:
+    """獲取全局指標"""
+    global _metrics
+    if _metrics is None:
+        _metrics = MetricsRegistry()
+    return _metrics
+
+
+def get_metrics_server() -> Optional[MetricsServer]:
+    """獲取指標伺服器, 設定中未啟用時返回 None"""
+    global _metrics_server
+    settings = get_settings().metrics
+    if not settings.enabled:
+        return None
+    if _metrics_server is None:
+        _metrics_server = MetricsServer(get_metrics(), settings.host, settings.port)
+    return _metrics_server
@@ -0,0 +1,139 @@
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+import re
+
+from .url_scanner import is_ip_address, normalize_host
+
+# 官方網域 (含子網域) 永遠不會被判定為釣魚
+OFFICIAL_DOMAINS = frozenset(
+    {
+        "discord.com",
+        "discord.gg",
+        "discord.gift",
+        "discord.media",
+        "discord.new",
+        "discord.dev",
+        "discordapp.com",
+        "discordapp.net",
+        "discordstatus.com",
+        "steamcommunity.com",
+        "steampowered.com",
+        "steamstatic.com",
+        "steamgames.com",
+        "steamusercontent.com",
+        "steamchina.com",
+    }
+)
+
+# 常見的 discord/steam 仿冒寫法, 原樣拼寫的品牌名稱 (如 discord.js.org) 不算
+_LOOKALIKE_PATTERN = re.compile(
+    r"d[il1|]s[ck]{1,2}[o0]r[dcl]|steam[\W_]*c[o0]m{1,2}u[mn]{1,2}[il1|]t[yi]|nitro[\W_]*(?:gift|free|drop)"
+)
+_BRAND_SPELLINGS = frozenset({"discord", "steamcommunity"})
+
+
+class PhishingMatch(NamedTuple):
+    host: str
+    kind: str  # "exact" | "suffix" | "lookalike"
+    matched: str
+
+    @property
+    def reason(self) -> str:
+        if self.kind == "exact":
+            return f"已知釣魚網域 ({self.matched})"
+        if self.kind == "suffix":
+            return f"已知釣魚網域的子網域 ({self.host} ⊂ {self.matched})"
+        return f"仿冒網域 ({self.host})"
+
+
+def _suffixes(host: str) -> Iterable[str]:
+    """a.b.c -> a.b.c, b.c"""
+    yield host
+    index = host.find(".")
+    while index != -1:
+        suffix = host[index + 1 :]
+        if "." not in suffix:
+            return
+        yield suffix
+        index = host.find(".", index + 1)
+
+
+def is_official_domain(host: str) -> bool:
+    return any(suffix in OFFICIAL_DOMAINS for suffix in _suffixes(host))
+
+
+class DomainIndex:
+    """
+    釣魚網域索引
+
+    以 hash set 儲存網域, 查詢時逐層剝除子網域標籤,
+    一個主機名稱只需要 O(標籤數) 次 hash 查詢
+    """
+
+    __slots__ = ("domains", "sources")
+
+    def __init__(self, domains: Iterable[str] = (), sources: Optional[dict[str, float]] = None):
+        self.domains: frozenset[str] = frozenset(domains)
+        self.sources: dict[str, float] = sources or {}
+
+    def __len__(self) -> int:
+        return len(self.domains)
+
+    def match(self, host: str) -> Optional[PhishingMatch]:
+        if not host or is_official_domain(host):
+            return None
+
+        domains = self.domains
+        if is_ip_address(host):
+            # IP 只比對完整位址, 不能逐層剝除
+            return PhishingMatch(host, "exact", host) if host in domains else None
+
+        for suffix in _suffixes(host):
+            if suffix in domains:
+                return PhishingMatch(host, "exact" if suffix == host else "suffix", suffix)
+
+        for lookalike in _LOOKALIKE_PATTERN.finditer(host):
+            if lookalike.group(0) not in _BRAND_SPELLINGS:
+                return PhishingMatch(host, "lookalike", lookalike.group(0))
+        return None
+
+    @staticmethod
+    def parse_line(line: str) -> Optional[str]:
+        """解析清單中的一行, 支援純網域、hosts 格式與 *.domain"""
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            return None
+        parts = line.split()
+        domain = parts[-1]
+        if "://" in domain:
+            domain = domain.split("://", 1)[1]
+        domain = domain.split("/", 1)[0].lstrip("*.")
+        domain = normalize_host(domain)
+        return domain if "." in domain else None
+
+    @classmethod
+    def from_directory(cls, directory: str) -> "DomainIndex":
+        """從資料夾內的 *.txt 清單建立索引"""
+        path = Path(directory)
+        domains: set[str] = set()
+        sources: dict[str, float] = {}
+        if not path.is_dir():
+            return cls(domains, sources)
+
+        for list_file in sorted(path.glob("*.txt")):
+            sources[str(list_file)] = list_file.stat().st_mtime
+            with open(list_file, "r", encoding="utf-8", errors="ignore") as f:
+                for line in f:
+                    domain = cls.parse_line(line)
+                    if domain:
+                        domains.add(domain)
+
+        return cls(domains, sources)
+
+    def is_stale(self, directory: str) -> bool:
+        """清單檔案有新增、刪除或修改時返回 True"""
+        path = Path(directory)
+        if not path.is_dir():
+            return bool(self.sources)
+        current = {str(list_file): list_file.stat().st_mtime for list_file in path.glob("*.txt")}
+        return current != self.sources
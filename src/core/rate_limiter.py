@@ -0,0 +1,223 @@
+from collections import OrderedDict, deque
+from typing import Generic, Hashable, Iterator, Optional, TypeVar
+import sys
+import time
+
+from .setting import get_settings
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T", bound=Hashable)
+
+IDLE_EVICTION_BUDGET = 2  # 每次操作最多檢查的閒置 key 數
+KEY_OVERHEAD_BYTES = 1100  # 每個 key 的 deque/dict/物件 估計開銷
+EVENT_OVERHEAD_BYTES = 128  # 每筆事件的 tuple/float/計數 估計開銷
+
+
+class SlidingWindow(Generic[T]):
+    """
+    單一 key 的滑動時間窗
+
+    事件依時間順序存在 deque 中, 並維護每種內容的累計次數,
+    新增與過期都是攤銷 O(1), 不需要每次重建列表
+    """
+
+    __slots__ = ("events", "counts", "last_seen", "max_events", "nbytes")
+
+    def __init__(self, max_events: Optional[int] = None):
+        self.events: deque[tuple[float, T]] = deque()
+        self.counts: dict[T, int] = {}
+        self.last_seen = 0.0
+        self.max_events = max_events
+        self.nbytes = KEY_OVERHEAD_BYTES
+
+    def _pop_oldest(self) -> None:
+        _, item = self.events.popleft()
+        self.nbytes -= EVENT_OVERHEAD_BYTES + sys.getsizeof(item)
+        remaining = self.counts[item] - 1
+        if remaining:
+            self.counts[item] = remaining
+        else:
+            del self.counts[item]
+
+    def expire(self, cutoff: float) -> None:
+        events = self.events
+        while events and events[0][0] < cutoff:
+            self._pop_oldest()
+
+    def add(self, now: float, item: T) -> None:
+        if self.max_events is not None and len(self.events) >= self.max_events:
+            self._pop_oldest()
+        self.events.append((now, item))
+        self.nbytes += EVENT_OVERHEAD_BYTES + sys.getsizeof(item)
+        self.counts[item] = self.counts.get(item, 0) + 1
+        self.last_seen = now
+
+    def count(self, item: T) -> int:
+        return self.counts.get(item, 0)
+
+    def most_common(self, limit: int) -> list[tuple[T, int]]:
+        return sorted(self.counts.items(), key=lambda x: x[1], reverse=True)[:limit]
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+
+class MemoryBudget:
+    """
+    多個 WindowedCounter 共用的記憶體預算
+
+    總用量超過上限時, 從所有計數器中找出最久未活動的 key 逐一淘汰
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.evicted_keys = 0
+        self.counters: dict[str, "WindowedCounter"] = {}
+
+    def register(self, name: str, counter: "WindowedCounter") -> None:
+        self.unregister(name)
+        self.counters[name] = counter
+        self.used_bytes += counter.nbytes
+
+    def unregister(self, name: str) -> None:
+        counter = self.counters.pop(name, None)
+        if counter is not None:
+            self.used_bytes -= counter.nbytes
+
+    def charge(self, delta: int) -> None:
+        self.used_bytes += delta
+
+    def enforce(self) -> None:
+        if self.max_bytes is None:
+            return
+        while self.used_bytes > self.max_bytes:
+            oldest: Optional[WindowedCounter] = None
+            oldest_seen = float("inf")
+            for counter in self.counters.values():
+                last_seen = counter.oldest_last_seen()
+                if last_seen is not None and last_seen < oldest_seen:
+                    oldest, oldest_seen = counter, last_seen
+            if oldest is None:
+                return
+            oldest.evict_oldest()
+            self.evicted_keys += 1
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """各計數器目前的 key 數、事件數與估計位元組數"""
+        return {name: counter.stats() for name, counter in self.counters.items()}
+
+
+class WindowedCounter(Generic[K, T]):
+    """
+    以 key 分組的滑動時間窗計數器
+
+    key 依最後活動時間排序, 每次操作順便檢查少量最久未活動的 key,
+    超過時間窗就移除, 因此不需要定期全量掃描; 掛上 MemoryBudget 後
+    總用量超過預算時會以 LRU 淘汰
+    """
+
+    def __init__(
+        self,
+        window_seconds: float,
+        max_events: Optional[int] = None,
+        budget: Optional[MemoryBudget] = None,
+        name: Optional[str] = None,
+    ):
+        self.window_seconds = window_seconds
+        self.max_events = max_events
+        self.budget = budget
+        self.nbytes = 0
+        self.event_count = 0
+        self._windows: OrderedDict[K, SlidingWindow[T]] = OrderedDict()
+        if budget is not None:
+            budget.register(name or f"counter-{id(self)}", self)
+
+    def _account(self, bytes_delta: int, events_delta: int) -> None:
+        self.nbytes += bytes_delta
+        self.event_count += events_delta
+        if self.budget is not None:
+            self.budget.charge(bytes_delta)
+
+    def add(self, key: K, item: T, now: Optional[float] = None) -> SlidingWindow[T]:
+        """記錄一個事件並返回該 key 已過期清理後的時間窗"""
+        if now is None:
+            now = time.time()
+
+        window = self._windows.get(key)
+        if window is None:
+            window = SlidingWindow(self.max_events)
+            self._windows[key] = window
+            before_bytes, before_events = 0, 0
+        else:
+            self._windows.move_to_end(key)
+            before_bytes, before_events = window.nbytes, len(window)
+
+        window.expire(now - self.window_seconds)
+        window.add(now, item)
+        self._account(window.nbytes - before_bytes, len(window) - before_events)
+
+        self._evict_idle(now)
+        if self.budget is not None:
+            self.budget.enforce()
+        return window
+
+    def get(self, key: K, now: Optional[float] = None) -> Optional[SlidingWindow[T]]:
+        window = self._windows.get(key)
+        if window is None:
+            return None
+        before_bytes, before_events = window.nbytes, len(window)
+        window.expire((time.time() if now is None else now) - self.window_seconds)
+        self._account(window.nbytes - before_bytes, len(window) - before_events)
+        return window
+
+    def remove(self, key: K) -> bool:
+        window = self._windows.pop(key, None)
+        if window is None:
+            return False
+        self._account(-window.nbytes, -len(window))
+        return True
+
+    def oldest_last_seen(self) -> Optional[float]:
+        if not self._windows:
+            return None
+        return self._windows[next(iter(self._windows))].last_seen
+
+    def evict_oldest(self) -> None:
+        if self._windows:
+            _, window = self._windows.popitem(last=False)
+            self._account(-window.nbytes, -len(window))
+
+    def _evict_idle(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        windows = self._windows
+        for _ in range(IDLE_EVICTION_BUDGET):
+            if not windows:
+                return
+            oldest_key = next(iter(windows))
+            if windows[oldest_key].last_seen >= cutoff:
+                return
+            self.evict_oldest()
+
+    def stats(self) -> dict[str, int]:
+        return {"keys": len(self._windows), "events": self.event_count, "bytes": self.nbytes}
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._windows
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self._windows)
+
+
+_history_budget: Optional[MemoryBudget] = None
+
+
+def get_history_budget() -> MemoryBudget:
+    """獲取訊息/指令歷史共用的全局記憶體預算"""
+    global _history_budget
+    if _history_budget is None:
+        _history_budget = MemoryBudget(get_settings().history.max_bytes)
+    return _history_budget
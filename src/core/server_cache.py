@@ -1,18 +1,106 @@
 from dataclasses import dataclass, field
 from datetime import datetime
+from enum import IntEnum
+from typing import TYPE_CHECKING, Iterator, NamedTuple, Optional
+import heapq
+import itertools
+import time
+
+if TYPE_CHECKING:
+    from .storage import HeatStore
+
+VIOLATION_HISTORY_SIZE = 10  # 每位用戶保留的違規紀錄上限
+NEW_USER_GRACE_SECONDS = 60.0  # 新建紀錄在首次檢查淘汰前的保留時間
+
+
+class ViolationReason(IntEnum):
+    """違規原因代碼"""
+
+    SPAM_MESSAGE = 1
+    SPAM_BURST = 2
+    PHISHING_LINK = 3
+    HONEYPOT_TRIGGER = 4
+    NEW_ACCOUNT = 5
+    USER_INSTALL_SPAM = 6
+    LOOKALIKE_DOMAIN = 7
+    SPAM_WAVE = 8
+    JOIN_WAVE = 9
+
+    @property
+    def label(self) -> str:
+        return _VIOLATION_LABELS[self]
+
+
+_VIOLATION_LABELS = {
+    ViolationReason.SPAM_MESSAGE: "垃圾訊息",
+    ViolationReason.SPAM_BURST: "短時間大量訊息",
+    ViolationReason.PHISHING_LINK: "釣魚連結",
+    ViolationReason.HONEYPOT_TRIGGER: "觸發蜜罐",
+    ViolationReason.NEW_ACCOUNT: "新帳號可疑行為",
+    ViolationReason.USER_INSTALL_SPAM: "User install spam",
+    ViolationReason.LOOKALIKE_DOMAIN: "仿冒網域",
+    ViolationReason.SPAM_WAVE: "跨伺服器協同垃圾訊息",
+    ViolationReason.JOIN_WAVE: "加入潮",
+}
+
+
+class Violation(NamedTuple):
+    timestamp: float
+    reason: ViolationReason
+    amount: float
+
+    def format(self) -> str:
+        """渲染成顯示用字串"""
+        when = datetime.fromtimestamp(self.timestamp).strftime("%Y-%m-%d %H:%M:%S")
+        return f"[{when}] {self.reason.label} (+{self.amount})"
+
+
+class ViolationRing:
+    """
+    固定容量的違規紀錄環形緩衝區, 超過容量時覆蓋最舊的紀錄
+    """
+
+    __slots__ = ("_entries", "_head")
+
+    def __init__(self):
+        self._entries: list[Violation] = []
+        self._head = 0
+
+    def append(self, violation: Violation) -> None:
+        if len(self._entries) < VIOLATION_HISTORY_SIZE:
+            self._entries.append(violation)
+        else:
+            self._entries[self._head] = violation
+            self._head = (self._head + 1) % VIOLATION_HISTORY_SIZE
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._head = 0
+
+    def recent(self, limit: int = VIOLATION_HISTORY_SIZE) -> list[Violation]:
+        """由舊到新返回最近 limit 筆紀錄"""
+        ordered = self._entries[self._head :] + self._entries[: self._head]
+        return ordered[-limit:] if limit > 0 else []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[Violation]:
+        return iter(self.recent())
 
 
-@dataclass
+@dataclass(slots=True)
 class UserHeatData:
     heat_value: float = 0.0
-    last_updated: datetime = field(default_factory=datetime.now)
-    violations: list[str] = field(default_factory=list)
+    last_updated: float = field(default_factory=time.time)
+    decayed_at: float = field(default_factory=time.time)  # heat_value 上次套用衰減的時間
+    violations: ViolationRing = field(default_factory=ViolationRing)
     spam_count: int = 0
     phishing_attempt_count: int = 0
     honeypot_trigger_count: int = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class UserSchema:
     """
     discord user schema
@@ -22,66 +110,99 @@ class UserSchema:
     heat_data: UserHeatData = field(default_factory=UserHeatData)
 
 
-@dataclass
+@dataclass(slots=True)
 class ServerSchema:
     """
     discord server schema
     """
 
     id: str
-    users: list[UserSchema]
+    users: dict[str, UserSchema] = field(default_factory=dict)
 
 
 class ServerCache:
+    """
+    以 guild id -> user id -> 紀錄 的字典儲存, 查詢/新增/刪除皆為 O(1)
+
+    另外維護一個依到期時間排序的 heap, 讓熱力系統可以逐步淘汰已歸零的紀錄
+    掛上 store 後, 變更會通知 store 以便批次寫入
+    """
+
     def __init__(self):
-        self.servers: list[ServerSchema] = []
+        self.servers: dict[str, ServerSchema] = {}
+        self.store: Optional["HeatStore"] = None
+        self._expiry_heap: list[tuple[float, int, str, UserSchema]] = []
+        self._expiry_seq = itertools.count()
+
+    def mark_dirty(self, server_id: str, user_id: str) -> None:
+        """標記紀錄已變更, 等待下次寫入"""
+        if self.store is not None:
+            self.store.mark_user_dirty(server_id, user_id)
 
     def get_server(self, server_id: str) -> ServerSchema | None:
-        for server in self.servers:
-            if server.id == server_id:
-                return server
-        return None
+        return self.servers.get(server_id)
 
     def get_user(self, server_id: str, user_id: str) -> UserSchema | None:
-        server = self.get_server(server_id)
+        server = self.servers.get(server_id)
         if server:
-            for user in server.users:
-                if user.id == user_id:
-                    return user
+            return server.users.get(user_id)
         return None
 
     def add_server(self, server_id: str) -> ServerSchema:
-        server = ServerSchema(id=server_id, users=[])
-        self.servers.append(server)
+        server = self.servers.get(server_id)
+        if server is None:
+            server = ServerSchema(id=server_id)
+            self.servers[server_id] = server
         return server
 
     def add_user(self, server_id: str, user_id: str) -> UserSchema:
-        server = self.get_server(server_id)
-        if not server:
-            server = self.add_server(server_id)
+        server = self.add_server(server_id)
         user = UserSchema(id=user_id)
-        server.users.append(user)
+        server.users[user_id] = user
+        self.schedule_expiry(server_id, user, time.time() + NEW_USER_GRACE_SECONDS)
         return user
 
     def get_or_create_user(self, server_id: str, user_id: str) -> UserSchema:
-        user = self.get_user(server_id, user_id)
-        if not user:
-            user = self.add_user(server_id, user_id)
-        return user
+        server = self.servers.get(server_id)
+        if server:
+            user = server.users.get(user_id)
+            if user:
+                return user
+        return self.add_user(server_id, user_id)
 
     def get_user_heat_data(self, server_id: str, user_id: str) -> UserHeatData:
         user = self.get_or_create_user(server_id, user_id)
         return user.heat_data
 
+    def schedule_expiry(self, server_id: str, user: UserSchema, expire_at: float) -> None:
+        """排程在 expire_at 時重新檢查該紀錄是否可淘汰"""
+        heapq.heappush(self._expiry_heap, (expire_at, next(self._expiry_seq), server_id, user))
+
+    def pop_expired(self, now: float, limit: int) -> list[tuple[str, UserSchema]]:
+        """取出最多 limit 筆已到期且仍在快取中的紀錄"""
+        expired = []
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now and len(expired) < limit:
+            _, _, server_id, user = heapq.heappop(heap)
+            server = self.servers.get(server_id)
+            if server and server.users.get(user.id) is user:
+                expired.append((server_id, user))
+        return expired
+
     def reset_server(self, server_id: str):
-        server = self.get_server(server_id)
+        server = self.servers.get(server_id)
         if server:
-            server.users = []
+            for user_id in server.users:
+                self.mark_dirty(server_id, user_id)
+            server.users.clear()
 
     def reset_user(self, server_id: str, user_id: str):
-        server = self.get_server(server_id)
-        if server:
-            server.users = [user for user in server.users if user.id != user_id]
+        server = self.servers.get(server_id)
+        if server and server.users.pop(user_id, None) is not None:
+            self.mark_dirty(server_id, user_id)
 
     def reset_all(self):
-        self.servers = []
+        self.servers.clear()
+        self._expiry_heap.clear()
+        if self.store is not None:
+            self.store.mark_heat_wiped()
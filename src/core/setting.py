@@ -23,6 +23,12 @@ class LogSettings(BaseModel):
     format: str = Field(
         default="[xaoc] %(asctime)s %(levelname)s: %(message)s", description="日誌格式"
     )
+    rotation: str = Field(default="size", description="日誌輪替方式 (size 依大小, time 依時間)")
+    max_bytes: int = Field(default=10 * 1024 * 1024, description="依大小輪替時的單檔上限(位元組)")
+    rotate_when: str = Field(default="midnight", description="依時間輪替的時機 (TimedRotatingFileHandler 的 when)")
+    backup_count: int = Field(default=7, description="保留的舊日誌數量")
+    queue_size: int = Field(default=10000, description="日誌佇列上限, 滿載時丟棄紀錄")
+    low_priority_sample: int = Field(default=10, description="佇列接近滿載時, 低於 WARNING 的紀錄每幾筆保留一筆")
 
     @field_validator("level")
     @classmethod
@@ -32,11 +38,41 @@ class LogSettings(BaseModel):
             raise ValueError(f"日誌級別必須是 {valid_levels} 中的一個")
         return v.upper()
 
+    @field_validator("rotation")
+    @classmethod
+    def validate_rotation(cls, v):
+        if v not in ("size", "time"):
+            raise ValueError("日誌輪替方式必須是 size 或 time")
+        return v
+
+    @field_validator("max_bytes", "queue_size", "low_priority_sample")
+    @classmethod
+    def validate_log_positive(cls, v):
+        if v < 1:
+            raise ValueError("數值必須至少為 1")
+        return v
+
+    @field_validator("backup_count")
+    @classmethod
+    def validate_backup_count(cls, v):
+        if v < 0:
+            raise ValueError("保留數量不能為負數")
+        return v
+
 
 class MemberFilterSettings(BaseModel):
     enabled: bool = Field(default=True, description="是否啟用成員過濾")
     min_account_age_days: int = Field(default=1, description="帳號最小年齡(天)")
     kick_new_accounts: bool = Field(default=True, description="是否踢出新帳號")
+    join_wave_enabled: bool = Field(default=True, description="是否啟用加入潮檢測")
+    join_wave_window: float = Field(default=60.0, description="加入潮統計時間窗(秒)")
+    join_wave_threshold: int = Field(default=15, description="時間窗內加入數達到此數量時檢查是否為加入潮")
+    join_wave_cluster_size: int = Field(default=8, description="帳號建立時間或名稱相近的人數達到此數量時視為加入潮")
+    lockdown_seconds: float = Field(default=600.0, description="封鎖模式持續時間(秒), 每次有符合的加入會延長")
+    lockdown_action: str = Field(default="kick", description="封鎖模式對加入潮成員的處置 (kick 或 quarantine)")
+    join_batch_window: float = Field(default=1.0, description="新成員累積成批次處理的等待時間(秒)")
+    join_batch_size: int = Field(default=100, description="每批最多處理的新成員數")
+    max_inflight_kicks: int = Field(default=10, description="同時進行中的踢出動作上限")
 
     @field_validator("min_account_age_days")
     @classmethod
@@ -45,11 +81,401 @@ class MemberFilterSettings(BaseModel):
             raise ValueError("帳號最小年齡不能為負數")
         return v
 
+    @field_validator("join_wave_window", "lockdown_seconds", "join_batch_window")
+    @classmethod
+    def validate_join_seconds(cls, v):
+        if v <= 0:
+            raise ValueError("時間必須大於 0")
+        return v
+
+    @field_validator("join_wave_threshold", "join_wave_cluster_size")
+    @classmethod
+    def validate_join_wave_counts(cls, v):
+        if v < 2:
+            raise ValueError("數值必須至少為 2")
+        return v
+
+    @field_validator("join_batch_size", "max_inflight_kicks")
+    @classmethod
+    def validate_join_batch_limits(cls, v):
+        if v < 1:
+            raise ValueError("數值必須至少為 1")
+        return v
+
+    @field_validator("lockdown_action")
+    @classmethod
+    def validate_lockdown_action(cls, v):
+        if v not in ("kick", "quarantine"):
+            raise ValueError("封鎖模式處置必須是 kick 或 quarantine")
+        return v
+
+
+SPAM_HISTORY_EVENTS = 10  # 每位用戶保留的訊息數, 訊息數門檻必須小於此值
+COMMAND_HISTORY_EVENTS = 20  # 每位用戶保留的指令數, 指令數門檻必須小於此值
+
+
+class GuildSettings(BaseModel):
+    """可依伺服器覆寫的門檻與熱力權重, 值為 None 的欄位沿用全域區段的設定"""
+
+    heat_spam_message: float = Field(default=10.0, description="垃圾訊息的熱力值")
+    heat_spam_burst: float = Field(default=25.0, description="短時間大量訊息的熱力值")
+    heat_spam_wave: float = Field(default=30.0, description="多帳號協同發送相同內容的熱力值")
+    heat_phishing_link: float = Field(default=50.0, description="釣魚連結的熱力值 (仿冒網域依相似度按比例計算)")
+    heat_honeypot_trigger: float = Field(default=100.0, description="觸發蜜罐的熱力值")
+    heat_new_account: float = Field(default=15.0, description="新帳號加入的熱力值")
+    heat_join_wave: float = Field(default=75.0, description="屬於加入潮的熱力值")
+    heat_user_install_spam: float = Field(default=40.0, description="User install spam 的熱力值")
+    heat_decay_rate: float = Field(default=2.0, description="每小時自然衰減的熱力值")
+    timeout_threshold: float = Field(default=50.0, description="達到此熱力值時禁言")
+    quarantine_threshold: float = Field(default=75.0, description="達到此熱力值時隔離")
+    spam_max_messages: int = Field(default=5, description="時間區間內最大訊息數")
+    spam_max_identical: int = Field(default=3, description="時間區間內最大重複訊息數")
+    spam_max_mentions: int = Field(default=5, description="單則訊息最大 mention 數量")
+    spam_max_newlines: int = Field(default=30, description="單則訊息最大換行數")
+    command_max_per_window: int = Field(default=10, description="時間區間內最大指令數")
+    command_max_identical: int = Field(default=5, description="時間區間內最大重複指令數")
+    honeypot_channel_id: Optional[str] = Field(default=None, description="蜜罐頻道ID (None 沿用 honeypot.channel_id)")
+    min_account_age_days: Optional[int] = Field(
+        default=None, description="帳號最小年齡(天) (None 沿用 member_filter.min_account_age_days)"
+    )
+    kick_new_accounts: Optional[bool] = Field(
+        default=None, description="是否踢出新帳號 (None 沿用 member_filter.kick_new_accounts)"
+    )
+    join_wave_threshold: Optional[int] = Field(
+        default=None, description="時間窗內加入數的加入潮門檻 (None 沿用 member_filter.join_wave_threshold)"
+    )
+    join_wave_cluster_size: Optional[int] = Field(
+        default=None, description="特徵相近人數的加入潮門檻 (None 沿用 member_filter.join_wave_cluster_size)"
+    )
+    lockdown_action: Optional[str] = Field(
+        default=None, description="封鎖模式的處置 kick 或 quarantine (None 沿用 member_filter.lockdown_action)"
+    )
+    lookalike_threshold: Optional[float] = Field(
+        default=None, description="仿冒網域相似度門檻 (None 沿用 phishing.lookalike_threshold)"
+    )
+
+    @field_validator(
+        "heat_spam_message",
+        "heat_spam_burst",
+        "heat_spam_wave",
+        "heat_phishing_link",
+        "heat_honeypot_trigger",
+        "heat_new_account",
+        "heat_join_wave",
+        "heat_user_install_spam",
+    )
+    @classmethod
+    def validate_heat(cls, v):
+        if v < 0:
+            raise ValueError("熱力值不能為負數")
+        return v
+
+    @field_validator("heat_decay_rate", "timeout_threshold")
+    @classmethod
+    def validate_positive(cls, v):
+        if v <= 0:
+            raise ValueError("數值必須大於 0")
+        return v
+
+    @field_validator("quarantine_threshold")
+    @classmethod
+    def validate_quarantine_threshold(cls, v, info):
+        timeout_threshold = info.data.get("timeout_threshold")
+        if timeout_threshold is not None and v < timeout_threshold:
+            raise ValueError("隔離門檻不能低於禁言門檻")
+        return v
+
+    @field_validator("spam_max_messages", "spam_max_identical")
+    @classmethod
+    def validate_spam_counts(cls, v):
+        if not 1 <= v < SPAM_HISTORY_EVENTS:
+            raise ValueError(f"數值必須介於 1 與 {SPAM_HISTORY_EVENTS - 1} 之間")
+        return v
+
+    @field_validator("command_max_per_window", "command_max_identical")
+    @classmethod
+    def validate_command_counts(cls, v):
+        if not 1 <= v < COMMAND_HISTORY_EVENTS:
+            raise ValueError(f"數值必須介於 1 與 {COMMAND_HISTORY_EVENTS - 1} 之間")
+        return v
+
+    @field_validator("spam_max_mentions", "spam_max_newlines")
+    @classmethod
+    def validate_message_limits(cls, v):
+        if v < 1:
+            raise ValueError("數值必須至少為 1")
+        return v
+
+    @field_validator("honeypot_channel_id")
+    @classmethod
+    def validate_channel_id(cls, v):
+        if v is not None and not v.isdigit():
+            raise ValueError("channel_id 必須是純數字字符串")
+        return v
+
+    @field_validator("min_account_age_days")
+    @classmethod
+    def validate_min_age(cls, v):
+        if v is not None and v < 0:
+            raise ValueError("帳號最小年齡不能為負數")
+        return v
+
+    @field_validator("join_wave_threshold", "join_wave_cluster_size")
+    @classmethod
+    def validate_join_wave_counts(cls, v):
+        if v is not None and v < 2:
+            raise ValueError("數值必須至少為 2")
+        return v
+
+    @field_validator("lockdown_action")
+    @classmethod
+    def validate_lockdown_action(cls, v):
+        if v is not None and v not in ("kick", "quarantine"):
+            raise ValueError("封鎖模式處置必須是 kick 或 quarantine")
+        return v
+
+    @field_validator("lookalike_threshold")
+    @classmethod
+    def validate_lookalike_threshold(cls, v):
+        if v is not None and not 0 < v <= 1:
+            raise ValueError("仿冒網域相似度門檻必須介於 0 與 1 之間")
+        return v
+
+
+class PhishingSettings(BaseModel):
+    enabled: bool = Field(default=True, description="是否啟用釣魚連結檢測")
+    list_dir: str = Field(default="data/phishing", description="釣魚網域清單資料夾 (*.txt)")
+    reload_interval: float = Field(default=60.0, description="檢查清單更新的間隔(秒)")
+    protected_brands: list[str] = Field(
+        default_factory=lambda: ["discord", "discordapp", "discordnitro", "steamcommunity", "steampowered"],
+        description="需要防範仿冒的品牌名稱",
+    )
+    lookalike_threshold: float = Field(default=0.85, description="仿冒網域相似度門檻 (0~1)")
+    lookalike_max_distance: int = Field(default=2, description="仿冒比對的最大編輯距離")
+
+    @field_validator("reload_interval")
+    @classmethod
+    def validate_reload_interval(cls, v):
+        if v <= 0:
+            raise ValueError("清單檢查間隔必須大於 0")
+        return v
+
+    @field_validator("lookalike_threshold")
+    @classmethod
+    def validate_lookalike_threshold(cls, v):
+        if not 0 < v <= 1:
+            raise ValueError("仿冒網域相似度門檻必須介於 0 與 1 之間")
+        return v
+
+    @field_validator("lookalike_max_distance")
+    @classmethod
+    def validate_lookalike_max_distance(cls, v):
+        if v < 0:
+            raise ValueError("最大編輯距離不能為負數")
+        return v
+
+
+class SpamWaveSettings(BaseModel):
+    enabled: bool = Field(default=True, description="是否啟用跨伺服器協同垃圾訊息檢測")
+    author_threshold: int = Field(default=5, description="含網址、邀請或 mention 的內容被多少位不同用戶發送時標記")
+    plain_author_threshold: int = Field(default=10, description="純文字內容被多少位不同用戶發送時標記")
+    min_guilds: int = Field(default=2, description="純文字內容至少出現在多少個伺服器才標記")
+    min_channels: int = Field(default=4, description="純文字內容至少出現在多少個頻道才標記")
+    max_flag_seconds: float = Field(default=600.0, description="同一內容持續被標記的最長時間(秒)")
+    window_seconds: float = Field(default=60.0, description="統計時間窗(秒)")
+    max_fingerprints: int = Field(default=50000, description="最多保留的指紋數量")
+    similarity_threshold: float = Field(default=0.6, description="近似內容的 Jaccard 相似度門檻 (0~1)")
+    min_length: int = Field(default=20, description="正規化後少於此長度的訊息不計算指紋")
+
+    @field_validator("author_threshold", "max_fingerprints")
+    @classmethod
+    def validate_positive(cls, v):
+        if v < 2:
+            raise ValueError("數值必須至少為 2")
+        return v
+
+    @field_validator("plain_author_threshold")
+    @classmethod
+    def validate_plain_author_threshold(cls, v, info):
+        author_threshold = info.data.get("author_threshold")
+        if author_threshold is not None and v < author_threshold:
+            raise ValueError("純文字的用戶門檻不能低於 author_threshold")
+        return v
+
+    @field_validator("min_guilds", "min_channels")
+    @classmethod
+    def validate_spread(cls, v):
+        if v < 1:
+            raise ValueError("數值必須至少為 1")
+        return v
+
+    @field_validator("window_seconds")
+    @classmethod
+    def validate_window(cls, v):
+        if v <= 0:
+            raise ValueError("時間窗必須大於 0")
+        return v
+
+    @field_validator("max_flag_seconds")
+    @classmethod
+    def validate_max_flag_seconds(cls, v, info):
+        window_seconds = info.data.get("window_seconds")
+        if window_seconds is not None and v < window_seconds:
+            raise ValueError("最長標記時間不能短於統計時間窗")
+        return v
+
+    @field_validator("similarity_threshold")
+    @classmethod
+    def validate_similarity_threshold(cls, v):
+        if not 0 < v <= 1:
+            raise ValueError("相似度門檻必須介於 0 與 1 之間")
+        return v
+
+
+class HistorySettings(BaseModel):
+    max_bytes: int = Field(default=64 * 1024 * 1024, description="訊息/指令歷史共用的記憶體上限(位元組)")
+    recent_message_window: float = Field(default=3600.0, description="隔離時可清除的訊息時間範圍(秒)")
+    recent_message_limit: int = Field(default=100, description="每位用戶最多記錄的近期訊息數")
+
+    @field_validator("max_bytes")
+    @classmethod
+    def validate_max_bytes(cls, v):
+        if v <= 0:
+            raise ValueError("記憶體上限必須大於 0")
+        return v
+
+    @field_validator("recent_message_window")
+    @classmethod
+    def validate_recent_message_window(cls, v):
+        # Discord 只能批次刪除 14 天內的訊息
+        if not 0 < v <= 14 * 24 * 3600:
+            raise ValueError("近期訊息時間範圍必須介於 0 與 14 天之間")
+        return v
+
+    @field_validator("recent_message_limit")
+    @classmethod
+    def validate_recent_message_limit(cls, v):
+        if v < 1:
+            raise ValueError("近期訊息數量必須至少為 1")
+        return v
+
+
+class InstrumentationSettings(BaseModel):
+    enabled: bool = Field(default=True, description="是否記錄效能量測")
+    loop_lag_interval: float = Field(default=0.5, description="量測事件迴圈延遲的間隔(秒)")
+    dump_dir: str = Field(default="logs", description="量測結果輸出資料夾")
+
+    @field_validator("loop_lag_interval")
+    @classmethod
+    def validate_loop_lag_interval(cls, v):
+        if v <= 0:
+            raise ValueError("量測間隔必須大於 0")
+        return v
+
+
+class MetricsSettings(BaseModel):
+    enabled: bool = Field(default=False, description="是否啟用 Prometheus 指標端點")
+    host: str = Field(default="127.0.0.1", description="指標端點監聽位址")
+    port: int = Field(default=9108, description="指標端點監聽埠")
+
+    @field_validator("port")
+    @classmethod
+    def validate_port(cls, v):
+        if not 0 < v < 65536:
+            raise ValueError("埠號必須介於 1 與 65535 之間")
+        return v
+
+
+class StorageSettings(BaseModel):
+    path: str = Field(default="data/xaoc.db", description="SQLite 資料庫路徑")
+    flush_interval: float = Field(default=5.0, description="批次寫入間隔(秒)")
+    backend: str = Field(default="sqlite", description="熱力/隔離狀態的儲存後端")
+
+    @field_validator("flush_interval")
+    @classmethod
+    def validate_flush_interval(cls, v):
+        if v <= 0:
+            raise ValueError("批次寫入間隔必須大於 0")
+        return v
+
+
+class ReloadSettings(BaseModel):
+    enabled: bool = Field(default=True, description="是否監看設定檔並在變更時重新載入")
+    interval: float = Field(default=2.0, description="檢查設定檔是否變更的間隔(秒)")
+
+    @field_validator("interval")
+    @classmethod
+    def validate_interval(cls, v):
+        if v <= 0:
+            raise ValueError("檢查間隔必須大於 0")
+        return v
+
+
+class CommandSyncSettings(BaseModel):
+    hash_path: str = Field(default="data/command_tree.json", description="上次同步的斜線指令雜湊紀錄檔")
+    force: bool = Field(default=False, description="啟動時不論指令是否變更都同步")
+
+
+class CacheSettings(BaseModel):
+    profile: str = Field(default="lean", description="快取設定 (lean 依載入的 cog 計算 intents 並只快取新加入的成員, full 為全部)")
+    max_messages: int = Field(default=0, description="discord.py 訊息快取上限, 0 表示停用 (檢測器使用自己的歷史紀錄)")
+    chunk_guilds_at_startup: bool = Field(default=False, description="啟動時是否下載所有伺服器的完整成員列表")
+
+    @field_validator("profile")
+    @classmethod
+    def validate_profile(cls, v):
+        if v not in ("lean", "full"):
+            raise ValueError("快取設定必須是 lean 或 full")
+        return v
+
+    @field_validator("max_messages")
+    @classmethod
+    def validate_max_messages(cls, v):
+        if v < 0:
+            raise ValueError("訊息快取上限不能小於 0")
+        return v
+
+
+class ShardingSettings(BaseModel):
+    enabled: bool = Field(default=False, description="是否使用 AutoShardedBot")
+    shard_count: Optional[int] = Field(default=None, description="總分片數, 留空時由 Discord 建議 (僅限單一行程)")
+    shard_ids: Optional[list[int]] = Field(default=None, description="此行程負責的分片, 留空時負責全部分片")
+
+    @field_validator("shard_count")
+    @classmethod
+    def validate_shard_count(cls, v):
+        if v is not None and v <= 0:
+            raise ValueError("分片數必須大於 0")
+        return v
+
+    @field_validator("shard_ids")
+    @classmethod
+    def validate_shard_ids(cls, v, info):
+        if v is None:
+            return v
+        shard_count = info.data.get("shard_count")
+        if shard_count is None:
+            raise ValueError("指定 shard_ids 時必須同時設定 shard_count")
+        if not v or any(not 0 <= shard_id < shard_count for shard_id in v):
+            raise ValueError("shard_ids 必須是 0 到 shard_count - 1 之間的分片編號")
+        return sorted(set(v))
+
 
 class Settings(BaseSettings):
     honeypot: HoneypotSettings = Field(default_factory=HoneypotSettings)
     logging: LogSettings = Field(default_factory=LogSettings)
     member_filter: MemberFilterSettings = Field(default_factory=MemberFilterSettings)
+    guild_defaults: GuildSettings = Field(default_factory=GuildSettings)
+    phishing: PhishingSettings = Field(default_factory=PhishingSettings)
+    spam_wave: SpamWaveSettings = Field(default_factory=SpamWaveSettings)
+    history: HistorySettings = Field(default_factory=HistorySettings)
+    storage: StorageSettings = Field(default_factory=StorageSettings)
+    sharding: ShardingSettings = Field(default_factory=ShardingSettings)
+    cache: CacheSettings = Field(default_factory=CacheSettings)
+    command_sync: CommandSyncSettings = Field(default_factory=CommandSyncSettings)
+    reload: ReloadSettings = Field(default_factory=ReloadSettings)
+    instrumentation: InstrumentationSettings = Field(default_factory=InstrumentationSettings)
+    metrics: MetricsSettings = Field(default_factory=MetricsSettings)
 
     model_config = {
         "env_file": ".env",
@@ -83,6 +509,17 @@ class Settings(BaseSettings):
 _settings: Optional[Settings] = None
 
 
+def settings_path() -> str:
+    # 多行程部署時每個行程可以用 XAOC_SETTINGS 指定自己的設定檔 (分片、日誌路徑、指標埠)
+    return os.getenv("XAOC_SETTINGS", "setting.json")
+
+
+def set_settings(settings: Settings) -> None:
+    """替換全局設置實例 (已驗證過的設定)"""
+    global _settings
+    _settings = settings
+
+
 def get_settings(reload: bool = False) -> Settings:
     """
     獲取全局設置實例
@@ -96,6 +533,6 @@ def get_settings(reload: bool = False) -> Settings:
     global _settings
 
     if _settings is None or reload:
-        _settings = Settings.from_json_file()
+        _settings = Settings.from_json_file(settings_path())
 
     return _settings
@@ -0,0 +1,119 @@
+from pathlib import Path
+from typing import Callable, Optional
+import asyncio
+import logging
+import os
+
+from .setting import Settings, get_settings, set_settings, settings_path
+
+logger = logging.getLogger("xaoc")
+
+# 這些設定在啟動時就被用來建立連線、資料庫或背景服務, 變更後需要重新啟動
+RESTART_REQUIRED = frozenset({"logging", "history", "storage", "instrumentation", "metrics", "sharding", "cache"})
+
+SettingsListener = Callable[[Settings, Settings, frozenset[str]], None]
+
+
+class SettingsWatcher:
+    """
+    監看設定檔, 變更時重新載入並通知訂閱者
+
+    每隔 interval 秒比較檔案的 mtime 與大小 (一次 stat), 有變更才在背景執行緒讀取並以
+    pydantic 模型驗證; 驗證失敗時保留目前的設定. 通過驗證後一次替換整個 Settings,
+    訂閱者收到 (舊設定, 新設定, 變更的區段), 熱路徑上讀取設定仍然只是屬性存取
+    """
+
+    def __init__(self, path: str, interval: float = 2.0):
+        self.path = Path(path)
+        self.interval = interval
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+
+        self._listeners: list[SettingsListener] = []
+        self._signature = self._stat()
+        self._task: Optional[asyncio.Task] = None
+
+    def _stat(self) -> Optional[tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def subscribe(self, listener: SettingsListener) -> None:
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener: SettingsListener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"檢查設定檔時發生錯誤: {e}", exc_info=True)
+
+    async def check(self, force: bool = False) -> bool:
+        """檔案有變更 (或 force) 時重新載入, 返回設定是否有變更"""
+        signature = self._stat()
+        if signature is None or (not force and signature == self._signature):
+            return False
+        # 驗證失敗也記下這個版本, 同一個錯誤只回報一次
+        self._signature = signature
+
+        try:
+            settings = await asyncio.to_thread(Settings.from_json_file, str(self.path))
+        except (OSError, ValueError) as e:
+            self.last_error = str(e)
+            logger.error(f"設定檔驗證失敗, 保留目前的設定: {e}")
+            return False
+        return self.apply(settings)
+
+    def apply(self, settings: Settings) -> bool:
+        """替換全局設定並通知訂閱者"""
+        old = get_settings()
+        changed = frozenset(name for name in Settings.model_fields if getattr(old, name) != getattr(settings, name))
+        self.last_error = None
+        if not changed:
+            return False
+
+        set_settings(settings)
+        self.reloads += 1
+        self.interval = settings.reload.interval
+        logger.info(f"已重新載入設定: {', '.join(sorted(changed))}")
+        if changed & RESTART_REQUIRED:
+            logger.warning(f"以下設定需要重新啟動才會生效: {', '.join(sorted(changed & RESTART_REQUIRED))}")
+
+        for listener in list(self._listeners):
+            try:
+                listener(old, settings, changed)
+            except Exception as e:
+                logger.error(f"套用新設定時發生錯誤: {e}", exc_info=True)
+        return True
+
+
+_watcher: Optional[SettingsWatcher] = None
+
+
+def get_settings_watcher() -> SettingsWatcher:
+    """獲取全局設定檔監看器"""
+    global _watcher
+    if _watcher is None:
+        _watcher = SettingsWatcher(settings_path(), get_settings().reload.interval)
+    return _watcher
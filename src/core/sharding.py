@@ -0,0 +1,56 @@
+from typing import Optional
+
+from .setting import get_settings
+
+
+class GuildPartition:
+    """
+    依 guild id 劃分此行程負責的伺服器
+
+    Discord 固定把伺服器分配到 (guild_id >> 22) % shard_count 號分片, 每個分片只會由
+    一個行程連線, 所以同一伺服器的事件、熱力值與隔離狀態永遠只在一個行程中處理;
+    各行程共用同一個儲存後端, 但只載入與寫入自己負責的伺服器
+    """
+
+    def __init__(self, shard_count: Optional[int] = None, shard_ids: Optional[list[int]] = None):
+        self.shard_count = shard_count
+        self.shard_ids: Optional[frozenset[int]] = frozenset(shard_ids) if shard_ids is not None else None
+
+    @property
+    def owns_all(self) -> bool:
+        return self.shard_ids is None
+
+    @property
+    def is_primary(self) -> bool:
+        """負責 0 號分片的行程, 全域性的工作 (例如同步斜線指令) 只由它執行"""
+        return self.shard_ids is None or 0 in self.shard_ids
+
+    def shard_for(self, guild_id: int | str) -> int:
+        if not self.shard_count:
+            return 0
+        return (int(guild_id) >> 22) % self.shard_count
+
+    def owns(self, guild_id: int | str) -> bool:
+        if self.shard_ids is None:
+            return True
+        return self.shard_for(guild_id) in self.shard_ids
+
+    def describe(self) -> str:
+        if self.shard_ids is None:
+            return "全部分片" if self.shard_count is None else f"全部 {self.shard_count} 個分片"
+        return f"分片 {', '.join(map(str, sorted(self.shard_ids)))} / 共 {self.shard_count} 個"
+
+
+_partition: Optional[GuildPartition] = None
+
+
+def get_partition() -> GuildPartition:
+    """獲取此行程的伺服器劃分"""
+    global _partition
+    if _partition is None:
+        settings = get_settings().sharding
+        if settings.enabled:
+            _partition = GuildPartition(settings.shard_count, settings.shard_ids)
+        else:
+            _partition = GuildPartition()
+    return _partition
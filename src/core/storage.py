@@ -0,0 +1,378 @@
+import asyncio
+import json
+import logging
+import sqlite3
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from .server_cache import ServerCache, Violation, ViolationReason
+from .setting import StorageSettings, get_settings
+from .sharding import GuildPartition, get_partition
+
+logger = logging.getLogger("xaoc")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS heat (
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    heat_value REAL NOT NULL,
+    last_updated REAL NOT NULL,
+    decayed_at REAL NOT NULL,
+    spam_count INTEGER NOT NULL,
+    phishing_attempt_count INTEGER NOT NULL,
+    honeypot_trigger_count INTEGER NOT NULL,
+    violations TEXT NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS quarantine (
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    role_ids TEXT NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS guild_config (
+    guild_id TEXT NOT NULL PRIMARY KEY,
+    overrides TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+HeatRow = tuple[str, str, float, float, float, int, int, int, str]
+QuarantineRow = tuple[str, str, str]
+GuildConfigRow = tuple[str, str]
+WriteBatch = tuple[
+    bool,
+    list[HeatRow],
+    list[tuple[str, str]],
+    list[QuarantineRow],
+    list[tuple[str, str]],
+    list[GuildConfigRow],
+    list[str],
+]
+
+
+class StateBackend(ABC):
+    """
+    熱力/隔離狀態的儲存後端
+
+    只需要讀寫 partition 負責的伺服器; 所有方法都在背景執行緒中呼叫,
+    多個行程可以共用同一個後端
+    """
+
+    def __init__(self, partition: GuildPartition):
+        self.partition = partition
+
+    @abstractmethod
+    def connect(self) -> None: ...
+
+    @abstractmethod
+    def load(self) -> tuple[list[HeatRow], list[QuarantineRow], list[GuildConfigRow]]:
+        """讀取 partition 負責的所有熱力紀錄、隔離快照與伺服器設定"""
+
+    @abstractmethod
+    def write(
+        self,
+        wipe: bool,
+        heat_upserts: list[HeatRow],
+        heat_deletes: list[tuple[str, str]],
+        quarantine_upserts: list[QuarantineRow],
+        quarantine_deletes: list[tuple[str, str]],
+        config_upserts: list[GuildConfigRow],
+        config_deletes: list[str],
+    ) -> None:
+        """在同一個交易中寫入一批變更, wipe 只清除 partition 負責的熱力紀錄"""
+
+    @abstractmethod
+    def close(self) -> None: ...
+
+    def describe(self) -> str:
+        return type(self).__name__
+
+
+class SQLiteBackend(StateBackend):
+    """
+    本機 SQLite 後端, WAL 模式下多個行程可以同時讀寫同一個檔案
+
+    資料列依 guild id 換算分片後過濾, 每個行程只會碰到自己負責的伺服器
+    """
+
+    def __init__(self, path: str, partition: GuildPartition, busy_timeout: float = 30.0):
+        super().__init__(partition)
+        self.path = Path(path)
+        self.busy_timeout = busy_timeout
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def connect(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 其他行程持有寫入鎖時等待, 而不是直接失敗
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._conn = conn
+
+    def _partition_filter(self) -> tuple[str, list[int]]:
+        if self.partition.owns_all:
+            return "", []
+        shard_ids = sorted(self.partition.shard_ids or ())
+        placeholders = ", ".join("?" * len(shard_ids))
+        return (
+            f" WHERE ((CAST(guild_id AS INTEGER) >> 22) % ?) IN ({placeholders})",
+            [self.partition.shard_count, *shard_ids],  # type: ignore
+        )
+
+    def load(self) -> tuple[list[HeatRow], list[QuarantineRow], list[GuildConfigRow]]:
+        assert self._conn is not None
+        where, params = self._partition_filter()
+        heat_rows = self._conn.execute(f"SELECT * FROM heat{where}", params).fetchall()
+        quarantine_rows = self._conn.execute(f"SELECT * FROM quarantine{where}", params).fetchall()
+        config_rows = self._conn.execute(f"SELECT * FROM guild_config{where}", params).fetchall()
+        return heat_rows, quarantine_rows, config_rows
+
+    def write(
+        self,
+        wipe: bool,
+        heat_upserts: list[HeatRow],
+        heat_deletes: list[tuple[str, str]],
+        quarantine_upserts: list[QuarantineRow],
+        quarantine_deletes: list[tuple[str, str]],
+        config_upserts: list[GuildConfigRow],
+        config_deletes: list[str],
+    ) -> None:
+        assert self._conn is not None
+        with self._conn:
+            if wipe:
+                where, params = self._partition_filter()
+                self._conn.execute(f"DELETE FROM heat{where}", params)
+            self._conn.executemany("DELETE FROM heat WHERE guild_id = ? AND user_id = ?", heat_deletes)
+            self._conn.executemany("INSERT OR REPLACE INTO heat VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", heat_upserts)
+            self._conn.executemany("DELETE FROM quarantine WHERE guild_id = ? AND user_id = ?", quarantine_deletes)
+            self._conn.executemany("INSERT OR REPLACE INTO quarantine VALUES (?, ?, ?)", quarantine_upserts)
+            self._conn.executemany("DELETE FROM guild_config WHERE guild_id = ?", [(g,) for g in config_deletes])
+            self._conn.executemany("INSERT OR REPLACE INTO guild_config VALUES (?, ?)", config_upserts)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            conn.close()
+
+    def describe(self) -> str:
+        return str(self.path)
+
+
+BackendFactory = Callable[[StorageSettings, GuildPartition], StateBackend]
+
+_backends: dict[str, BackendFactory] = {
+    "sqlite": lambda settings, partition: SQLiteBackend(settings.path, partition),
+}
+
+
+def register_backend(name: str, factory: BackendFactory) -> None:
+    """註冊儲存後端, 在設定的 storage.backend 中以名稱選用"""
+    _backends[name] = factory
+
+
+class HeatStore:
+    """
+    熱力值與隔離角色快照的持久化
+
+    熱路徑只會標記變更的 key, 由背景任務每隔 flush_interval 秒
+    在執行緒中批次寫入後端, 不會阻塞事件迴圈
+    """
+
+    def __init__(self, backend: StateBackend, flush_interval: float = 5.0):
+        self.backend = backend
+        self.flush_interval = flush_interval
+
+        self.server_cache: Optional[ServerCache] = None
+        self.quarantine_snapshots: dict[str, dict[str, list[int]]] = {}
+        self.guild_overrides: dict[str, dict[str, Any]] = {}
+
+        self._opened = False
+        self._dirty_users: set[tuple[str, str]] = set()
+        self._dirty_quarantine: set[tuple[str, str]] = set()
+        self._dirty_configs: set[str] = set()
+        self._wipe_heat = False
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._closing = asyncio.Event()
+
+    @property
+    def pending_writes(self) -> int:
+        return len(self._dirty_users) + len(self._dirty_quarantine) + len(self._dirty_configs)
+
+    def mark_user_dirty(self, guild_id: str, user_id: str) -> None:
+        self._dirty_users.add((guild_id, user_id))
+
+    def mark_heat_wiped(self) -> None:
+        self._wipe_heat = True
+        self._dirty_users.clear()
+
+    def set_quarantine(self, guild_id: str, user_id: str, role_ids: list[int]) -> None:
+        """記錄隔離前的角色快照"""
+        self.quarantine_snapshots.setdefault(guild_id, {})[user_id] = role_ids
+        self._dirty_quarantine.add((guild_id, user_id))
+
+    def pop_quarantine(self, guild_id: str, user_id: str) -> Optional[list[int]]:
+        """取出並刪除隔離前的角色快照"""
+        guild_snapshots = self.quarantine_snapshots.get(guild_id)
+        if not guild_snapshots or user_id not in guild_snapshots:
+            return None
+        self._dirty_quarantine.add((guild_id, user_id))
+        return guild_snapshots.pop(user_id)
+
+    def set_guild_overrides(self, guild_id: str, overrides: dict[str, Any]) -> None:
+        """記錄伺服器的設定覆寫, 空的覆寫會刪除紀錄"""
+        if overrides:
+            self.guild_overrides[guild_id] = overrides
+        else:
+            self.guild_overrides.pop(guild_id, None)
+        self._dirty_configs.add(guild_id)
+
+    async def open(self, server_cache: ServerCache) -> None:
+        """開啟後端, 預載入此行程負責的狀態並啟動背景寫入"""
+        await asyncio.to_thread(self.backend.connect)
+        self._opened = True
+        heat_rows, quarantine_rows, config_rows = await asyncio.to_thread(self.backend.load)
+
+        for guild_id, user_id, heat_value, last_updated, decayed_at, spam, phishing, honeypot, violations in heat_rows:
+            heat_data = server_cache.add_user(guild_id, user_id).heat_data
+            heat_data.heat_value = heat_value
+            heat_data.last_updated = last_updated
+            heat_data.decayed_at = decayed_at
+            heat_data.spam_count = spam
+            heat_data.phishing_attempt_count = phishing
+            heat_data.honeypot_trigger_count = honeypot
+            for timestamp, code, amount in json.loads(violations):
+                if code in ViolationReason._value2member_map_:
+                    heat_data.violations.append(Violation(timestamp, ViolationReason(code), amount))
+
+        for guild_id, user_id, role_ids in quarantine_rows:
+            self.quarantine_snapshots.setdefault(guild_id, {})[user_id] = json.loads(role_ids)
+
+        for guild_id, overrides in config_rows:
+            self.guild_overrides[guild_id] = json.loads(overrides)
+
+        self.server_cache = server_cache
+        server_cache.store = self
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.info(
+            f"已載入 {len(heat_rows)} 筆熱力紀錄、{len(quarantine_rows)} 筆隔離快照與 {len(config_rows)} 筆伺服器設定 "
+            f"({self.backend.describe()}, {self.backend.partition.describe()})"
+        )
+
+    def _collect(self) -> WriteBatch:
+        """在事件迴圈中把變更的 key 轉成要寫入的資料列"""
+        wipe = self._wipe_heat
+        dirty_users, self._dirty_users = self._dirty_users, set()
+        dirty_quarantine, self._dirty_quarantine = self._dirty_quarantine, set()
+        dirty_configs, self._dirty_configs = self._dirty_configs, set()
+        self._wipe_heat = False
+
+        heat_upserts: list[HeatRow] = []
+        heat_deletes: list[tuple[str, str]] = []
+        for guild_id, user_id in dirty_users:
+            user = self.server_cache.get_user(guild_id, user_id) if self.server_cache else None
+            if user is None:
+                heat_deletes.append((guild_id, user_id))
+                continue
+            heat_data = user.heat_data
+            heat_upserts.append(
+                (
+                    guild_id,
+                    user_id,
+                    heat_data.heat_value,
+                    heat_data.last_updated,
+                    heat_data.decayed_at,
+                    heat_data.spam_count,
+                    heat_data.phishing_attempt_count,
+                    heat_data.honeypot_trigger_count,
+                    json.dumps([[v.timestamp, int(v.reason), v.amount] for v in heat_data.violations]),
+                )
+            )
+
+        quarantine_upserts: list[QuarantineRow] = []
+        quarantine_deletes: list[tuple[str, str]] = []
+        for guild_id, user_id in dirty_quarantine:
+            role_ids = self.quarantine_snapshots.get(guild_id, {}).get(user_id)
+            if role_ids is None:
+                quarantine_deletes.append((guild_id, user_id))
+            else:
+                quarantine_upserts.append((guild_id, user_id, json.dumps(role_ids)))
+
+        config_upserts: list[GuildConfigRow] = []
+        config_deletes: list[str] = []
+        for guild_id in dirty_configs:
+            overrides = self.guild_overrides.get(guild_id)
+            if overrides is None:
+                config_deletes.append(guild_id)
+            else:
+                config_upserts.append((guild_id, json.dumps(overrides)))
+
+        return wipe, heat_upserts, heat_deletes, quarantine_upserts, quarantine_deletes, config_upserts, config_deletes
+
+    async def flush(self) -> None:
+        """把累積的變更批次寫入資料庫"""
+        async with self._flush_lock:
+            if not self._opened:
+                return
+            if not (self._wipe_heat or self._dirty_users or self._dirty_quarantine or self._dirty_configs):
+                return
+
+            batch = self._collect()
+            try:
+                await asyncio.to_thread(self.backend.write, *batch)
+            except Exception as e:
+                logger.error(f"寫入持久化資料時發生錯誤: {e}", exc_info=True)
+                (
+                    wipe,
+                    heat_upserts,
+                    heat_deletes,
+                    quarantine_upserts,
+                    quarantine_deletes,
+                    config_upserts,
+                    config_deletes,
+                ) = batch
+                self._wipe_heat = self._wipe_heat or wipe
+                self._dirty_users.update((row[0], row[1]) for row in heat_upserts)
+                self._dirty_users.update(heat_deletes)
+                self._dirty_quarantine.update((row[0], row[1]) for row in quarantine_upserts)
+                self._dirty_quarantine.update(quarantine_deletes)
+                self._dirty_configs.update(row[0] for row in config_upserts)
+                self._dirty_configs.update(config_deletes)
+
+    async def _flush_loop(self) -> None:
+        while not self._closing.is_set():
+            try:
+                await asyncio.wait_for(self._closing.wait(), timeout=self.flush_interval)
+            except TimeoutError:
+                await self.flush()
+
+    async def close(self) -> None:
+        """停止背景寫入, 寫入剩餘變更並關閉資料庫"""
+        self._closing.set()
+        if self._flush_task is not None:
+            await self._flush_task
+            self._flush_task = None
+        await self.flush()
+        if self._opened:
+            self._opened = False
+            await asyncio.to_thread(self.backend.close)
+            logger.info("已寫入並關閉持久化資料庫")
+
+
+_store: Optional[HeatStore] = None
+
+
+def get_store() -> HeatStore:
+    """獲取全局持久化 store"""
+    global _store
+    if _store is None:
+        settings = get_settings().storage
+        factory = _backends.get(settings.backend)
+        if factory is None:
+            raise ValueError(f"未知的儲存後端: {settings.backend} (可用: {', '.join(_backends)})")
+        _store = HeatStore(factory(settings, get_partition()), settings.flush_interval)
+    return _store
@@ -0,0 +1,107 @@
+from typing import NamedTuple
+import re
+
+# 單一預編譯樣式, 一次線性掃描取出訊息中所有網址 (含不帶 scheme 的 discord.gg/xxx 之類)
+_URL_PATTERN = re.compile(
+    r"(?<![\d.])(?:(?P<scheme>https?)://)?"
+    r"(?P<host>(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)(?!\.?[\w-])"
+    r"|(?:[0-9a-z\u00a1-\uffff](?:[0-9a-z\u00a1-\uffff-]{0,61}[0-9a-z\u00a1-\uffff])?\.)+"
+    r"(?:[a-z\u00a1-\uffff]{2,63}|xn--[0-9a-z-]{2,59}))\.?"
+    r"(?::\d{1,5})?"
+    r"(?P<rest>[/?#][^\s<>\"'`|]*)?",
+    re.IGNORECASE,
+)
+
+_TRAILING_PUNCTUATION = ".,:;!?)]}*_~"
+
+# 不帶 scheme 與路徑的 "a.b" 多半只是普通文字 (檔名、縮寫), 只有頂級網域常見於網址或常被濫用,
+# 或主機名稱含有品牌、誘餌字時才保留; 不含會與副檔名混淆的 py/md/sh/rs 等
+_BARE_HOST_TLDS = frozenset(
+    {
+        "com", "net", "org", "info", "biz", "io", "co", "me", "gg", "gift", "xyz", "top", "site", "online",
+        "club", "shop", "store", "app", "dev", "link", "click", "live", "fun", "icu", "pw", "cc", "ws", "ly",
+        "tk", "ml", "ga", "cf", "gq", "ru", "su", "cn", "tw", "hk", "jp", "kr", "us", "uk", "de", "fr", "nl",
+        "eu", "br", "in", "vip", "win", "bet", "cyou", "rest", "sbs", "cfd", "buzz", "monster", "today",
+    }
+)  # fmt: skip
+_BARE_HOST_KEYWORDS = re.compile(
+    r"d[il1|!]s[ck]{1,2}[o0]r|steam|nitro|gift|free|promo|airdrop|claim|giveaway|reward", re.IGNORECASE
+)
+_IPV4_HOST = re.compile(r"\d{1,3}(?:\.\d{1,3}){3}")
+
+
+def is_ip_address(host: str) -> bool:
+    return _IPV4_HOST.fullmatch(host) is not None
+
+
+def _keep_bare_host(host: str) -> bool:
+    if is_ip_address(host):
+        # 沒有 scheme 的 1.2.3.4 較可能是版本號
+        return False
+    return host.rsplit(".", 1)[-1] in _BARE_HOST_TLDS or _BARE_HOST_KEYWORDS.search(host) is not None
+
+
+class ParsedURL(NamedTuple):
+    raw: str
+    scheme: str  # 未指定時為空字串
+    host: str  # 小寫、去除 www. 及結尾的點, punycode 轉回 unicode
+    path: str  # 至少為 "/"
+    query: str
+
+    @property
+    def labels(self) -> list[str]:
+        return self.host.split(".")
+
+
+def normalize_host(host: str) -> str:
+    """正規化主機名稱"""
+    host = host.lower().rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    if "xn--" in host:
+        labels = []
+        for label in host.split("."):
+            if label.startswith("xn--"):
+                try:
+                    label = label.encode("ascii").decode("idna")
+                except UnicodeError:
+                    pass
+            labels.append(label)
+        host = ".".join(labels)
+    return host
+
+
+def extract_urls(content: str) -> list[ParsedURL]:
+    """
+    掃描一次訊息內容, 返回所有結構化的網址
+
+    >>> [url.host for url in extract_urls("visit disc0rd-nitro.gift please, see main.py")]
+    ['disc0rd-nitro.gift']
+    >>> [(url.host, url.path) for url in extract_urls("http://1.2.3.4/x and v1.2.3.4.5")]
+    [('1.2.3.4', '/x')]
+    """
+    if "." not in content:
+        return []
+
+    urls = []
+    for match in _URL_PATTERN.finditer(content):
+        scheme = match.group("scheme")
+        rest = match.group("rest") or ""
+        host = normalize_host(match.group("host"))
+        if not scheme and not rest and not _keep_bare_host(host):
+            continue
+
+        rest = rest.rstrip(_TRAILING_PUNCTUATION)
+        rest = rest.split("#", 1)[0]
+        path, _, query = rest.partition("?")
+
+        urls.append(
+            ParsedURL(
+                raw=match.group(0),
+                scheme=scheme.lower() if scheme else "",
+                host=host,
+                path=path or "/",
+                query=query,
+            )
+        )
+    return urls
@@ -1,11 +1,23 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 import os
 import asyncio
 import logging
+import time
+from typing import Optional
 from dotenv import load_dotenv
-from pathlib import Path
-from core.heat_system import get_heat_system
+from core.action_queue import get_action_queue
+from core.cache_profile import build_client_options, cached_member_count, memory_report, process_rss
+from core.command_sync import CommandSyncState, sync_if_changed
+from core.guild_config import get_guild_configs
+from core.heat_system import get_server_cache
+from core.instrumentation import get_instrumentation
+from core.log_queue import setup_logging, stop_logging
+from core.metrics import get_metrics_server
+from core.setting import Settings, get_settings
+from core.settings_watcher import get_settings_watcher
+from core.sharding import get_partition
+from core.storage import get_store
 
 load_dotenv()
 
@@ -14,28 +26,31 @@ debug_guild = discord.Object(id=623509187371991060)
 debug = False
 
 logger = logging.getLogger("xaoc")
+log_handler = setup_logging(get_settings().logging)
 
-logger.setLevel(logging.INFO)
-formatter = logging.Formatter("[xaoc] %(asctime)s %(levelname)s: %(message)s")
-log_path = Path("logs/xaoc.log")
-log_path.parent.mkdir(parents=True, exist_ok=True)
-file_handler = logging.FileHandler(log_path, encoding="utf-8")
-file_handler.setFormatter(formatter)
-file_handler.setLevel(logging.INFO)
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(formatter)
-console_handler.setLevel(logging.INFO)
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
+sharding = get_settings().sharding
+# 啟用分片時每個行程只連線 shard_ids 指定的分片, 同一伺服器的事件只會送到其中一個行程
+BotBase = commands.AutoShardedBot if sharding.enabled else commands.Bot
 
-heat = get_heat_system()
 
+def find_extensions() -> list[str]:
+    path = os.path.dirname(os.path.abspath(__file__))
+    filenames = os.listdir(os.path.join(path, "cogs"))
+    return sorted(f"cogs.{filename[:-3]}" for filename in filenames if filename.endswith(".py"))
 
-class botconfig(commands.Bot):
+
+class botconfig(BotBase):
     def __init__(self, *args, **kwargs):
+        if sharding.enabled:
+            kwargs.setdefault("shard_count", sharding.shard_count)
+            kwargs.setdefault("shard_ids", sharding.shard_ids)
+        self.extension_names = find_extensions()
+        self.sync_task: Optional[asyncio.Task] = None
+        # intents 需要在連線前決定, 依要載入的 cog 監聽的事件計算
+        for key, value in build_client_options(get_settings().cache, self.extension_names).items():
+            kwargs.setdefault(key, value)
         super().__init__(
             command_prefix="!",
-            intents=discord.Intents.all(),
             activity=discord.Game("α - TEST"),
             *args,
             **kwargs,
@@ -43,22 +58,126 @@ class botconfig(commands.Bot):
 
     async def setup_hook(self):
         self.remove_command("help")
-        path = os.path.dirname(os.path.abspath(__file__))
-        for filename in os.listdir(os.path.join(path, "cogs")):
-            if filename.endswith(".py"):
-                try:
-                    await self.load_extension(f"cogs.{filename[:-3]}")
-                    logger.info(f"加載 {filename[:-3]} 完成")
-                except Exception as e:
-                    logger.error(f"加載 {filename[:-3]} 失敗:{e}")
+        await get_store().open(get_server_cache())
+        get_guild_configs().rebuild()
+        self.setup_instrumentation()
+
+        if get_settings().reload.enabled:
+            watcher = get_settings_watcher()
+            watcher.subscribe(self.on_settings_changed)
+            watcher.start()
+
+        metrics_server = get_metrics_server()
+        if metrics_server is not None:
+            try:
+                await metrics_server.start()
+            except OSError as e:
+                logger.error(f"指標伺服器啟動失敗: {e}")
+
+        await self.load_extensions()
+
+        # 同步指令不影響防護, 放到背景進行, 不延後連線
+        self.sync_task = asyncio.create_task(self.sync_commands())
+
+    async def load_extensions(self):
+        """同時加載所有 cog, 記錄每個 cog 的加載時間"""
+        instrumentation = get_instrumentation()
+
+        async def load(name: str):
+            short_name = name.removeprefix("cogs.")
+            start = time.perf_counter()
+            try:
+                await self.load_extension(name)
+            except Exception as e:
+                logger.error(f"加載 {short_name} 失敗:{e}")
+                return
+            elapsed = time.perf_counter() - start
+            instrumentation.observe(f"cog_load:{short_name}", elapsed)
+            logger.info(f"加載 {short_name} 完成 ({elapsed * 1000:.0f} ms)")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(load(name) for name in self.extension_names))
+        logger.info(
+            f"已加載 {len(self.extensions)}/{len(self.extension_names)} 個 cog, "
+            f"共 {(time.perf_counter() - start) * 1000:.0f} ms"
+        )
+
+    async def sync_commands(self):
+        """指令定義的雜湊與上次同步時相同就不呼叫 API"""
+        if not get_partition().is_primary:
+            logger.info("斜線指令由負責 0 號分片的行程同步, 略過")
+            return
 
+        settings = get_settings().command_sync
+        state = CommandSyncState(settings.hash_path)
+        guild = None
         if debug:
             self.tree.copy_global_to(guild=debug_guild)
-            await self.tree.sync(guild=debug_guild)
-            logger.info(f"已同步斜線指令到測試伺服器 {debug_guild.id}")
-        else:
-            await self.tree.sync()
-            logger.info("已同步斜線指令到全域")
+            guild = debug_guild
+        try:
+            await sync_if_changed(self.tree, state, self.application_id, guild=guild, force=settings.force)
+        except discord.HTTPException as e:
+            logger.error(f"同步斜線指令失敗: {e}")
+
+    def setup_instrumentation(self):
+        instrumentation = get_instrumentation()
+        instrumentation.instrument_http(self.http)
+        if not callable(getattr(BotBase, "_run_event", None)):
+            logger.warning("discord.py 沒有 Client._run_event, 停用事件監聽器耗時量測 (請確認 discord.py 版本)")
+        instrumentation.register_gauge("action_queue_pending", lambda: get_action_queue().stats()["pending"])
+        instrumentation.register_gauge("action_queue_active", lambda: get_action_queue().stats()["active"])
+        instrumentation.register_gauge("store_pending_writes", lambda: get_store().pending_writes)
+        instrumentation.register_gauge("heat_cache_servers", lambda: len(get_server_cache().servers))
+        instrumentation.register_gauge(
+            "heat_cache_users", lambda: sum(len(server.users) for server in get_server_cache().servers.values())
+        )
+        instrumentation.register_gauge("log_queue_depth", lambda: log_handler.queue.qsize())  # type: ignore
+        instrumentation.register_gauge("log_dropped", lambda: log_handler.dropped)
+        instrumentation.register_gauge("guilds", lambda: len(self.guilds))
+        instrumentation.register_gauge("cached_members", lambda: cached_member_count(self))
+        instrumentation.register_gauge("cached_users", lambda: len(self.users))
+        instrumentation.register_gauge("process_rss_bytes", lambda: process_rss() or 0)
+        instrumentation.register_gauge("gateway_latency_seconds", lambda: self.latency)
+        instrumentation.start()
+
+    def on_settings_changed(self, old: Settings, new: Settings, changed: frozenset[str]):
+        # 轉成 discord.py 事件, cog 以 on_settings_update 監聽器套用自己負責的區段
+        self.dispatch("settings_update", old, new, changed)
+
+    async def _run_event(self, coro, event_name, *args, **kwargs):
+        # 所有事件監聽器都經過這裡, 依監聽器名稱記錄執行時間.
+        # _run_event 是 discord.py 的私有方法 (pyproject 已限制版本), 不存在時 setup_instrumentation 會發出警告
+        start = time.perf_counter()
+        try:
+            await super()._run_event(coro, event_name, *args, **kwargs)
+        finally:
+            get_instrumentation().observe(
+                f"listener:{getattr(coro, '__qualname__', event_name)}", time.perf_counter() - start
+            )
+
+    async def close(self):
+        if self.sync_task is not None and not self.sync_task.done():
+            self.sync_task.cancel()
+        metrics_server = get_metrics_server()
+        if metrics_server is not None:
+            await metrics_server.close()
+        await get_instrumentation().stop()
+        await get_settings_watcher().stop()
+        # 先卸載擴充: cog_unload 會處理最後一批加入事件等, 產生的踢出與熱力值變更
+        # 必須在排空動作佇列與關閉資料庫之前排入, 否則會在事件迴圈結束時被取消或遺失
+        for name in tuple(self.extensions):
+            try:
+                await self.unload_extension(name)
+            except Exception as e:
+                logger.error(f"卸載 {name} 時發生錯誤: {e}", exc_info=True)
+        for name in tuple(self.cogs):
+            try:
+                await self.remove_cog(name)
+            except Exception as e:
+                logger.error(f"移除 {name} 時發生錯誤: {e}", exc_info=True)
+        await get_action_queue().drain()
+        await get_store().close()
+        await super().close()
 
     async def on_ready(self):
         logger.info(f"登入成功 {self.user}")
@@ -66,10 +185,14 @@ class botconfig(commands.Bot):
         logger.info(f"總共有 {len(self.guilds)} 個伺服器")
         logger.info(f"總共有 {len(self.commands)} 個指令")
         logger.info(f"是否為測試模式: {debug}")
-
-    @tasks.loop(minutes=30)
-    async def periodic_heat_decay(self):
-        heat.decay_heat()
+        logger.info(memory_report(self))
+        if sharding.enabled:
+            partition = get_partition()
+            logger.info(f"分片: {partition.describe()} | 連線分片數: {self.shard_count}")
+            foreign = [guild for guild in self.guilds if not partition.owns(guild.id)]
+            if foreign:
+                # 分片數與設定不一致時, 狀態會寫入不屬於此行程的分區
+                logger.error(f"有 {len(foreign)} 個伺服器不屬於此行程的分片, 請確認 shard_count 設定一致")
 
 
 bot = botconfig()
@@ -86,4 +209,7 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    finally:
+        stop_logging()